@@ -0,0 +1,161 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Building of the matches of the ACLs of the security group rules.
+
+A match is built from its parts, joined once by join_match(), and the
+lists of values are matched as sets, e.g. ``ip4.src == {10.0.0.2,
+10.0.0.3}``, rather than with a disjunction of comparisons.
+
+Each tcp or udp security group rule of a port becomes an ACL row, and so
+OpenFlow flows on every chassis.  The rules with the same direction and the
+same match apart from the protocol and port range (ethertype, remote IP
+prefix, remote group) are merged into one ACL per protocol, matching the
+union of their port ranges, e.g.::
+
+    tcp && tcp.dst == {22, 80, 8080/0xfff8}
+    tcp && (tcp.dst == 443 || (tcp.dst >= 1000 && tcp.dst <= 1005))
+
+A rule without a protocol makes the tcp and udp rules with the same match
+redundant, a rule without a port range the ones of the same protocol.
+"""
+
+import collections
+
+MIN_PORT = 0
+MAX_PORT = 65535
+
+COMPACTED_PROTOCOLS = (None, 'tcp', 'udp')
+
+
+def join_match(parts):
+    """Return the conjunction of the non empty parts of a match."""
+    return ' && '.join(part for part in parts if part)
+
+
+def set_match(field, values):
+    """Return the match of a field in a list of values, e.g. IP addresses.
+
+    :returns: the match, e.g. 'ip4.src == {10.0.0.2, 10.0.0.3}', or an
+              empty string if there are no values
+    """
+    if len(values) > 1:
+        return '%s == {%s}' % (field, ', '.join(values))
+    if values:
+        return '%s == %s' % (field, values[0])
+    return ''
+
+
+def _port_range(port_range_min, port_range_max):
+    # A missing or -1 bound is not matched on, as in the rules' ACLs.
+    lo = MIN_PORT
+    hi = MAX_PORT
+    if port_range_min and port_range_min != -1:
+        lo = port_range_min
+    if port_range_max and port_range_max != -1:
+        hi = port_range_max
+    if lo <= MIN_PORT and hi >= MAX_PORT:
+        return None
+    return lo, hi
+
+
+def merge_port_ranges(ranges):
+    """Merge the overlapping and adjacent port ranges.
+
+    :param ranges: iterable of (min, max) port ranges, None for all ports
+    :returns: sorted list of disjoint (min, max) port ranges, or None if
+              all the ports are matched
+    """
+    merged = []
+    for port_range in sorted(ranges, key=lambda r: r or (MIN_PORT, MAX_PORT)):
+        if port_range is None:
+            return None
+        lo, hi = port_range
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    if merged == [(MIN_PORT, MAX_PORT)]:
+        return None
+    return merged
+
+
+def _masked_value(lo, hi):
+    # The range as a value/mask, if it is an aligned power of 2 block.
+    size = hi - lo + 1
+    if size & (size - 1) or lo % size:
+        return None
+    return '%d/0x%x' % (lo, MAX_PORT & ~(size - 1))
+
+
+def port_ranges_match(field, ranges):
+    """Return the match of a port field in the port ranges.
+
+    The single ports and aligned power of 2 blocks are matched as a set,
+    the other ranges with comparisons.
+    """
+    values = []
+    terms = []
+    for lo, hi in ranges:
+        value = str(lo) if lo == hi else _masked_value(lo, hi)
+        if value is not None:
+            values.append(value)
+            continue
+        comparisons = []
+        if lo > MIN_PORT:
+            comparisons.append('%s >= %d' % (field, lo))
+        if hi < MAX_PORT:
+            comparisons.append('%s <= %d' % (field, hi))
+        terms.append(' && '.join(comparisons))
+    if values:
+        terms.insert(0, set_match(field, values))
+    if len(terms) == 1:
+        return terms[0]
+    return '(%s)' % ' || '.join(
+        '(%s)' % term if ' && ' in term else term for term in terms)
+
+
+class AclCompactor(object):
+    """Merge the tcp, udp and any protocol rules of a port.
+
+    The rules are added with their direction and their match without the
+    protocol and port range, and the compacted matches are then returned
+    by matches().
+    """
+
+    def __init__(self):
+        # (direction, match) -> protocol -> list of port ranges
+        self._rules = collections.OrderedDict()
+
+    def add(self, direction, match, protocol, port_range_min,
+            port_range_max):
+        protocols = self._rules.setdefault((direction, match),
+                                           collections.OrderedDict())
+        port_range = None
+        if protocol is not None:
+            port_range = _port_range(port_range_min, port_range_max)
+        protocols.setdefault(protocol, []).append(port_range)
+
+    def matches(self):
+        """Return the (direction, match) of the compacted ACLs."""
+        result = []
+        for (direction, match), protocols in self._rules.items():
+            if None in protocols:
+                result.append((direction, match))
+                continue
+            for protocol, ranges in protocols.items():
+                ranges = merge_port_ranges(ranges)
+                result.append((direction, join_match([
+                    match, protocol,
+                    ranges and port_ranges_match('%s.dst' % protocol,
+                                                 ranges)])))
+        return result
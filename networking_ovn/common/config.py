@@ -20,6 +20,14 @@ ovn_opts = [
     cfg.StrOpt('ovsdb_connection',
                default='tcp:127.0.0.1:6640',
                help=_('The connection string for the native OVSDB backend')),
+    cfg.StrOpt('ovn_sb_connection',
+               default='',
+               help=_('The connection string for the OVN_Southbound OVSDB. '
+                      'When set, the ovn worker also monitors the port '
+                      'bindings and chassis in the OVN_Southbound DB to '
+                      'update the port status as soon as a port is bound '
+                      'to or unbound from a chassis, and to report the '
+                      'chassis going away. Disabled when empty.')),
     cfg.IntOpt('ovsdb_connection_timeout',
                default=60,
                help=_('Timeout in seconds for the OVSDB '
@@ -52,7 +60,100 @@ ovn_opts = [
     cfg.StrOpt("vhost_sock_dir",
                default="/var/run/openvswitch",
                help=_("The directory in which vhost virtio socket"
-                      "is created by all the vswitch daemons"))
+                      "is created by all the vswitch daemons")),
+    cfg.BoolOpt('ovsdb_shared_replica',
+                default=False,
+                help=_('Whether the api and rpc workers use the '
+                       'OVN_Northbound DB replica of the ovn worker '
+                       'instead of each keeping their own replica and '
+                       'connection to the OVN_Northbound DB. When enabled, '
+                       'the OVN commands of these workers are sent to the '
+                       'ovn worker of the same neutron server through a '
+                       'local unix socket and committed by it.')),
+    cfg.IntOpt('event_partitions',
+               default=1, min=1,
+               help=_('The number of partitions the OVN_Northbound events '
+                      '(e.g. the port status updates) are split in. Each '
+                      'partition is handled by the ovn worker of the '
+                      'neutron server holding its ovsdb lock, spreading '
+                      'the event handling over all the neutron servers. '
+                      'With 1, the events are all handled by a single '
+                      'neutron server. All the neutron servers must use '
+                      'the same value.')),
+    cfg.IntOpt('ovn_worker_stop_timeout',
+               default=10,
+               help=_('Maximum time in seconds the ovn worker waits, when '
+                      'stopping, for the OVN events already received to be '
+                      'handled before closing its connections to the OVN '
+                      'DBs.')),
+    cfg.IntOpt('ovsdb_stats_interval',
+               default=0,
+               help=_('Interval in seconds at which each neutron worker '
+                      'logs the statistics of its OVN_Northbound DB '
+                      'replica: the number of rows and approximate size '
+                      'of each table, the duration of the initial dump '
+                      'and the latency percentiles of the OVSDB '
+                      'transactions and commands. 0 disables it.')),
+    cfg.BoolOpt('profiling',
+                default=False,
+                help=_('Whether to profile the plugin API calls: the time '
+                       'spent in the DB transactions, ACL build, OVN commits '
+                       'and remote security group refreshes, and the number '
+                       'of SQL queries and OVSDB commands of each call are '
+                       'passed to the profiling_sink.')),
+    cfg.StrOpt('profiling_sink',
+               default='networking_ovn.common.profiling.log_sink',
+               help=_('Import path of the function called with the '
+                      'profile (a dictionary) of each plugin API call when '
+                      'profiling is enabled. The default one logs it.')),
+    cfg.IntOpt('ovsdb_txn_warn_rows',
+               default=10000,
+               help=_('Log a warning when an OVSDB transaction inserts, '
+                      'updates or deletes more rows than this.')),
+    cfg.IntOpt('ovsdb_txn_warn_bytes',
+               default=4 * 1024 * 1024,
+               help=_('Log a warning when the approximate size of the '
+                      'values written by an OVSDB transaction is larger '
+                      'than this, in bytes.')),
+    cfg.IntOpt('acl_update_batch_size',
+               default=100, min=1,
+               help=_('Maximum number of ports whose ACLs are rewritten '
+                      'per OVSDB transaction when the ACLs of all the '
+                      'ports of a security group are updated.')),
+    cfg.BoolOpt('acl_compaction',
+                default=False,
+                help=_('Whether to merge the ACLs of the tcp, udp and any '
+                       'protocol security group rules of a port which only '
+                       'differ by their protocol and port range, matching '
+                       'the union of their port ranges, to reduce the '
+                       'number of ACL rows and OpenFlow flows.')),
+    cfg.BoolOpt('acl_per_security_group',
+                default=False,
+                help=_('Whether to create the ACLs of a security group rule '
+                       'once per logical switch, matching the set of the '
+                       'ports of the network in the security group, rather '
+                       'than once per port. The number of ACL rows then '
+                       'scales with the number of rules rather than the '
+                       'number of rules times the number of ports, but a '
+                       'port joining or leaving a security group rewrites '
+                       'all the ACLs of the security group on its logical '
+                       'switch.')),
+    cfg.IntOpt('remote_group_cache_ttl',
+               default=0,
+               help=_('Seconds during which the IP addresses of the ports '
+                      'of a remote security group are cached by a neutron '
+                      'server process, to build the ACLs of the ports it '
+                      'creates and updates. The cache is updated with the '
+                      'ports changed by the process, and the cached '
+                      'addresses are checked against the Neutron DB before '
+                      'being used, so that they are loaded again when '
+                      'changed by the other workers and neutron servers. '
+                      '0 disables the cache.')),
+    cfg.StrOpt('ovsdb_proxy_socket',
+               default='$state_path/ovn_nb_proxy.sock',
+               help=_('The unix socket used by the ovn worker to serve '
+                      'the OVN_Northbound DB replica to the other workers '
+                      'when ovsdb_shared_replica is enabled.')),
 ]
 
 cfg.CONF.register_opts(ovn_opts, group='ovn')
@@ -68,6 +169,10 @@ def get_ovn_ovsdb_connection():
     return cfg.CONF.ovn.ovsdb_connection
 
 
+def get_ovn_sb_connection():
+    return cfg.CONF.ovn.ovn_sb_connection
+
+
 def get_ovn_ovsdb_timeout():
     return cfg.CONF.ovn.ovsdb_connection_timeout
 
@@ -86,3 +191,55 @@ def get_ovn_vif_type():
 
 def get_ovn_vhost_sock_dir():
     return cfg.CONF.ovn.vhost_sock_dir
+
+
+def is_ovsdb_shared_replica():
+    return cfg.CONF.ovn.ovsdb_shared_replica
+
+
+def get_event_partitions():
+    return cfg.CONF.ovn.event_partitions
+
+
+def get_ovn_worker_stop_timeout():
+    return cfg.CONF.ovn.ovn_worker_stop_timeout
+
+
+def get_ovsdb_stats_interval():
+    return cfg.CONF.ovn.ovsdb_stats_interval
+
+
+def is_profiling_enabled():
+    return cfg.CONF.ovn.profiling
+
+
+def get_profiling_sink():
+    return cfg.CONF.ovn.profiling_sink
+
+
+def get_ovsdb_txn_warn_rows():
+    return cfg.CONF.ovn.ovsdb_txn_warn_rows
+
+
+def get_ovsdb_txn_warn_bytes():
+    return cfg.CONF.ovn.ovsdb_txn_warn_bytes
+
+
+def get_acl_update_batch_size():
+    return cfg.CONF.ovn.acl_update_batch_size
+
+
+def get_ovsdb_proxy_socket():
+    return cfg.CONF.ovn.ovsdb_proxy_socket
+
+
+def is_acl_compaction_enabled():
+    return cfg.CONF.ovn.acl_compaction
+
+
+def is_acl_per_security_group():
+    return cfg.CONF.ovn.acl_per_security_group
+
+
+def get_remote_group_cache_ttl():
+    return cfg.CONF.ovn.remote_group_cache_ttl
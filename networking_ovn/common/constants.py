@@ -19,6 +19,8 @@ OVN_ROUTER_NAME_EXT_ID_KEY = 'neutron:router_name'
 OVN_PHYSNET_EXT_ID_KEY = 'neutron:provnet-physical-network'
 OVN_NETTYPE_EXT_ID_KEY = 'neutron:provnet-network-type'
 OVN_SEGID_EXT_ID_KEY = 'neutron:provnet-segmentation-id'
+OVN_SG_EXT_ID_KEY = 'neutron:security_group'
+OVN_SG_IDS_EXT_ID_KEY = 'neutron:security_group_ids'
 OVN_PORT_BINDING_PROFILE = portbindings.PROFILE
 OVN_PORT_BINDING_PROFILE_PARAMS = [{'parent_name': six.string_types,
                                     'tag': six.integer_types},
@@ -36,3 +38,17 @@ ACL_PRIORITY_DROP = 1001
 ACL_ACTION_DROP = 'drop'
 ACL_ACTION_ALLOW_RELATED = 'allow-related'
 ACL_ACTION_ALLOW = 'allow'
+
+# Number of neutron ports whose status is updated per DB transaction when
+# syncing the port status with the OVN Logical_Port 'up' column in bulk.
+PORT_STATUS_SYNC_BATCH_SIZE = 500
+
+# Maximum delay in seconds before a neutron server takes a server slot and
+# requests the locks of the event partitions.  The delay is derived from the
+# host name so that the neutron servers starting together don't race for
+# the same slots.
+EVENT_PARTITION_LOCK_MAX_DELAY = 10
+
+# Interval in seconds between the counts of the neutron servers holding the
+# event partition locks, which rebalance the partitions.
+EVENT_PARTITION_REBALANCE_INTERVAL = 15
@@ -0,0 +1,136 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-process latency histograms.
+
+The OVSDB transactions are tagged with the plugin operation issuing them
+(see operation()) and their latency is recorded in histograms named after
+the step and the operation, e.g. 'ovsdb.txn.commit.create_port'.
+"""
+
+import collections
+import contextlib
+import functools
+import threading
+
+from oslo_log import log
+
+from networking_ovn._i18n import _LI
+from networking_ovn.common import profiling
+
+LOG = log.getLogger(__name__)
+
+# Number of most recent samples kept per histogram to compute the
+# percentiles.
+SAMPLES = 1024
+
+PERCENTILES = (50, 90, 99)
+
+_local = threading.local()
+
+
+class Histogram(object):
+    """Latency histogram over the most recent samples."""
+
+    def __init__(self, samples=SAMPLES):
+        self._samples = collections.deque(maxlen=samples)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        with self._lock:
+            self._samples.append(value)
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+
+    def summary(self, percentiles=PERCENTILES):
+        """Return the count, mean, max and percentiles of the samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+            summary = {'count': self.count,
+                       'mean': self.total / self.count if self.count else 0,
+                       'max': self.max}
+        for p in percentiles:
+            if samples:
+                index = min(len(samples) - 1, len(samples) * p // 100)
+                summary['p%d' % p] = samples[index]
+            else:
+                summary['p%d' % p] = 0
+        return summary
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def get_histogram(name):
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(name, Histogram())
+    return histogram
+
+
+def observe(name, value):
+    get_histogram(name).observe(value)
+
+
+def summary():
+    """Return the summary of all the histograms, by name."""
+    return dict((name, histogram.summary())
+                for name, histogram in list(_histograms.items()))
+
+
+def reset():
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def log_summary():
+    for name, s in sorted(summary().items()):
+        LOG.info(_LI("%(name)s: count=%(count)d mean=%(mean).4fs "
+                     "p50=%(p50).4fs p90=%(p90).4fs p99=%(p99).4fs "
+                     "max=%(max).4fs"), dict(s, name=name))
+
+
+@contextlib.contextmanager
+def operation(name):
+    """Tag the OVSDB transactions created in this context with name."""
+    previous = getattr(_local, 'operation', None)
+    _local.operation = name
+    try:
+        yield
+    finally:
+        _local.operation = previous
+
+
+def current_operation():
+    return getattr(_local, 'operation', None)
+
+
+def tag_operation(f):
+    """Decorator tagging the OVSDB transactions with the method name.
+
+    An operation already tagged by a caller keeps its tag.  The call is
+    also profiled when profiling is enabled (see
+    networking_ovn.common.profiling).
+    """
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        if current_operation() is not None:
+            return f(*args, **kwargs)
+        with operation(f.__name__), profiling.request(f.__name__):
+            return f(*args, **kwargs)
+    return wrapper
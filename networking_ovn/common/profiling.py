@@ -0,0 +1,148 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Opt-in profiling of the plugin API calls.
+
+When '[ovn] profiling' is enabled, each plugin API call tagged with
+networking_ovn.common.metrics.tag_operation() is profiled: the time spent
+in the spans (DB transaction, ACL build, OVN commit, remote security group
+refresh, ...) and the number of SQL queries, OVSDB transactions and OVSDB
+commands are collected and the profile is passed to the configured sink
+when the call returns.
+"""
+
+import collections
+import contextlib
+import threading
+import time
+
+from oslo_log import log
+from oslo_utils import importutils
+from sqlalchemy import engine
+from sqlalchemy import event
+
+from networking_ovn._i18n import _LE, _LI
+from networking_ovn.common import config
+
+LOG = log.getLogger(__name__)
+
+_local = threading.local()
+_sql_listener_lock = threading.Lock()
+_sql_listener = False
+_sinks = {}
+
+
+class Profile(object):
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.start = time.time()
+        self.duration = None
+        # Span name -> [count, time]
+        self.spans = collections.OrderedDict()
+        self.counters = collections.defaultdict(int)
+
+    def add_span(self, name, duration):
+        span = self.spans.setdefault(name, [0, 0.0])
+        span[0] += 1
+        span[1] += duration
+
+    def to_dict(self):
+        return {'operation': self.operation,
+                'duration': self.duration,
+                'spans': dict((name, {'count': count, 'time': t})
+                              for name, (count, t) in self.spans.items()),
+                'counters': dict(self.counters)}
+
+
+def log_sink(profile):
+    """Default sink, logging the profile as one line."""
+    LOG.info(_LI("Profile of %(operation)s: %(duration).4fs, spans: "
+                 "%(spans)s, counters: %(counters)s"),
+             {'operation': profile['operation'],
+              'duration': profile['duration'],
+              'spans': ', '.join(
+                  '%s %d/%.4fs' % (name, s['count'], s['time'])
+                  for name, s in sorted(profile['spans'].items())),
+              'counters': ', '.join(
+                  '%s %d' % (name, count)
+                  for name, count in sorted(profile['counters'].items()))})
+
+
+def _get_sink():
+    path = config.get_profiling_sink()
+    sink = _sinks.get(path)
+    if sink is None:
+        sink = _sinks[path] = importutils.import_class(path)
+    return sink
+
+
+def _count_sql_query(*args, **kwargs):
+    count('sql_queries')
+
+
+def _listen_sql_queries():
+    global _sql_listener
+    if _sql_listener:
+        return
+    with _sql_listener_lock:
+        if not _sql_listener:
+            event.listen(engine.Engine, 'before_cursor_execute',
+                         _count_sql_query)
+            _sql_listener = True
+
+
+def current_profile():
+    return getattr(_local, 'profile', None)
+
+
+@contextlib.contextmanager
+def request(operation):
+    """Profile the API call run in this context, if profiling is enabled.
+
+    Nested requests are part of the outermost one.
+    """
+    if current_profile() is not None or not config.is_profiling_enabled():
+        yield
+        return
+    _listen_sql_queries()
+    profile = _local.profile = Profile(operation)
+    try:
+        yield
+    finally:
+        _local.profile = None
+        profile.duration = time.time() - profile.start
+        try:
+            _get_sink()(profile.to_dict())
+        except Exception:
+            LOG.exception(_LE("Unable to emit the profile of %s"), operation)
+
+
+@contextlib.contextmanager
+def span(name):
+    """Record the time spent in this context in the current profile."""
+    profile = current_profile()
+    if profile is None:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        profile.add_span(name, time.time() - start)
+
+
+def count(name, value=1):
+    """Increment a counter of the current profile."""
+    profile = current_profile()
+    if profile is not None:
+        profile.counters[name] += value
@@ -0,0 +1,197 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Cache of the IP addresses of the ports of the remote security groups.
+
+The ACL of a rule with a remote group matches the IP addresses of the ports
+of the remote group.  Instead of loading them from the Neutron DB for each
+rule of each port, they are cached per neutron server process and the
+entries are updated incrementally with the ports created, updated and
+deleted by the process.
+
+The ports changed by the other workers and neutron servers are not seen by
+the process, so an entry is only used if its revision, a digest of the
+addresses of its ports, is the revision of the addresses of the ports of the
+security group in the Neutron DB, which is shared by all the neutron
+servers.  Otherwise the entry is loaded again.  The entries are also loaded
+again once they are older than the ttl.
+
+The match of the addresses of a remote group, e.g. ``ip4.src == {10.0.0.2,
+10.0.0.3}``, is built once per entry and shared by the ACLs of the ports
+which are not in the remote group.
+"""
+
+import collections
+import hashlib
+import threading
+import time
+
+from networking_ovn.common import acl
+
+_IP_VERSIONS = {'ip4': 0, 'ip6': 1}
+
+
+def addresses_revision(addresses):
+    """Return the revision of the addresses of the ports of a remote group.
+
+    :param addresses: the (port id, IP address) pairs of the ports, with a
+                      None address for the ports without any
+    """
+    lines = sorted('%s %s' % (port_id, address or '')
+                   for port_id, address in addresses)
+    return hashlib.md5('\n'.join(lines).encode('utf-8')).hexdigest()
+
+
+class _RemoteGroup(object):
+    """The IPv4 and IPv6 addresses of the ports of a security group."""
+
+    def __init__(self, ports):
+        self.loaded_at = time.time()
+        # port id -> (IPv4 addresses, IPv6 addresses)
+        self.ports = {}
+        # Number of ports with each IPv4 and IPv6 address.  The same address
+        # can be used by ports on different networks.
+        self._counts = (collections.Counter(), collections.Counter())
+        # Sorted addresses and matches built from them, until the next
+        # change.
+        self._sorted = {}
+        self._matches = {}
+        self._revision = None
+        for port_id, ips in ports.items():
+            self.set_port(port_id, ips)
+
+    def set_port(self, port_id, ips):
+        self.remove_port(port_id)
+        self.ports[port_id] = ips
+        self._sorted = {}
+        self._matches = {}
+        self._revision = None
+        for counts, addresses in zip(self._counts, ips):
+            counts.update(addresses)
+
+    def remove_port(self, port_id):
+        ips = self.ports.pop(port_id, None)
+        if ips is None:
+            return
+        self._sorted = {}
+        self._matches = {}
+        self._revision = None
+        for counts, addresses in zip(self._counts, ips):
+            for address in addresses:
+                counts[address] -= 1
+                if not counts[address]:
+                    del counts[address]
+
+    def revision(self):
+        if self._revision is None:
+            self._revision = addresses_revision(
+                (port_id, address) for port_id, ips in self.ports.items()
+                for address in (ips[0] + ips[1]) or (None,))
+        return self._revision
+
+    def has_ports(self, exclude_port=None):
+        return len(self.ports) > int(exclude_port in self.ports)
+
+    def _sorted_ips(self, index):
+        addresses = self._sorted.get(index)
+        if addresses is None:
+            addresses = self._sorted[index] = sorted(self._counts[index])
+        return addresses
+
+    def ips_match(self, ip_version, src_or_dst, exclude_port=None):
+        """Return the match of the addresses of the ports but exclude_port.
+
+        :param ip_version: 'ip4' or 'ip6'
+        :param src_or_dst: 'src' or 'dst'
+        :returns: the match, or an empty string if there are no addresses
+        """
+        index = _IP_VERSIONS.get(ip_version)
+        if index is None:
+            return ''
+        field = '%s.%s' % (ip_version, src_or_dst)
+        if exclude_port in self.ports:
+            counts = self._counts[index]
+            skip = self.ports[exclude_port][index]
+            return acl.set_match(field, [
+                address for address in self._sorted_ips(index)
+                if not (address in skip and counts[address] == 1)])
+        match = self._matches.get(field)
+        if match is None:
+            match = self._matches[field] = acl.set_match(
+                field, self._sorted_ips(index))
+        return match
+
+
+class RemoteGroupCache(object):
+    """Process level cache of the IP addresses of the remote groups.
+
+    A ttl of 0 disables the cache, the entries are then loaded for each
+    lookup and not kept.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._groups = {}
+        self._lock = threading.Lock()
+        # Incremented by each update, so that an entry loaded while a port
+        # is updated, which may miss the update, is not kept.
+        self._generation = 0
+
+    def get(self, security_group_id, load, revision=None, reload=False):
+        """Return the remote group of a security group.
+
+        :param load: function returning the (IPv4 addresses, IPv6 addresses)
+                     of the ports of the security group by port id, from
+                     the Neutron DB
+        :param revision: function returning the addresses_revision() of the
+                     addresses of the ports of the security group in the
+                     Neutron DB, a cached entry is only used if it has the
+                     same revision
+        :param reload: whether to load the entry even if it is cached
+        :returns:    object with the ports' addresses by port id in 'ports',
+                     has_ports(exclude_port), and ips_match(ip_version,
+                     src_or_dst, exclude_port) returning the match of the
+                     addresses of the ports but exclude_port
+        """
+        group = self._groups.get(security_group_id)
+        if (not reload and group is not None and
+                time.time() - group.loaded_at < self.ttl and
+                (revision is None or
+                 group.revision() == revision(security_group_id))):
+            return group
+        generation = self._generation
+        group = _RemoteGroup(load(security_group_id))
+        if self.ttl:
+            with self._lock:
+                if generation == self._generation:
+                    self._groups[security_group_id] = group
+        return group
+
+    def update_port(self, port_id, security_group_ids, ips):
+        """Update the addresses and the security groups of a port."""
+        with self._lock:
+            self._generation += 1
+            for security_group_id, group in self._groups.items():
+                if security_group_id in security_group_ids:
+                    group.set_port(port_id, ips)
+                else:
+                    group.remove_port(port_id)
+
+    def remove_port(self, port_id):
+        with self._lock:
+            self._generation += 1
+            for group in self._groups.values():
+                group.remove_port(port_id)
+
+    def clear(self):
+        with self._lock:
+            self._groups = {}
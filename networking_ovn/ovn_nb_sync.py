@@ -10,6 +10,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
 from eventlet import greenthread
 from oslo_log import log
 
@@ -18,7 +20,9 @@ from neutron import context
 from neutron.extensions import providernet as pnet
 
 from networking_ovn._i18n import _LW
+from networking_ovn.common import config
 from networking_ovn.common import constants as ovn_const
+from networking_ovn.common import metrics
 from networking_ovn.common import utils
 
 LOG = log.getLogger(__name__)
@@ -48,7 +52,9 @@ class OvnNbSynchronizer(object):
         LOG.debug("Starting OVN-Northbound DB sync process")
 
         ctx = context.get_admin_context()
-        self.sync_networks_and_ports(ctx)
+        with metrics.operation('sync'):
+            self.sync_networks_and_ports(ctx)
+            self.sync_security_group_acls(ctx)
 
     @staticmethod
     def _get_attribute(obj, attribute):
@@ -153,3 +159,50 @@ class OvnNbSynchronizer(object):
                         lport_name=lport_info['port'],
                         lswitch=lport_info['lswitch']))
         LOG.debug('OVN-NB Sync networks and ports finished')
+
+    def sync_security_group_acls(self, ctx):
+        """Move the ports to or from the ACLs of their security groups.
+
+        The ports created before [ovn] acl_per_security_group was enabled
+        keep their own ACLs until they are updated, and the ports created
+        before it was disabled keep being matched by the ACLs of their
+        security groups, which their logical port lists in its
+        'neutron:security_group_ids' external id.  In repair mode, the ACLs
+        of the ports which don't match the option are replaced, in batches
+        of [ovn] acl_update_batch_size ports of a network.
+        """
+        if self.mode != SYNC_MODE_REPAIR:
+            return
+        LOG.debug('OVN-NB Sync security group ACLs started')
+        per_security_group = config.is_acl_per_security_group()
+        lport_ext_ids = self.ovn_api.get_all_logical_ports_ids()
+        network_ports = collections.defaultdict(list)
+        for port in self.core_plugin.get_ports(ctx):
+            ext_ids = lport_ext_ids.get(port['id'])
+            if ext_ids is None:
+                continue
+            sg_ids = ext_ids.get(ovn_const.OVN_SG_IDS_EXT_ID_KEY)
+            if per_security_group:
+                if port.get('security_groups') and sg_ids is None:
+                    network_ports[port['network_id']].append((port, []))
+            elif sg_ids is not None:
+                # The ACLs of the security groups the port was matched by
+                # are set without it.
+                network_ports[port['network_id']].append(
+                    (port, sg_ids.split()))
+        batch_size = config.get_acl_update_batch_size()
+        for network_id, ports in network_ports.items():
+            for i in range(0, len(ports), batch_size):
+                batch = ports[i:i + batch_size]
+                sg_ids = set()
+                for port, port_sg_ids in batch:
+                    sg_ids.update(port.get('security_groups', []))
+                    sg_ids.update(port_sg_ids)
+                try:
+                    self.core_plugin.set_security_group_acls_in_ovn(
+                        ctx, network_id, [port for port, port_sg_ids in batch],
+                        sorted(sg_ids))
+                except RuntimeError:
+                    LOG.warning(_LW("Set security group ACLs in OVN NB "
+                                    "failed for network %s"), network_id)
+        LOG.debug('OVN-NB Sync security group ACLs finished')
@@ -10,10 +10,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
 from neutron.agent.ovsdb.native.commands import BaseCommand
 from neutron.agent.ovsdb.native import idlutils
 
 from networking_ovn._i18n import _
+from networking_ovn.common import acl as ovn_acl
+from networking_ovn.common import constants as ovn_const
 
 
 class AddLSwitchCommand(BaseCommand):
@@ -361,3 +365,75 @@ class DelACLCommand(BaseCommand):
             acls.remove(acl)
             acl.delete()
         setattr(lswitch, 'acls', acls)
+
+
+class SetSecurityGroupACLsCommand(BaseCommand):
+    # The field matching the ports of the security group in the ACLs of
+    # each direction.
+    PORT_FIELDS = {'to-lport': 'outport', 'from-lport': 'inport'}
+
+    def __init__(self, api, lswitch, security_group, acls):
+        super(SetSecurityGroupACLsCommand, self).__init__(api)
+        self.lswitch = lswitch
+        self.security_group = security_group
+        self.acls = acls
+
+    @staticmethod
+    def _key(columns):
+        return (columns['direction'], columns['priority'],
+                columns['action'], columns['match'])
+
+    def run_idl(self, txn):
+        try:
+            lswitch = idlutils.row_by_value(self.api.idl, 'Logical_Switch',
+                                            'name', self.lswitch)
+        except idlutils.RowNotFound:
+            msg = _("Logical Switch %s does not exist") % self.lswitch
+            raise RuntimeError(msg)
+
+        # The ports are read when the command is run, including the ports
+        # added, changed or deleted earlier in the transaction, so that a
+        # transaction retried after a concurrent change of the ports does
+        # not write a stale set of ports.
+        ports = sorted(
+            '"%s"' % port.name for port in getattr(lswitch, 'ports', [])
+            if self.security_group in getattr(port, 'external_ids', {}).get(
+                ovn_const.OVN_SG_IDS_EXT_ID_KEY, '').split())
+        acls_to_add = collections.OrderedDict()
+        if ports:
+            for columns in self.acls:
+                port_match = ovn_acl.set_match(
+                    self.PORT_FIELDS[columns['direction']], ports)
+                columns = dict(columns, match=ovn_acl.join_match(
+                    [port_match, columns['match']]))
+                acls_to_add[self._key(columns)] = columns
+        acls_to_del = []
+        acls = getattr(lswitch, 'acls', [])
+        for acl in acls:
+            ext_ids = getattr(acl, 'external_ids', {})
+            if ext_ids.get(ovn_const.OVN_SG_EXT_ID_KEY) != self.security_group:
+                continue
+            key = self._key({'direction': acl.direction,
+                             'priority': acl.priority,
+                             'action': acl.action,
+                             'match': acl.match})
+            if acls_to_add.pop(key, None) is None:
+                acls_to_del.append(acl)
+        if not acls_to_add and not acls_to_del:
+            # Only the changed ACLs are written, so that a rule change does
+            # not rewrite all the ACLs of the security group.
+            return
+
+        lswitch.verify('ports')
+        lswitch.verify('acls')
+        for acl in acls_to_del:
+            acls.remove(acl)
+            acl.delete()
+        for columns in acls_to_add.values():
+            row = txn.insert(self.api._tables['ACL'])
+            for col, val in columns.items():
+                setattr(row, col, val)
+            row.external_ids = {ovn_const.OVN_SG_EXT_ID_KEY:
+                                self.security_group}
+            acls.append(row.uuid)
+        setattr(lswitch, 'acls', acls)
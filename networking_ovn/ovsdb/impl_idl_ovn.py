@@ -10,30 +10,202 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
+import uuid
+
+import six
+
+from oslo_log import log
+from oslo_service import loopingcall
+
 from neutron.agent.ovsdb import impl_idl
-from neutron.agent.ovsdb.native import connection
+from neutron.agent.ovsdb.native import idlutils
 
-from networking_ovn._i18n import _
+from networking_ovn._i18n import _, _LI, _LW
 from networking_ovn.common import config as cfg
 from networking_ovn.common import constants as ovn_const
+from networking_ovn.common import metrics
+from networking_ovn.common import profiling
 from networking_ovn.ovsdb import commands as cmd
 from networking_ovn.ovsdb import ovn_api
 from networking_ovn.ovsdb import ovsdb_monitor
 
+LOG = log.getLogger(__name__)
+
 
 def get_connection(trigger):
     # The trigger is the start() method of the NeutronWorker class
     if trigger.im_class == ovsdb_monitor.OvnWorker:
         cls = ovsdb_monitor.OvnConnection
     else:
-        cls = connection.Connection
+        cls = ovsdb_monitor.OvnApiConnection
     return cls(cfg.get_ovn_ovsdb_connection(),
                cfg.get_ovn_ovsdb_timeout(), 'OVN_Northbound')
 
 
+def _atom_size(atom):
+    # Approximate size of the value of an ovs.db.data.Atom: the length of
+    # strings, 16 bytes for uuids and 8 bytes for the other types.
+    value = atom.value
+    if isinstance(value, six.string_types):
+        return len(value)
+    if isinstance(value, uuid.UUID):
+        return 16
+    return 8
+
+
+def _datum_size(datum):
+    size = 0
+    for key, value in datum.values.items():
+        size += _atom_size(key)
+        if value is not None:
+            size += _atom_size(value)
+    return size
+
+
+def get_replica_stats(idl):
+    """Return the statistics of an IDL replica.
+
+    :returns: dictionary mapping the table names to a dictionary with the
+              number of 'rows', the approximate size in 'bytes' of the
+              values and the size per column in 'columns'
+    """
+    stats = {}
+    for name, table in idl.tables.items():
+        columns = dict.fromkeys(table.columns, 0)
+        # Copy the rows, the IDL run loop may be updating them.
+        rows = list(table.rows.values())
+        for row in rows:
+            for column, datum in list(row._data.items()):
+                if column in columns:
+                    columns[column] += _datum_size(datum)
+        stats[name] = {'rows': len(rows),
+                       'bytes': sum(columns.values()),
+                       'columns': columns}
+    return stats
+
+
+def get_txn_op_counts(txn):
+    """Count the rows written by an ovs.db.idl.Transaction before commit.
+
+    :returns: dictionary with the number of rows 'inserted', 'updated' and
+              'deleted', and the approximate size in 'bytes' of the values
+              written
+    """
+    counts = {'inserted': 0, 'updated': 0, 'deleted': 0, 'bytes': 0}
+    for row in list(txn._txn_rows.values()):
+        if row._changes is None:
+            counts['deleted'] += 1
+            continue
+        if row._data is None:
+            counts['inserted'] += 1
+        elif row._changes:
+            counts['updated'] += 1
+        for datum in row._changes.values():
+            counts['bytes'] += _datum_size(datum)
+    return counts
+
+
+class _TimedCommand(object):
+    """Command recording the run_idl time of the command it wraps."""
+
+    def __init__(self, command):
+        self.command = command
+
+    def __getattr__(self, name):
+        return getattr(self.command, name)
+
+    def __str__(self):
+        return str(self.command)
+
+    def run_idl(self, txn):
+        start = time.time()
+        try:
+            self.command.run_idl(txn)
+        finally:
+            metrics.observe('ovsdb.cmd.%s' % type(self.command).__name__,
+                            time.time() - start)
+
+
+class OvnTransaction(impl_idl.Transaction):
+    """Transaction recording its latency.
+
+    The transaction is tagged with the plugin operation creating it (see
+    networking_ovn.common.metrics.operation()) and records the time spent
+    waiting in the connection queue, running the commands (run_idl) and
+    committing to the ovsdb-server, as well as the run_idl time of each
+    command.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(OvnTransaction, self).__init__(*args, **kwargs)
+        self.operation = metrics.current_operation() or 'unknown'
+        self.queued_at = None
+        self.started_at = None
+        self.op_counts = None
+
+    def _observe(self, step, value):
+        metrics.observe('ovsdb.txn.%s.%s' % (step, self.operation), value)
+
+    def commit(self):
+        self.queued_at = time.time()
+        profiling.count('ovsdb_txns')
+        profiling.count('ovsdb_ops', len(self.commands))
+        try:
+            with profiling.span('ovn_commit'):
+                return super(OvnTransaction, self).commit()
+        finally:
+            self._observe('total', time.time() - self.queued_at)
+            if self.op_counts:
+                for key in ('inserted', 'updated', 'deleted'):
+                    profiling.count('ovsdb_rows_%s' % key,
+                                    self.op_counts[key])
+
+    def _check_op_counts(self):
+        counts = self.op_counts
+        rows = counts['inserted'] + counts['updated'] + counts['deleted']
+        if (rows > cfg.get_ovsdb_txn_warn_rows() or
+                counts['bytes'] > cfg.get_ovsdb_txn_warn_bytes()):
+            LOG.warning(_LW("Large OVSDB transaction for %(operation)s: "
+                            "%(commands)d commands, %(inserted)d rows "
+                            "inserted, %(updated)d updated, %(deleted)d "
+                            "deleted, about %(bytes)d bytes"),
+                        dict(counts, operation=self.operation,
+                             commands=len(self.commands)))
+
+    def add(self, command):
+        super(OvnTransaction, self).add(_TimedCommand(command))
+        return command
+
+    def pre_commit(self, txn):
+        # Called by the base class do_commit() for each attempt, before
+        # running the commands in txn and committing it.
+        super(OvnTransaction, self).pre_commit(txn)
+        run_idl_start = time.time()
+        commit_block = txn.commit_block
+
+        def timed_commit_block():
+            commit_start = time.time()
+            self._observe('run_idl', commit_start - run_idl_start)
+            self.op_counts = get_txn_op_counts(txn)
+            self._check_op_counts()
+            try:
+                return commit_block()
+            finally:
+                self._observe('commit', time.time() - commit_start)
+        txn.commit_block = timed_commit_block
+
+    def do_commit(self):
+        self.started_at = time.time()
+        if self.queued_at is not None:
+            self._observe('queue', self.started_at - self.queued_at)
+        return super(OvnTransaction, self).do_commit()
+
+
 class OvsdbOvnIdl(ovn_api.API):
 
     ovsdb_connection = None
+    stats_logger = None
 
     def __init__(self, plugin, trigger):
         super(OvsdbOvnIdl, self).__init__()
@@ -46,16 +218,48 @@ class OvsdbOvnIdl(ovn_api.API):
             OvsdbOvnIdl.ovsdb_connection.start()
         self.idl = OvsdbOvnIdl.ovsdb_connection.idl
         self.ovsdb_timeout = cfg.get_ovn_ovsdb_timeout()
+        interval = cfg.get_ovsdb_stats_interval()
+        if interval and OvsdbOvnIdl.stats_logger is None:
+            OvsdbOvnIdl.stats_logger = loopingcall.FixedIntervalLoopingCall(
+                self.log_stats)
+            OvsdbOvnIdl.stats_logger.start(interval=interval,
+                                           initial_delay=interval)
+
+    def get_stats(self):
+        """Return the statistics of the OVN_Northbound DB replica.
+
+        :returns: dictionary with the 'tables' statistics (see
+                  get_replica_stats()) and the 'initial_dump_duration' in
+                  seconds
+        """
+        return {'tables': get_replica_stats(self.idl),
+                'initial_dump_duration': getattr(
+                    OvsdbOvnIdl.ovsdb_connection, 'initial_dump_duration',
+                    None)}
+
+    def log_stats(self):
+        stats = self.get_stats()
+        tables = stats['tables']
+        LOG.info(_LI("OVN_Northbound replica: %(rows)d rows, about "
+                     "%(bytes)d bytes, initial dump in %(dump).2fs. "
+                     "Tables: %(tables)s"),
+                 {'rows': sum(t['rows'] for t in tables.values()),
+                  'bytes': sum(t['bytes'] for t in tables.values()),
+                  'dump': stats['initial_dump_duration'] or 0,
+                  'tables': ', '.join(
+                      '%s %d rows/%d bytes' % (name, t['rows'], t['bytes'])
+                      for name, t in sorted(tables.items()))})
+        metrics.log_summary()
 
     @property
     def _tables(self):
         return self.idl.tables
 
     def transaction(self, check_error=False, log_errors=True, **kwargs):
-        return impl_idl.Transaction(self,
-                                    OvsdbOvnIdl.ovsdb_connection,
-                                    self.ovsdb_timeout,
-                                    check_error, log_errors)
+        return OvnTransaction(self,
+                              OvsdbOvnIdl.ovsdb_connection,
+                              self.ovsdb_timeout,
+                              check_error, log_errors)
 
     def create_lswitch(self, lswitch_name, may_exist=True, **columns):
         return cmd.AddLSwitchCommand(self, lswitch_name,
@@ -103,6 +307,13 @@ class OvsdbOvnIdl(ovn_api.API):
             result[row.name] = row.external_ids
         return result
 
+    def get_lswitch_ext_ids(self, name):
+        lswitch = idlutils.row_by_value(self.idl, 'Logical_Switch', 'name',
+                                        name, None)
+        if lswitch is None:
+            return None
+        return getattr(lswitch, 'external_ids', {})
+
     def get_all_logical_switches_with_ports(self):
         result = []
         for lswitch in self._tables['Logical_Switch'].rows.values():
@@ -143,3 +354,7 @@ class OvsdbOvnIdl(ovn_api.API):
 
     def delete_acl(self, lswitch, lport, if_exists=True):
         return cmd.DelACLCommand(self, lswitch, lport, if_exists)
+
+    def set_security_group_acls(self, lswitch, security_group, acls):
+        return cmd.SetSecurityGroupACLsCommand(self, lswitch, security_group,
+                                               acls)
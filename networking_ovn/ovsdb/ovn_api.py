@@ -131,6 +131,16 @@ class API(object):
         :returns: dictionary with lport name and ext ids
         """
 
+    @abc.abstractmethod
+    def get_lswitch_ext_ids(self, name):
+        """Returns the external ids of a logical switch
+
+        :param name: The name of the lswitch
+        :type name:  string
+        :returns:    dictionary with the lswitch ext ids or None if the
+                     lswitch does not exist
+        """
+
     @abc.abstractmethod
     def create_lrouter(self, name, may_exist=True, **columns):
         """Create a command to add an OVN lrouter
@@ -238,3 +248,26 @@ class API(object):
                              exist
         :type if_exists:     bool
     """
+
+    @abc.abstractmethod
+    def set_security_group_acls(self, lswitch, security_group, acls):
+        """Set the ACLs of a security group on a logical switch.
+
+        The match of each ACL is restricted to the logical ports of the
+        logical switch in the security group, which are read from the
+        replica when the command is run: the ports whose
+        'neutron:security_group_ids' external id lists the security group.
+        The ACLs of the security group which are not in acls are deleted,
+        the missing ones are created and the others are left untouched.
+
+        :param lswitch:        The logical switch of the ACLs
+        :type lswitch:         string
+        :param security_group: The security group the ACLs are associated
+                               with
+        :type security_group:  string
+        :param acls:           List of dictionaries of ACL columns
+                               Supported columns: see ACL table in
+                               OVN_Northbound
+        :type acls:            list
+        :returns:              :class:`Command` with no result
+        """
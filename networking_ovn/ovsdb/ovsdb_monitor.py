@@ -13,16 +13,21 @@
 #    under the License.
 
 import atexit
+import collections
 from eventlet import greenthread
 import Queue
 import retrying
 import threading
+import time
 
+from oslo_config import cfg
 from oslo_log import log
 from ovs.db import idl
 from ovs import poller
 
-from networking_ovn._i18n import _LE
+from networking_ovn._i18n import _, _LE, _LI, _LW
+from networking_ovn.common import config as ovn_config
+from networking_ovn.ovsdb import partition_locks
 from networking_ovn.ovsdb import row_event
 from neutron.agent.ovsdb.native import connection
 from neutron.agent.ovsdb.native import helpers
@@ -32,44 +37,86 @@ from neutron import worker
 
 LOG = log.getLogger(__name__)
 
-
-class LogicalPortCreateUpEvent(row_event.RowEvent):
-    """Row create event - Logical_Port 'up' = True.
-
-    On connection, we get a dump of all ports, so if there is a neutron
-    port that is down that has since been activated, we'll catch it here.
-    This event will not be generated for new ports getting created.
+# Tables and columns of the OVN_Northbound DB replicated by the api and rpc
+# workers.  These are the ones read or written by the OVN commands (see
+# networking_ovn.ovsdb.commands) and the OvsdbOvnIdl read methods.
+OVN_NB_API_TABLES = {
+    'Logical_Switch': ('name', 'ports', 'acls', 'external_ids'),
+    'Logical_Port': ('name', 'type', 'options', 'parent_name', 'tag',
+                     'addresses', 'port_security', 'enabled',
+                     'external_ids'),
+    'ACL': ('priority', 'direction', 'match', 'action', 'log',
+            'external_ids'),
+    'Logical_Router': ('name', 'ports', 'external_ids'),
+    'Logical_Router_Port': ('name', 'mac', 'network'),
+}
+
+# Tables and columns of the OVN_Northbound DB replicated by the ovn worker.
+# On top of the 'Logical_Port.up' column needed to handle the port status
+# events, the ovn worker also issues transactions (OVN-Northbound DB sync,
+# dhcp agent rescheduling) and so needs the tables used by the commands.
+OVN_NB_WORKER_TABLES = dict(
+    OVN_NB_API_TABLES,
+    Logical_Port=OVN_NB_API_TABLES['Logical_Port'] + ('up',))
+
+
+# Tables and columns of the OVN_Southbound DB monitored by the ovn worker,
+# when the OVN_Southbound monitor is enabled.
+OVN_SB_TABLES = {
+    'Port_Binding': ('logical_port', 'chassis'),
+    'Chassis': ('name', 'hostname'),
+}
+
+
+def register_tables(helper, tables):
+    """Register the given tables and columns with the schema helper.
+
+    :param helper:  ovs.db.idl.SchemaHelper object
+    :param tables:  dict mapping a table name to the tuple of its columns
+                    to register.  Tables and columns not present in the
+                    schema (e.g. with an older OVN version) are skipped.
     """
-
-    def __init__(self, plugin):
-        self.plugin = plugin
-        table = 'Logical_Port'
-        events = (self.ROW_CREATE)
-        super(LogicalPortCreateUpEvent, self).__init__(
-            events, table, (('up', '=', True),))
-        self.event_name = 'LogicalPortCreateUpEvent'
-
-    def run(self, event, row, old):
-        self.plugin.set_port_status_up(row.name)
-
-
-class LogicalPortCreateDownEvent(row_event.RowEvent):
-    """Row create event - Logical_Port 'up' = False
-
-    On connection, we get a dump of all ports, so if there is a neutron
-    port that is up that has since been deactivated, we'll catch it here.
-    This event will not be generated for new ports getting created.
-    """
-    def __init__(self, plugin):
-        self.plugin = plugin
-        table = 'Logical_Port'
-        events = (self.ROW_CREATE)
-        super(LogicalPortCreateDownEvent, self).__init__(
-            events, table, (('up', '=', False),))
-        self.event_name = 'LogicalPortCreateDownEvent'
-
-    def run(self, event, row, old):
-        self.plugin.set_port_status_down(row.name)
+    schema_tables = helper.schema_json['tables']
+    for table, columns in tables.items():
+        if table not in schema_tables:
+            LOG.debug("Table %s not found in the schema, not registering it",
+                      table)
+            continue
+        columns = [c for c in columns
+                   if c in schema_tables[table]['columns']]
+        helper.register_columns(table, columns)
+
+
+def get_schema_helper(connection, schema_name):
+    try:
+        return idlutils.get_schema_helper(connection, schema_name)
+    except Exception:
+        # We may have failed do to set-manager not being called
+        helpers.enable_connection_uri(connection)
+
+        # There is a small window for a race, so retry up to a second
+        @retrying.retry(wait_exponential_multiplier=10,
+                        stop_max_delay=1000)
+        def do_get_schema_helper():
+            return idlutils.get_schema_helper(connection, schema_name)
+        return do_get_schema_helper()
+
+
+def _get_lport_up(row):
+    # 'up' is an optional boolean column, which the IDL returns as a list
+    # holding zero or one value.
+    up = getattr(row, 'up', None)
+    if isinstance(up, list):
+        up = up[0] if up else None
+    return up
+
+
+def _partition_key(row):
+    # The Logical_Port rows are partitioned by their name, the neutron port
+    # id, the other rows by their uuid.
+    if row._table.name == 'Logical_Port':
+        return row.name
+    return str(row.uuid)
 
 
 class LogicalPortUpdateUpEvent(row_event.RowEvent):
@@ -112,6 +159,176 @@ class LogicalPortUpdateDownEvent(row_event.RowEvent):
         self.plugin.set_port_status_down(row.name)
 
 
+class LogicalPortStatusSyncEvent(row_event.RowEvent):
+    """Sync the port status of a batch of Logical_Port rows.
+
+    This event is not watched, it is queued by OvnIdl with the 'up' value
+    of the Logical_Port rows created (e.g. dumped again by the ovsdb-server
+    after a reconnection) during an IDL run loop iteration, so that their
+    port status is synced in bulk in the notify loop.
+    """
+    def __init__(self, plugin, lport_up):
+        self.plugin = plugin
+        self.lport_up = lport_up
+        table = 'Logical_Port'
+        events = (self.ROW_CREATE)
+        super(LogicalPortStatusSyncEvent, self).__init__(events, table, None)
+        self.event_name = 'LogicalPortStatusSyncEvent'
+
+    def run(self, event, row, old):
+        self.plugin.sync_port_status(self.lport_up)
+
+
+class PortBindingChassisSetEvent(row_event.RowEvent):
+    """Row update event - Port_Binding bound to a chassis
+
+    This happens when ovn-controller on the chassis of the VM claims the
+    port, before northd sets the Logical_Port 'up' in the OVN_Northbound
+    DB.
+    """
+    def __init__(self, plugin):
+        self.plugin = plugin
+        table = 'Port_Binding'
+        events = (self.ROW_UPDATE)
+        super(PortBindingChassisSetEvent, self).__init__(
+            events, table, (('chassis', '!=', []),),
+            old_conditions=(('chassis', '=', []),))
+        self.event_name = 'PortBindingChassisSetEvent'
+
+    def run(self, event, row, old):
+        self.plugin.set_port_status_up(row.logical_port)
+
+
+class PortBindingChassisClearedEvent(row_event.RowEvent):
+    """Row update event - Port_Binding unbound from its chassis
+
+    This happens when the VM goes down or ovn-controller on its chassis
+    exits.
+    """
+    def __init__(self, plugin):
+        self.plugin = plugin
+        table = 'Port_Binding'
+        events = (self.ROW_UPDATE)
+        super(PortBindingChassisClearedEvent, self).__init__(
+            events, table, (('chassis', '=', []),),
+            old_conditions=(('chassis', '!=', []),))
+        self.event_name = 'PortBindingChassisClearedEvent'
+
+    def run(self, event, row, old):
+        self.plugin.set_port_status_down(row.logical_port)
+
+
+class ChassisDeleteEvent(row_event.RowEvent):
+    """Row delete event - Chassis removed from the OVN_Southbound DB"""
+    def __init__(self):
+        table = 'Chassis'
+        events = (self.ROW_DELETE)
+        super(ChassisDeleteEvent, self).__init__(events, table, None)
+        self.event_name = 'ChassisDeleteEvent'
+
+    def run(self, event, row, old):
+        LOG.warning(_LW("Chassis %(name)s (host %(host)s) was removed from "
+                        "the OVN_Southbound DB, the ports bound to it are "
+                        "now down"),
+                    {'name': row.name, 'host': row.hostname})
+
+
+class TableChanges(object):
+    """Changes of an OVN NB table during an IDL run loop iteration.
+
+    :ivar created: The rows created
+    :ivar updated: Tuples of (row, changed) for the rows updated, changed
+                   being a dictionary of the new value of the (subscribed)
+                   columns changed
+    :ivar deleted: The rows deleted
+    """
+
+    def __init__(self, table, created, updated, deleted):
+        self.table = table
+        self.created = created
+        self.updated = updated
+        self.deleted = deleted
+
+
+class ChangeFeedSubscription(object):
+    """Subscription to the changes of an OVN NB table."""
+
+    def __init__(self, table, callback, columns=None):
+        self.table = table
+        self.callback = callback
+        self.columns = frozenset(columns) if columns else None
+        self.active = True
+        # Pending changes of the current IDL run loop iteration, by row
+        # uuid: [event, row, changed columns].
+        self._pending = collections.OrderedDict()
+
+    def _changed_columns(self, row, old):
+        columns = self.columns or row._table.columns
+        changed = {}
+        for column in columns:
+            try:
+                getattr(old, column)
+            except (KeyError, AttributeError):
+                # The old row only has the columns changed by the update.
+                continue
+            changed[column] = getattr(row, column)
+        return changed
+
+    def record(self, event, row, old=None):
+        pending = self._pending.get(row.uuid)
+        if event == idl.ROW_UPDATE:
+            changed = self._changed_columns(row, old) if old else {}
+            if not changed:
+                return
+            if pending is None:
+                self._pending[row.uuid] = [event, row, changed]
+            else:
+                # Created or updated earlier in this iteration.
+                pending[1] = row
+                if pending[0] == idl.ROW_UPDATE:
+                    pending[2].update(changed)
+        elif event == idl.ROW_DELETE:
+            if pending is not None and pending[0] == idl.ROW_CREATE:
+                del self._pending[row.uuid]
+            else:
+                self._pending[row.uuid] = [event, row, None]
+        else:
+            self._pending[row.uuid] = [event, row, None]
+
+    def pop_changes(self):
+        if not self._pending:
+            return None
+        created, updated, deleted = [], [], []
+        for event, row, changed in self._pending.values():
+            if event == idl.ROW_CREATE:
+                created.append(row)
+            elif event == idl.ROW_UPDATE:
+                updated.append((row, changed))
+            else:
+                deleted.append(row)
+        self._pending = collections.OrderedDict()
+        return TableChanges(self.table, created, updated, deleted)
+
+
+class ChangeFeedEvent(row_event.RowEvent):
+    """Deliver the changes of a table to a subscriber.
+
+    This event is not watched, it is queued by OvnIdl at the end of an IDL
+    run loop iteration for each subscription with pending changes.
+    """
+    def __init__(self, subscription, changes):
+        self.subscription = subscription
+        self.changes = changes
+        super(ChangeFeedEvent, self).__init__(
+            (self.ROW_CREATE, self.ROW_UPDATE, self.ROW_DELETE),
+            subscription.table, None)
+        self.event_name = 'ChangeFeedEvent'
+
+    def run(self, event, row, old):
+        if self.subscription.active:
+            self.subscription.callback(self.changes)
+
+
 class OvnNbNotifyHandler(object):
 
     STOP_EVENT = ("STOP", None, None, None)
@@ -159,22 +376,35 @@ class OvnNbNotifyHandler(object):
     def shutdown(self):
         self.notifications.put(OvnNbNotifyHandler.STOP_EVENT)
 
+    def drain(self, timeout):
+        """Wait for the queued notifications to be handled.
+
+        :returns: True if the queue was drained before the timeout
+        """
+        deadline = time.time() + timeout
+        while self.notifications.unfinished_tasks:
+            if time.time() > deadline:
+                return False
+            greenthread.sleep(0.1)
+        return True
+
     def notify_loop(self):
         while True:
+            match, event, row, updates = self.notifications.get()
             try:
-                match, event, row, updates = self.notifications.get()
                 if (not isinstance(match, row_event.RowEvent) and
-                        (match, event, row, updates) == OvnIdl.STOP_EVENT):
-                    self.notifications.task_done()
+                        (match, event, row, updates) ==
+                        OvnNbNotifyHandler.STOP_EVENT):
                     break
                 match.run(event, row, updates)
                 if match.ONETIME:
                     self.unwatch_event(match)
-                self.notifications.task_done()
             except Exception:
                 # If any unexpected exception happens we don't want the
                 # notify_loop to exit.
                 LOG.exception(_LE('Unexpected exception in notify_loop'))
+            finally:
+                self.notifications.task_done()
 
     def notify(self, event, row, updates=None):
         matching = self.matching_events(
@@ -187,16 +417,21 @@ class OvnIdl(idl.Idl):
 
     def __init__(self, plugin, remote, schema):
         super(OvnIdl, self).__init__(remote, schema)
+        self.plugin = plugin
         self._lp_update_up_event = LogicalPortUpdateUpEvent(plugin)
         self._lp_update_down_event = LogicalPortUpdateDownEvent(plugin)
-        self._lp_create_up_event = LogicalPortCreateUpEvent(plugin)
-        self._lp_create_down_event = LogicalPortCreateDownEvent(plugin)
 
         self.notify_handler = OvnNbNotifyHandler(plugin)
-        self.notify_handler.watch_events([self._lp_create_up_event,
-                                          self._lp_create_down_event,
-                                          self._lp_update_up_event,
+        self.notify_handler.watch_events([self._lp_update_up_event,
                                           self._lp_update_down_event])
+        # 'up' value of the Logical_Port rows created during the current IDL
+        # run loop iteration, once the initial port status sync is done.
+        self._lport_up_created = {}
+        self._port_status_synced = False
+        # Change feed subscriptions, replaced rather than modified so that
+        # notify() can iterate over them without locking.
+        self._subscriptions = ()
+        self._subscriptions_lock = threading.Lock()
         # ovsdb lock name to acquire.
         # This event lock is used to handle the notify events sent by idl.Idl
         # idl.Idl will call notify function for the "update" rpc method it
@@ -215,84 +450,404 @@ class OvnIdl(idl.Idl):
         #    ovsdb server would assign the lock to one of the other neutron
         #    servers.
         self.event_lock_name = "neutron_ovn_event_lock"
-
-    def notify(self, event, row, updates=None):
+        # When the events are partitioned across the neutron servers (see
+        # networking_ovn.ovsdb.partition_locks), the partition locks replace
+        # the event lock.
+        self.partition_locks = None
+        self._event_lock_held = False
+        # Set when the ovn worker stops, no new events are handled.
+        self.stopping = False
+
+    def _has_event_lock(self, row):
+        if self.partition_locks is not None:
+            return self.partition_locks.owns(_partition_key(row))
         # Do not handle the notification if the event lock is requested,
         # but not granted by the ovsdb-server.
-        if (self.is_lock_contended and not self.has_lock):
-            LOG.debug("Don't have the event lock to handle the notify"
-                      " events. Ignoring the event : %s", event)
+        return not (self.is_lock_contended and not self.has_lock)
+
+    def subscribe(self, table, callback, columns=None):
+        """Subscribe to the changes of an OVN NB table.
+
+        The changes are batched per IDL run loop iteration and the callback
+        is called with a TableChanges from the notify handler thread.  The
+        changes of the replica are delivered whether this neutron server
+        has the event lock or not.
+
+        :param table:    The name of the table
+        :type table:     string
+        :param callback: Function called with the TableChanges
+        :type callback:  callable
+        :param columns:  Only report the updates of these columns
+        :type columns:   list of strings or None for all the columns
+        :returns:        The subscription, to pass to unsubscribe()
+        """
+        subscription = ChangeFeedSubscription(table, callback, columns)
+        with self._subscriptions_lock:
+            self._subscriptions += (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.active = False
+        with self._subscriptions_lock:
+            self._subscriptions = tuple(
+                s for s in self._subscriptions if s is not subscription)
+
+    def notify(self, event, row, updates=None):
+        for subscription in self._subscriptions:
+            if subscription.table == row._table.name:
+                subscription.record(event, row, updates)
+        # Workers not holding the event lock drop the notification right
+        # away, without matching, logging or queueing it.  The event lock
+        # changes are logged once by run().
+        if self.stopping or not self._has_event_lock(row):
             return
-        LOG.debug("Have the event lock to handle the notify events")
+        if (self._port_status_synced and event == self.ROW_CREATE and
+                row._table.name == 'Logical_Port'):
+            up = _get_lport_up(row)
+            if up is not None:
+                self._lport_up_created[row.name] = up
         self.notify_handler.notify(event, row, updates)
 
-    def unwatch_logical_port_create_events(self):
-        """Unwatch the logical port create events.
+    def run(self):
+        changed = super(OvnIdl, self).run()
+        if self.partition_locks is not None:
+            self.partition_locks.run()
+        else:
+            self._log_event_lock_change()
+        self.flush_port_status()
+        self.flush_changes()
+        return changed
+
+    def _log_event_lock_change(self):
+        if self.has_lock == self._event_lock_held:
+            return
+        self._event_lock_held = self.has_lock
+        if self.has_lock:
+            LOG.info(_LI("Acquired the event lock %s, handling the "
+                         "OVN_Northbound events"), self.event_lock_name)
+        else:
+            LOG.info(_LI("Lost the event lock %s, ignoring the "
+                         "OVN_Northbound events"), self.event_lock_name)
+
+    def close(self):
+        super(OvnIdl, self).close()
+        if self.partition_locks is not None:
+            self.partition_locks.close()
+
+    def wait(self, poller):
+        super(OvnIdl, self).wait(poller)
+        if self.partition_locks is not None:
+            self.partition_locks.wait(poller)
+
+    def flush_port_status(self):
+        """Queue the port status sync of the Logical_Port rows created.
+
+        When the connection to the ovsdb-server is lost and the IDL can't
+        resume the monitoring, it gets a dump of all the rows again on
+        reconnection.  The port status of the dumped Logical_Port rows is
+        synced in bulk, once per IDL run loop iteration, rather than per
+        row.
+        """
+        if not self._lport_up_created:
+            return
+        lport_up, self._lport_up_created = self._lport_up_created, {}
+        LOG.debug("Queueing the port status sync of %d created logical "
+                  "ports", len(lport_up))
+        self.notify_handler.notifications.put(
+            (LogicalPortStatusSyncEvent(self.plugin, lport_up),
+             None, None, None))
+
+    def flush_changes(self):
+        """Queue the changes of the IDL run loop iteration to subscribers."""
+        for subscription in self._subscriptions:
+            changes = subscription.pop_changes()
+            if changes:
+                self.notify_handler.notifications.put(
+                    (ChangeFeedEvent(subscription, changes), None, None,
+                     None))
+
+    def sync_port_status(self):
+        """Sync the neutron port status with Logical_Port 'up' in bulk.
 
         When the ovs idl client connects to the ovsdb-server, it gets
-        a dump of all logical ports as events and we need to process them
-        at start up.
-        After the startup, there is no need to watch these events.
-        So unwatch these events.
+        a dump of all logical ports.  Instead of handling a create event
+        (and a DB transaction) per logical port, read the 'up' column of
+        all of them in one pass and let the plugin update only the
+        neutron ports whose status differs.
+        """
+        if self.partition_locks is not None:
+            if not self.partition_locks.owned:
+                LOG.debug("Don't own any event partition, skipping the "
+                          "port status sync")
+                return
+        elif self.is_lock_contended and not self.has_lock:
+            LOG.debug("Don't have the event lock, skipping the port "
+                      "status sync")
+            return
+        self.plugin.sync_port_status(self._get_lport_up_by_name())
+
+    def sync_partitions(self, partitions):
+        """Queue the port status sync of newly acquired event partitions.
+
+        Called from the IDL run loop, the sync itself is run by the notify
+        handler thread.
         """
-        self.notify_handler.unwatch_events([self._lp_create_up_event,
-                                            self._lp_create_down_event])
-        self._lp_create_up_event = None
-        self._lp_create_down_event = None
+        lport_up = self._get_lport_up_by_name(partitions)
+        self.notify_handler.notifications.put(
+            (LogicalPortStatusSyncEvent(self.plugin, lport_up),
+             None, None, None))
+
+    def _get_lport_up_by_name(self, partitions=None):
+        # Only the logical ports of the event partitions owned (or the
+        # given ones), when the events are partitioned.
+        if self.partition_locks is not None and partitions is None:
+            partitions = self.partition_locks.owned
+        lport_up = {}
+        for row in self.tables['Logical_Port'].rows.values():
+            if (partitions is not None and partition_locks.partition_of(
+                    row.name, self.partition_locks.partitions)
+                    not in partitions):
+                continue
+            up = _get_lport_up(row)
+            if up is not None:
+                lport_up[row.name] = up
+        return lport_up
+
+
+class OvnSbIdl(idl.Idl):
+
+    def __init__(self, plugin, remote, schema):
+        super(OvnSbIdl, self).__init__(remote, schema)
+        self.plugin = plugin
+        self.notify_handler = OvnNbNotifyHandler(plugin)
+        self.notify_handler.watch_events([
+            PortBindingChassisSetEvent(plugin),
+            PortBindingChassisClearedEvent(plugin),
+            ChassisDeleteEvent()])
+        # Like the OVN_Northbound event lock (see OvnIdl), only the neutron
+        # server owning this lock handles the OVN_Southbound events.
+        self.event_lock_name = "neutron_ovn_sb_event_lock"
+        self.stopping = False
 
+    def notify(self, event, row, updates=None):
+        if self.stopping or (self.is_lock_contended and not self.has_lock):
+            return
+        self.notify_handler.notify(event, row, updates)
 
-class OvnConnection(connection.Connection):
+
+class _RunLoopStopped(BaseException):
+    # Not an Exception, which the run loop would return as the result of
+    # the transaction.
+    pass
+
+
+class _StopTransaction(object):
+    """Queued by StoppableConnection.stop() to end the run loop.
+
+    The transactions queued before it are committed first.
+    """
+
+    def do_commit(self):
+        raise _RunLoopStopped()
+
+
+class StoppableConnection(connection.Connection):
+    """A connection whose run loop can be stopped with stop()."""
+
+    def __init__(self, *args, **kwargs):
+        super(StoppableConnection, self).__init__(*args, **kwargs)
+        self._stopped = False
+
+    def run(self):
+        try:
+            super(StoppableConnection, self).run()
+        except _RunLoopStopped:
+            pass
+        # The connection is closed by the run loop thread once it stopped
+        # using the idl.
+        self.idl.close()
+        # Don't leave the callers of the transactions queued after stop()
+        # waiting for their results.
+        while True:
+            txn = self.txns.get_nowait()
+            if txn is None:
+                break
+            ex = RuntimeError(_("The connection to the %s DB is closed") %
+                              self.schema_name)
+            txn.results.put(idlutils.ExceptionResult(ex=ex, tb=''))
+            self.txns.task_done()
+
+    def stop(self, timeout):
+        """Close the connection once the transactions queued are committed.
+
+        Waits for up to timeout seconds for the run loop to stop.
+        """
+        if self.idl is None or self._stopped:
+            return
+        self._stopped = True
+        try:
+            self.txns.put(_StopTransaction(), timeout=timeout)
+        except Queue.Full:
+            LOG.warning(_LW("Timeout waiting for a transaction to the %s DB "
+                            "to be committed, the connection is left open"),
+                        self.schema_name)
+            return
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            LOG.warning(_LW("Timeout waiting for the transactions to the %s "
+                            "DB to be committed, the connection will be "
+                            "closed once they are"), self.schema_name)
+
+    def wait(self):
+        thread = getattr(self, 'thread', None)
+        if thread is not None:
+            thread.join()
+
+
+class OvnMonitorConnection(StoppableConnection):
+    """Base class of the connections monitoring an OVN DB in the ovn worker.
+
+    The idl is expected to have a notify_handler and a 'stopping' flag.
+    """
+
+    def stop(self, timeout):
+        """Stop handling events and close the connection.
+
+        The events already queued are handled for up to timeout seconds,
+        then the connection to the ovsdb-server is closed once the
+        transactions queued are committed, which releases the event lock(s)
+        so that another neutron server takes over.
+        """
+        if self.idl is None or self._stopped:
+            return
+        self.idl.stopping = True
+        if not self.idl.notify_handler.drain(timeout):
+            LOG.warning(_LW("Timeout waiting for the %(db)s events to be "
+                            "handled, %(count)d events not handled"),
+                        {'db': self.schema_name,
+                         'count': self.idl.notify_handler.notifications.
+                         unfinished_tasks})
+        self.idl.notify_handler.shutdown()
+        super(OvnMonitorConnection, self).stop(timeout)
+
+
+def start_connection(conn, tables, create_idl, initial_dump_received=None):
+    """Start conn, replicating only the tables and columns in tables.
+
+    Same as connection.Connection.start(), except that the idl is created
+    by create_idl(helper) and that initial_dump_received() is called once
+    the initial dump of the DB is received, before the run loop starts.
+    """
+    with conn.lock:
+        if conn.idl is not None:
+            return
+
+        helper = get_schema_helper(conn.connection, conn.schema_name)
+        register_tables(helper, tables)
+        conn.idl = create_idl(helper)
+        start = time.time()
+        idlutils.wait_for_change(conn.idl, conn.timeout)
+        conn.initial_dump_duration = time.time() - start
+        if initial_dump_received is not None:
+            initial_dump_received()
+        conn.poller = poller.Poller()
+        conn.thread = threading.Thread(target=conn.run)
+        conn.thread.setDaemon(True)
+        conn.thread.start()
+
+
+class OvnApiConnection(StoppableConnection):
+    """Connection to the OVN_Northbound DB used by the api and rpc workers.
+
+    Same as connection.Connection, except that only the tables and columns
+    in OVN_NB_API_TABLES are replicated instead of the whole DB.
+    """
+
+    def start(self):
+        start_connection(self, OVN_NB_API_TABLES,
+                         lambda helper: idl.Idl(self.connection, helper))
+
+
+class OvnConnection(OvnMonitorConnection):
+    """Connection monitoring the OVN_Northbound DB in the ovn worker.
+
+    Only the tables and columns in OVN_NB_WORKER_TABLES are replicated.
+    """
 
     def start(self, plugin):
-        # The implementation of this function is same as the base class start()
-        # except that OvnIdl object is created instead of idl.Idl
-        with self.lock:
-            if self.idl is not None:
-                return
+        start_connection(self, OVN_NB_WORKER_TABLES,
+                         lambda helper: self._create_idl(plugin, helper),
+                         self._initial_dump_received)
+
+    def _create_idl(self, plugin, helper):
+        nb_idl = OvnIdl(plugin, self.connection, helper)
+        partitions = ovn_config.get_event_partitions()
+        if partitions > 1:
+            nb_idl.partition_locks = partition_locks.PartitionLocks(
+                self.connection, partitions, nb_idl.event_lock_name,
+                cfg.CONF.host, nb_idl.sync_partitions)
+        else:
+            nb_idl.set_lock(nb_idl.event_lock_name)
+        return nb_idl
+
+    def _initial_dump_received(self):
+        # We would have received the initial dump of all the logical
+        # ports by now. Sync the port status for all of them at once.
+        self.idl.sync_port_status()
+        self.idl._port_status_synced = True
+
+
+class OvnSbConnection(OvnMonitorConnection):
+    """Connection monitoring the OVN_Southbound DB in the ovn worker.
+
+    Only the tables and columns in OVN_SB_TABLES are replicated.
+    """
 
-            try:
-                helper = idlutils.get_schema_helper(self.connection,
-                                                    self.schema_name)
-            except Exception:
-                # We may have failed do to set-manager not being called
-                helpers.enable_connection_uri(self.connection)
-
-                # There is a small window for a race, so retry up to a second
-                @retrying.retry(wait_exponential_multiplier=10,
-                                stop_max_delay=1000)
-                def do_get_schema_helper():
-                    return idlutils.get_schema_helper(self.connection,
-                                                      self.schema_name)
-                helper = do_get_schema_helper()
-
-            helper.register_all()
-            self.idl = OvnIdl(plugin, self.connection, helper)
-            self.idl.set_lock(self.idl.event_lock_name)
-            idlutils.wait_for_change(self.idl, self.timeout)
-            # We would have received the initial dump of all the logical
-            # ports as events by now. Unwatch the create events for
-            # logical ports as it is no longer necessary.
-            self.idl.unwatch_logical_port_create_events()
-            self.poller = poller.Poller()
-            self.thread = threading.Thread(target=self.run)
-            self.thread.setDaemon(True)
-            self.thread.start()
+    def start(self, plugin):
+        start_connection(self, OVN_SB_TABLES,
+                         lambda helper: self._create_idl(plugin, helper))
+
+    def _create_idl(self, plugin, helper):
+        sb_idl = OvnSbIdl(plugin, self.connection, helper)
+        sb_idl.set_lock(sb_idl.event_lock_name)
+        return sb_idl
 
 
 class OvnWorker(worker.NeutronWorker):
+    def __init__(self, *args, **kwargs):
+        super(OvnWorker, self).__init__(*args, **kwargs)
+        self._connections = []
+        self._servers = []
+
     def start(self):
         super(OvnWorker, self).start()
         # NOTE(twilson) The super class will trigger the post_fork_initialize
         # in the plugin, which starts the connection/IDL notify loop which
         # keeps the process from exiting
 
+    def add_connection(self, conn):
+        """Register an OvnMonitorConnection to stop with the worker."""
+        self._connections.append(conn)
+
+    def add_server(self, server):
+        """Register a server, e.g. the OVSDB proxy, to stop with the worker.
+
+        The servers are stopped before the connections they use.
+        """
+        self._servers.append(server)
+
     def stop(self):
         """Stop service."""
-        # TODO(numans)
+        for server in self._servers:
+            server.stop()
+        timeout = ovn_config.get_ovn_worker_stop_timeout()
+        for conn in self._connections:
+            conn.stop(timeout)
 
     def wait(self):
         """Wait for service to complete."""
-        # TODO(numans)
+        for conn in self._connections:
+            conn.wait()
 
     @staticmethod
     def reset():
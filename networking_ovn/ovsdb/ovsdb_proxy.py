@@ -0,0 +1,337 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Sharing of the ovn worker's OVN_Northbound DB replica.
+
+Every neutron worker process keeping its own replica of the OVN_Northbound
+DB makes memory usage and the number of connections to the ovsdb-server
+grow with the number of workers.  When 'ovsdb_shared_replica' is enabled,
+the ovn worker serves the OVN API to the api and rpc workers of the same
+neutron server over a local unix socket.  The workers send the commands of
+a transaction (and the read calls) to the ovn worker, which runs them
+against its own replica and connection.
+
+The protocol is one JSON request line and one JSON reply line per
+connection.
+"""
+
+import errno
+import json
+import os
+import socket
+import time
+
+import eventlet
+from eventlet import greenthread
+from oslo_log import log
+from oslo_utils import excutils
+import six
+
+from neutron.agent.ovsdb import api
+
+from networking_ovn._i18n import _, _LE, _LI
+from networking_ovn.common import metrics
+from networking_ovn.common import profiling
+from networking_ovn.ovsdb import ovn_api
+
+LOG = log.getLogger(__name__)
+
+# ovn_api.API methods creating a command, which can be sent to the proxy.
+PROXY_COMMANDS = frozenset([
+    'create_lswitch', 'set_lswitch_ext_id', 'delete_lswitch',
+    'create_lport', 'set_lport', 'delete_lport',
+    'create_lrouter', 'update_lrouter', 'delete_lrouter',
+    'add_lrouter_port', 'delete_lrouter_port', 'set_lrouter_port_in_lport',
+    'add_acl', 'delete_acl', 'set_security_group_acls',
+])
+
+# ovn_api.API read methods, which can be called through the proxy.
+PROXY_READS = frozenset([
+    'get_all_logical_switches_ids', 'get_all_logical_ports_ids',
+    'get_all_logical_switches_with_ports', 'get_lswitch_ext_ids',
+])
+
+
+class OvsdbProxyServer(object):
+    """Serve the OVN API of the ovn worker on a unix socket."""
+
+    def __init__(self, api, path):
+        self.api = api
+        self.path = path
+        self._sock = None
+
+    def start(self):
+        try:
+            os.unlink(self.path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        # The requests are run with the credentials of the ovn worker, only
+        # let processes of the same user connect.  The socket is created
+        # with these permissions so that it is never reachable by others.
+        umask = os.umask(0o077)
+        try:
+            self._sock = eventlet.listen(self.path, family=socket.AF_UNIX)
+        finally:
+            os.umask(umask)
+        greenthread.spawn_n(self._serve, self._sock)
+        LOG.info(_LI("Serving the OVN_Northbound DB replica on %s"),
+                 self.path)
+
+    def stop(self):
+        if self._sock is None:
+            return
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(self.path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    def _serve(self, sock):
+        while self._sock is sock:
+            try:
+                conn, _addr = sock.accept()
+            except socket.error:
+                if self._sock is not sock:
+                    # The server was stopped.
+                    return
+                LOG.exception(_LE('Unexpected exception accepting an OVSDB '
+                                  'proxy connection'))
+                continue
+            greenthread.spawn_n(self._handle, conn)
+
+    def _handle(self, conn):
+        try:
+            stream = conn.makefile('rw')
+            request = json.loads(stream.readline())
+            reply = self.process_request(request)
+            stream.write(json.dumps(reply, default=str) + '\n')
+            stream.flush()
+        except Exception:
+            LOG.exception(_LE('Unexpected exception handling an OVSDB proxy '
+                              'request'))
+        finally:
+            conn.close()
+
+    def process_request(self, request):
+        method = request.get('method')
+        try:
+            if method == 'transaction':
+                # Keep the operation of the API worker, so that the
+                # transaction metrics are not all reported as unknown.
+                with metrics.operation(request.get('operation')):
+                    txn = self.api.transaction(
+                        check_error=True,
+                        log_errors=request.get('log_errors'))
+                    for name, args, kwargs in request['commands']:
+                        if name not in PROXY_COMMANDS:
+                            raise RuntimeError(_("Unsupported OVSDB proxy "
+                                                 "command %s") % name)
+                        txn.add(getattr(self.api, name)(*args, **kwargs))
+                    return {'result': txn.commit()}
+            if method not in PROXY_READS:
+                raise RuntimeError(_("Unsupported OVSDB proxy method "
+                                     "%s") % method)
+            return {'result': getattr(self.api, method)(
+                *request.get('args', []), **request.get('kwargs', {}))}
+        except Exception as e:
+            return {'error': six.text_type(e)}
+
+
+class OvsdbProxyClient(object):
+
+    def __init__(self, path, timeout):
+        self.path = path
+        self.timeout = timeout
+
+    def _connect(self):
+        # The ovn worker may not be serving yet (e.g. at neutron server
+        # start up), keep trying until the timeout.
+        deadline = time.time() + self.timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+                return sock
+            except socket.error:
+                sock.close()
+                if time.time() > deadline:
+                    raise
+            greenthread.sleep(0.5)
+
+    def call(self, method, **params):
+        request = dict(params, method=method)
+        sock = self._connect()
+        try:
+            stream = sock.makefile('rw')
+            stream.write(json.dumps(request) + '\n')
+            stream.flush()
+            reply = stream.readline()
+        finally:
+            sock.close()
+        if not reply:
+            raise RuntimeError(_("No reply from the OVSDB proxy %s") %
+                               self.path)
+        return json.loads(reply)
+
+
+class ProxyCommand(object):
+    """A command run by the ovn worker."""
+
+    def __init__(self, api, method, args, columns):
+        self.api = api
+        self.method = method
+        self.args = args
+        self.columns = columns
+        self.result = None
+
+    def execute(self, check_error=False, log_errors=True):
+        try:
+            with self.api.transaction(check_error, log_errors) as txn:
+                txn.add(self)
+            return self.result
+        except Exception:
+            with excutils.save_and_reraise_exception() as ctx:
+                if log_errors:
+                    LOG.exception(_LE("Error executing command"))
+                if not check_error:
+                    ctx.reraise = False
+
+    def __str__(self):
+        return "%s(%s)" % (self.method, ", ".join(
+            [str(a) for a in self.args] +
+            ["%s=%s" % (k, v) for k, v in sorted(self.columns.items())]))
+
+
+class ProxyTransaction(api.Transaction):
+
+    def __init__(self, api, check_error=False, log_errors=True):
+        self.api = api
+        self.check_error = check_error
+        self.log_errors = log_errors
+        self.commands = []
+
+    def add(self, command):
+        self.commands.append(command)
+        return command
+
+    def commit(self):
+        profiling.count('ovsdb_txns')
+        profiling.count('ovsdb_ops', len(self.commands))
+        with profiling.span('ovn_commit'):
+            reply = self.api.client.call(
+                'transaction', log_errors=self.log_errors,
+                operation=metrics.current_operation(),
+                commands=[(cmd.method, cmd.args, cmd.columns)
+                          for cmd in self.commands])
+        if 'error' in reply:
+            if self.log_errors:
+                LOG.error(_LE("OVSDB proxy transaction failed: %s"),
+                          reply['error'])
+            if self.check_error:
+                raise RuntimeError(reply['error'])
+            return
+        results = reply['result'] or []
+        for cmd, result in zip(self.commands, results):
+            cmd.result = result
+        return results
+
+
+class OvsdbProxyIdl(ovn_api.API):
+    """OVN API sending the commands to the ovn worker."""
+
+    def __init__(self, path, timeout):
+        super(OvsdbProxyIdl, self).__init__()
+        self.client = OvsdbProxyClient(path, timeout)
+
+    def _read(self, method, *args):
+        reply = self.client.call(method, args=args)
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return reply['result']
+
+    def transaction(self, check_error=False, log_errors=True, **kwargs):
+        return ProxyTransaction(self, check_error, log_errors)
+
+    def create_lswitch(self, lswitch_name, may_exist=True, **columns):
+        return ProxyCommand(self, 'create_lswitch',
+                            (lswitch_name, may_exist), columns)
+
+    def delete_lswitch(self, lswitch_name=None, ext_id=None, if_exists=True):
+        return ProxyCommand(self, 'delete_lswitch',
+                            (lswitch_name, ext_id, if_exists), {})
+
+    def set_lswitch_ext_id(self, lswitch_id, ext_id, if_exists=True):
+        return ProxyCommand(self, 'set_lswitch_ext_id',
+                            (lswitch_id, ext_id, if_exists), {})
+
+    def create_lport(self, lport_name, lswitch_name, may_exist=True,
+                     **columns):
+        return ProxyCommand(self, 'create_lport',
+                            (lport_name, lswitch_name, may_exist), columns)
+
+    def set_lport(self, lport_name, if_exists=True, **columns):
+        return ProxyCommand(self, 'set_lport', (lport_name, if_exists),
+                            columns)
+
+    def delete_lport(self, lport_name=None, lswitch=None,
+                     ext_id=None, if_exists=True):
+        return ProxyCommand(self, 'delete_lport',
+                            (lport_name, lswitch, ext_id, if_exists), {})
+
+    def get_all_logical_switches_ids(self):
+        return self._read('get_all_logical_switches_ids')
+
+    def get_all_logical_ports_ids(self):
+        return self._read('get_all_logical_ports_ids')
+
+    def get_lswitch_ext_ids(self, name):
+        return self._read('get_lswitch_ext_ids', name)
+
+    def get_all_logical_switches_with_ports(self):
+        return self._read('get_all_logical_switches_with_ports')
+
+    def create_lrouter(self, name, may_exist=True, **columns):
+        return ProxyCommand(self, 'create_lrouter', (name, may_exist),
+                            columns)
+
+    def update_lrouter(self, name, if_exists=True, **columns):
+        return ProxyCommand(self, 'update_lrouter', (name, if_exists),
+                            columns)
+
+    def delete_lrouter(self, name, if_exists=True):
+        return ProxyCommand(self, 'delete_lrouter', (name, if_exists), {})
+
+    def add_lrouter_port(self, name, lrouter, **columns):
+        return ProxyCommand(self, 'add_lrouter_port', (name, lrouter),
+                            columns)
+
+    def delete_lrouter_port(self, name, lrouter, if_exists=True):
+        return ProxyCommand(self, 'delete_lrouter_port',
+                            (name, lrouter, if_exists), {})
+
+    def set_lrouter_port_in_lport(self, lport, lrouter_port):
+        return ProxyCommand(self, 'set_lrouter_port_in_lport',
+                            (lport, lrouter_port), {})
+
+    def add_acl(self, lswitch, lport, **columns):
+        return ProxyCommand(self, 'add_acl', (lswitch, lport), columns)
+
+    def delete_acl(self, lswitch, lport, if_exists=True):
+        return ProxyCommand(self, 'delete_acl', (lswitch, lport, if_exists),
+                            {})
+
+    def set_security_group_acls(self, lswitch, security_group, acls):
+        return ProxyCommand(self, 'set_security_group_acls',
+                            (lswitch, security_group, acls), {})
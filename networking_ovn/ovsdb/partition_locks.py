@@ -0,0 +1,282 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Partitioning of the OVN_Northbound event handling across neutron servers.
+
+With a single ovsdb lock, the ovn worker of only one neutron server handles
+all the events.  Instead, the events are split in partitions (by hashing the
+row, e.g. the neutron port id of a Logical_Port) and each partition has its
+own ovsdb lock.  A neutron server handles the events of the partitions it
+holds the lock of.
+
+Each neutron server also holds one of the server slot locks.  It counts the
+neutron servers periodically by trying the locks of the other slots, ranks
+itself by its slot and waits for the locks of its share of the partitions,
+the partitions whose number modulo the number of servers is its rank.  It
+only takes the locks of the other partitions when they are free and it
+holds less than its fair share, and releases the partitions above its fair
+share when more neutron servers join.  When a neutron server dies, the
+ovsdb-server gives its locks to the servers waiting for them, so only its
+partitions move.
+
+The ovs IDL supports a single lock per session, so the locks are requested
+on a separate JSON-RPC session to the ovsdb-server.
+"""
+
+import hashlib
+import time
+
+from oslo_log import log
+from ovs import jsonrpc
+
+from networking_ovn._i18n import _LI, _LW
+from networking_ovn.common import constants as ovn_const
+
+LOG = log.getLogger(__name__)
+
+
+# Kinds of the lock requests.
+_SLOT = 'slot'
+_PARTITION = 'partition'
+_FREE_PARTITION = 'free_partition'
+
+
+def _hash(key):
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:8], 16)
+
+
+def partition_of(key, partitions):
+    """Return the partition of a key, the same on all the neutron servers."""
+    return _hash(key) % partitions
+
+
+class PartitionLocks(object):
+    """Ownership of the event partitions through ovsdb locks.
+
+    run() and wait() are meant to be called from the IDL run loop.
+    """
+
+    def __init__(self, remote, partitions, lock_prefix, host, on_acquired,
+                 max_delay=ovn_const.EVENT_PARTITION_LOCK_MAX_DELAY,
+                 interval=ovn_const.EVENT_PARTITION_REBALANCE_INTERVAL):
+        """Create the partition locks
+
+        :param remote:      The connection string of the ovsdb-server
+        :param partitions:  The number of partitions
+        :param lock_prefix: The prefix of the lock names
+        :param host:        The name of this neutron server, used to spread
+                            the lock requests of the neutron servers
+        :param on_acquired: Function called with the set of the partitions
+                            acquired
+        :param max_delay:   The maximum delay in seconds before taking a
+                            server slot and requesting the partition locks
+        :param interval:    The interval in seconds between the counts of
+                            the neutron servers
+        """
+        self.session = jsonrpc.Session.open(remote)
+        self.partitions = partitions
+        self.lock_names = ['%s_%d' % (lock_prefix, p)
+                           for p in range(partitions)]
+        # There is no use for more neutron servers than partitions, the
+        # servers without a slot only take the partitions left free.
+        self.slot_names = ['%s_server_%d' % (lock_prefix, s)
+                           for s in range(partitions)]
+        self._partition_by_lock = dict(
+            (name, p) for p, name in enumerate(self.lock_names))
+        self.host = host
+        self.on_acquired = on_acquired
+        self.max_delay = max_delay
+        self.interval = interval
+        self._seqno = None
+        self._reset()
+
+    def _reset(self):
+        self.owned = frozenset()
+        self.slot = None
+        self.servers = 1
+        # Time of the next count of the neutron servers.
+        self._next_count = None
+        # Slot -> whether its lock was free, for the count in progress.
+        self._count = None
+        self._last_count = None
+        # Partitions of this server's share, whose lock is requested.
+        self._waiting = set()
+        # Id of the lock requests sent -> (kind, slot or partition).
+        self._requests = {}
+
+    def _request_delay(self):
+        return self.max_delay * _hash(self.host) / float(0xffffffff)
+
+    def owns(self, key):
+        return partition_of(key, self.partitions) in self.owned
+
+    def _lock(self, name, kind, index):
+        msg = jsonrpc.Message.create_request('lock', [name])
+        self.session.send(msg)
+        self._requests[msg.id] = (kind, index)
+
+    def _unlock(self, name):
+        # Releases the lock, or cancels the lock request.
+        self.session.send(jsonrpc.Message.create_request('unlock', [name]))
+
+    def _share(self):
+        # The fair share of the partitions, rounded down and up.
+        servers = min(self.servers, self.partitions)
+        return (self.partitions // servers, -(-self.partitions // servers))
+
+    def _rank(self):
+        if self.slot is None:
+            return None
+        return len([s for s, free in self._count.items()
+                    if not free and s < self.slot])
+
+    def _start_count(self):
+        self._next_count = None
+        self._count = {}
+        for s, name in enumerate(self.slot_names):
+            if s != self.slot:
+                self._lock(name, _SLOT, s)
+
+    def _counted(self, slot, free):
+        self._count[slot] = free
+        if not free or self.slot is not None:
+            self._unlock(self.slot_names[slot])
+        if len(self._count) < len(self.slot_names) - (self.slot is not None):
+            return
+
+        if self.slot is None:
+            # Keep the first free slot, starting from the host's one.
+            first = _hash(self.host) % len(self.slot_names)
+            order = sorted(self._count, key=lambda s: (s - first) %
+                           len(self.slot_names))
+            for s in order:
+                if self._count[s]:
+                    if self.slot is None:
+                        self.slot = s
+                    else:
+                        self._unlock(self.slot_names[s])
+            if self.slot is not None:
+                del self._count[self.slot]
+
+        servers = len([s for s in self._count if not self._count[s]]) + 1
+        # Another server counting at the same time briefly holds the free
+        # slots, the lowest of the last two counts is used so that the
+        # partitions aren't released on a miscount.
+        self.servers = min(servers, self._last_count or servers)
+        self._last_count = servers
+        self._next_count = time.time() + self.interval
+        self._rebalance()
+
+    def _rebalance(self):
+        rank = self._rank()
+        share = set(p for p in range(self.partitions)
+                    if rank is not None and
+                    p % min(self.servers, self.partitions) == rank)
+        # The partitions whose free lock is being tried.
+        trying = set(index for kind, index in self._requests.values()
+                     if kind == _FREE_PARTITION)
+        for p in sorted(share - self.owned - self._waiting - trying):
+            self._waiting.add(p)
+            self._lock(self.lock_names[p], _PARTITION, p)
+        for p in sorted(self._waiting - share):
+            self._waiting.discard(p)
+            self._unlock(self.lock_names[p])
+
+        # The other partitions owned above the fair share are released to
+        # the servers waiting for them.
+        low, high = self._share()
+        released = sorted(self.owned - share)[:len(self.owned) - low]
+        if released:
+            for p in released:
+                self._unlock(self.lock_names[p])
+            self.owned = self.owned - set(released)
+            LOG.info(_LI("Released the event partitions %(released)s to the "
+                         "other neutron servers, owning %(owned)d of "
+                         "%(partitions)d"),
+                     {'released': released, 'owned': len(self.owned),
+                      'partitions': self.partitions})
+        elif len(self.owned) < high:
+            # Only the free locks of the other partitions are taken.
+            for p in range(self.partitions):
+                if p not in self.owned | self._waiting | trying:
+                    self._lock(self.lock_names[p], _FREE_PARTITION, p)
+
+    def run(self):
+        self.session.run()
+        seqno = self.session.get_seqno()
+        if seqno != self._seqno:
+            # (Re)connected or disconnected, the locks are lost.
+            self._seqno = seqno
+            if self.owned:
+                LOG.warning(_LW("Lost the event partitions %s"),
+                            sorted(self.owned))
+            self._reset()
+            if self.session.is_connected():
+                self._next_count = time.time() + self._request_delay()
+
+        if self._next_count is not None and self._next_count <= time.time():
+            self._start_count()
+
+        acquired = set()
+        while True:
+            msg = self.session.recv()
+            if msg is None:
+                break
+            if (msg.type in (jsonrpc.Message.T_REPLY,
+                             jsonrpc.Message.T_ERROR) and
+                    msg.id in self._requests):
+                kind, index = self._requests.pop(msg.id)
+                locked = bool(msg.type == jsonrpc.Message.T_REPLY and
+                              msg.result.get('locked'))
+                if kind == _SLOT:
+                    self._counted(index, locked)
+                elif kind == _PARTITION:
+                    if locked and index in self._waiting:
+                        self._waiting.discard(index)
+                        acquired.add(index)
+                        self.owned = self.owned | set([index])
+                elif locked and len(self.owned) < self._share()[1]:
+                    acquired.add(index)
+                    self.owned = self.owned | set([index])
+                else:
+                    self._unlock(self.lock_names[index])
+            elif (msg.type == jsonrpc.Message.T_NOTIFY and msg.params and
+                    msg.params[0] in self._partition_by_lock):
+                p = self._partition_by_lock[msg.params[0]]
+                if msg.method == 'locked' and p in self._waiting:
+                    self._waiting.discard(p)
+                    acquired.add(p)
+                    self.owned = self.owned | set([p])
+                elif msg.method == 'stolen':
+                    LOG.warning(_LW("The event partition %d was stolen"), p)
+                    acquired.discard(p)
+                    self.owned = self.owned - set([p])
+
+        # The partitions acquired may have been released by a rebalance.
+        acquired &= self.owned
+        if acquired:
+            LOG.info(_LI("Acquired the event partitions %(acquired)s, "
+                         "owning %(owned)d of %(partitions)d"),
+                     {'acquired': sorted(acquired),
+                      'owned': len(self.owned),
+                      'partitions': self.partitions})
+            self.on_acquired(acquired)
+
+    def wait(self, poller):
+        self.session.wait(poller)
+        self.session.recv_wait(poller)
+        if self._next_count is not None:
+            delay = self._next_count - time.time()
+            poller.timer_wait(max(0, int(delay * 1000)))
+
+    def close(self):
+        self.session.close()
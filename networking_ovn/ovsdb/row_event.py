@@ -13,15 +13,117 @@
 #    under the License.
 
 import abc
+import operator
 
 from oslo_log import log as logging
 from ovs.db import idl
 import six
 
-from neutron.agent.ovsdb.native import idlutils
+from networking_ovn._i18n import _
 
 LOG = logging.getLogger(__name__)
 
+# Operators supported in the RowEvent conditions, as a mapping of the
+# operator name to a function taking the column value and the value to
+# match against.  Use register_operator() to add new ones.
+OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda val, match: val in match,
+    'not in': lambda val, match: val not in match,
+}
+
+# Operator matching when the column has changed in the update, the value to
+# match against is ignored.
+CHANGED = 'changed'
+
+
+def register_operator(op, func):
+    """Register an operator for the RowEvent conditions
+
+    :param op:   The name of the operator
+    :type op:    string
+    :param func: Function returning whether the column value (first
+                 argument) matches the value of the condition (second
+                 argument)
+    :type func:  callable
+    """
+    OPERATORS[op] = func
+
+
+def _unwrap(val):
+    # The ovs IDL returns the value of an optional column as a list with
+    # zero or one element, compare it as a scalar.
+    if isinstance(val, list) and len(val) <= 1:
+        return val[0] if val else None
+    return val
+
+
+def _compile_condition(condition):
+    column, op, match = condition
+    if op == CHANGED:
+        def changed(row, old):
+            if old is None:
+                return False
+            try:
+                getattr(old, column)
+            except (KeyError, AttributeError):
+                # The old row only has the columns changed by the update.
+                return False
+            return True
+        return changed
+    try:
+        func = OPERATORS[op]
+    except KeyError:
+        raise ValueError(_("Unsupported RowEvent condition operator "
+                           "%s") % op)
+    if isinstance(match, dict):
+        # As idlutils.row_match(), a map column (e.g. external_ids) matches
+        # if the operator matches for each key of the condition, the other
+        # keys of the column are ignored.
+        items = tuple(match.items())
+
+        def map_predicate(row, old):
+            val = getattr(row, column)
+            for key, value in items:
+                if not func(val.get(key), value):
+                    return False
+            return True
+        return map_predicate
+    if op in ('=', '!='):
+        match = _unwrap(match)
+
+    def predicate(row, old):
+        return func(_unwrap(getattr(row, column)), match)
+    return predicate
+
+
+def compile_conditions(conditions):
+    """Compile RowEvent conditions into a predicate
+
+    :param conditions: Tuple of (column, operator, value) conditions, all
+                       of them must match
+    :type conditions:  tuple
+    :returns:          Function taking the row and the old row (or None)
+                       and returning whether all the conditions match
+    """
+    predicates = [_compile_condition(c) for c in conditions or ()]
+    if not predicates:
+        return lambda row, old: True
+    if len(predicates) == 1:
+        return predicates[0]
+
+    def match_all(row, old):
+        for predicate in predicates:
+            if not predicate(row, old):
+                return False
+        return True
+    return match_all
+
 
 @six.add_metaclass(abc.ABCMeta)
 class RowEvent(object):
@@ -36,6 +138,8 @@ class RowEvent(object):
         self.conditions = conditions
         self.old_conditions = old_conditions
         self.event_name = 'RowEvent'
+        self._match = compile_conditions(conditions)
+        self._match_old = compile_conditions(old_conditions)
 
     def _key(self):
         return (self.__class__, self.table, self.events, self.conditions)
@@ -51,21 +155,22 @@ class RowEvent(object):
             return False
         if row._table.name != self.table:
             return False
-        if self.conditions and not idlutils.row_match(row, self.conditions):
+        if self.conditions and not self._match(row, old):
             return False
         if self.old_conditions:
             if not old:
                 return False
             try:
-                if not idlutils.row_match(old, self.old_conditions):
+                if not self._match_old(old, None):
                     return False
             except (KeyError, AttributeError):
                 # Its possible that old row may not have all columns in it
                 return False
 
-        LOG.debug("%s : Matched %s, %s, %s %s", self.event_name, self.table,
-                  str(self.events), str(self.conditions),
-                  str(self.old_conditions))
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug("%s : Matched %s, %s, %s %s", self.event_name,
+                      self.table, self.events, self.conditions,
+                      self.old_conditions)
         return True
 
     @abc.abstractmethod
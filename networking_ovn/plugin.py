@@ -12,7 +12,9 @@
 #    under the License.
 
 import collections
+import threading
 
+from eventlet import greenthread
 import netaddr
 import six
 
@@ -21,7 +23,6 @@ from oslo_log import log
 from oslo_utils import importutils
 from sqlalchemy.orm import exc as sa_exc
 
-from neutron.agent.ovsdb.native import idlutils
 from neutron.api.rpc.agentnotifiers import dhcp_rpc_agent_api
 from neutron.api.rpc.agentnotifiers import l3_rpc_agent_api
 from neutron.api.rpc.handlers import dhcp_rpc
@@ -54,12 +55,17 @@ from neutron.extensions import portbindings
 from neutron.extensions import providernet as pnet
 
 from networking_ovn._i18n import _, _LE, _LI, _LW
+from networking_ovn.common import acl
 from networking_ovn.common import config
 from networking_ovn.common import constants as ovn_const
+from networking_ovn.common import metrics
+from networking_ovn.common import profiling
+from networking_ovn.common import remote_groups
 from networking_ovn.common import utils
 from networking_ovn import ovn_nb_sync
 from networking_ovn.ovsdb import impl_idl_ovn
 from networking_ovn.ovsdb import ovsdb_monitor
+from networking_ovn.ovsdb import ovsdb_proxy
 
 LOG = log.getLogger(__name__)
 
@@ -100,6 +106,13 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
                                    "net-mtu"]
 
     def __init__(self):
+        # The connection to the OVN_Northbound DB is created after the
+        # neutron workers are forked, see post_fork_initialize().
+        self._ovn_idl = None
+        self._ovn_idl_lock = threading.Lock()
+        self._ovn_trigger = None
+        self._remote_group_cache = remote_groups.RemoteGroupCache(
+            config.get_remote_group_cache_ttl())
         super(OVNPlugin, self).__init__()
         LOG.info(_LI("Starting OVNPlugin"))
         self._setup_base_binding_dict()
@@ -133,26 +146,89 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
                 }
             }
 
+    @property
+    def _ovn(self):
+        # The api and rpc workers connect to the OVN_Northbound DB lazily,
+        # on first use, so that they can serve the API calls not requiring
+        # OVN (e.g. read-only calls) without waiting for the initial dump
+        # of the OVN_Northbound DB.
+        if self._ovn_idl is None:
+            with self._ovn_idl_lock:
+                if self._ovn_idl is None:
+                    self._ovn_idl = self._create_ovn_idl()
+        return self._ovn_idl
+
+    @_ovn.setter
+    def _ovn(self, ovn_idl):
+        self._ovn_idl = ovn_idl
+
+    def _is_ovn_worker(self):
+        return self._ovn_trigger.im_class == ovsdb_monitor.OvnWorker
+
+    def _create_ovn_idl(self):
+        if self._ovn_trigger is None:
+            raise RuntimeError(_("The connection to the OVN_Northbound DB "
+                                 "is not initialized yet"))
+        if config.is_ovsdb_shared_replica() and not self._is_ovn_worker():
+            # Use the OVN_Northbound DB replica of the ovn worker.
+            return ovsdb_proxy.OvsdbProxyIdl(
+                config.get_ovsdb_proxy_socket(),
+                config.get_ovn_ovsdb_timeout())
+        return impl_idl_ovn.OvsdbOvnIdl(self, self._ovn_trigger)
+
+    def _warm_up_ovn(self):
+        try:
+            self._ovn
+        except Exception:
+            LOG.exception(_LE('Unable to connect to the OVN_Northbound DB, '
+                              'retrying on first use'))
+
     def post_fork_initialize(self, resource, event, trigger, **kwargs):
-        self._ovn = impl_idl_ovn.OvsdbOvnIdl(self, trigger)
-
-        if trigger.im_class == ovsdb_monitor.OvnWorker:
-            # Call the synchronization task if its ovn worker
-            # This sync neutron DB to OVN-NB DB only in inconsistent states
-            self.synchronizer = ovn_nb_sync.OvnNbSynchronizer(
-                self, self._ovn, config.get_ovn_neutron_sync_mode())
-            self.synchronizer.sync()
-
-            # start periodic check task to monitor the dhcp agents.
-            # This task is created in the Ovn Worker and not in the parent
-            # neutron process because
-            # - dhcp agent scheduler calls port_update to reschedule a network
-            #   from a dead dhcp agent to active one and idl object
-            #   (self._ovn) is not created in the main neutron process plugin
-            #   object.
-            # - Its created only in the worker processes.
-            # - Ovn worker seems to be the right candidate.
-            self.start_periodic_dhcp_agent_status_check()
+        self._ovn_trigger = trigger
+        if not self._is_ovn_worker():
+            # Connect to the OVN_Northbound DB in the background, the API
+            # calls needing it before it is ready wait for it in _ovn.
+            greenthread.spawn_n(self._warm_up_ovn)
+            return
+
+        # The ovn worker connects right away as the connection is what
+        # monitors the OVN_Northbound DB for the port status events.
+        self._ovn = self._create_ovn_idl()
+        # Let the ovn worker drain the events and close the connection
+        # when it is stopped.
+        worker = trigger.im_self
+        worker.add_connection(self._ovn.ovsdb_connection)
+        if config.is_ovsdb_shared_replica():
+            self._ovsdb_proxy = ovsdb_proxy.OvsdbProxyServer(
+                self._ovn, config.get_ovsdb_proxy_socket())
+            self._ovsdb_proxy.start()
+            worker.add_server(self._ovsdb_proxy)
+
+        # Optionally monitor the OVN_Southbound DB for the port bindings,
+        # which are updated before the Logical_Port 'up' column.
+        if config.get_ovn_sb_connection():
+            self._ovn_sb_connection = ovsdb_monitor.OvnSbConnection(
+                config.get_ovn_sb_connection(),
+                config.get_ovn_ovsdb_timeout(), 'OVN_Southbound')
+            self._ovn_sb_connection.start(self)
+            worker.add_connection(self._ovn_sb_connection)
+
+        # Call the synchronization task if its ovn worker
+        # This sync neutron DB to OVN-NB DB only in inconsistent states
+        self.synchronizer = ovn_nb_sync.OvnNbSynchronizer(
+            self, self._ovn, config.get_ovn_neutron_sync_mode())
+        self.synchronizer.sync()
+
+        # start periodic check task to monitor the dhcp agents.
+        # This task is created in the Ovn Worker and not in the parent
+        # neutron process because
+        # - dhcp agent scheduler calls port_update to reschedule a network
+        #   from a dead dhcp agent to active one and idl object
+        #   (self._ovn) is not created in the main neutron process plugin
+        #   object.
+        # - Its created only in the worker processes.
+        # - Ovn worker seems to be the right candidate.
+        self.start_periodic_dhcp_agent_status_check()
 
     def _setup_rpc(self):
         self.endpoints = [dhcp_rpc.DhcpRpcCallback(),
@@ -199,6 +275,7 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
             res = None
         return res
 
+    @metrics.tag_operation
     def create_network(self, context, network):
         net = network['network']  # obviously..
         ext_ids = {}
@@ -273,6 +350,7 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
                                      check_error=True)
         return network
 
+    @metrics.tag_operation
     def delete_network(self, context, network_id):
         first_try = True
         while True:
@@ -324,6 +402,7 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
             utils.ovn_name(network_id),
             ext_id).execute(check_error=True)
 
+    @metrics.tag_operation
     def update_network(self, context, network_id, network):
         pnet._raise_if_updates_provider_attributes(network['network'])
         # FIXME(arosen) - rollback...
@@ -335,8 +414,9 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
             self._process_l3_update(context, result, network['network'])
             return result
 
+    @metrics.tag_operation
     def update_port(self, context, id, port):
-        with context.session.begin(subtransactions=True):
+        with profiling.span('db'), context.session.begin(subtransactions=True):
             # FIXME(arosen): if binding data isn't passed in here
             # we should fetch it from the db instead and not set it to
             # None since neutron implements patch sematics for updates
@@ -363,8 +443,11 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
 
     def _update_port_in_ovn(self, context, original_port, port,
                             ovn_port_info):
-        external_ids = {
-            ovn_const.OVN_PORT_NAME_EXT_ID_KEY: port['name']}
+        external_ids = self._lport_external_ids(port)
+        old_sg_ids = set(original_port.get('security_groups', []))
+        new_sg_ids = set(port.get('security_groups', []))
+        detached_sg_ids = old_sg_ids - new_sg_ids
+        attached_sg_ids = new_sg_ids - old_sg_ids
         with self._ovn.transaction(check_error=True) as txn:
             txn.add(self._ovn.set_lport(lport_name=port['id'],
                     addresses=ovn_port_info.addresses,
@@ -385,12 +468,18 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
             self._add_acls(context, port, txn,
                            sg_ports_cache=sg_ports_cache,
                            subnet_cache=subnet_cache)
+            if config.is_acl_per_security_group():
+                # For all the security groups of the port, not only the
+                # attached ones: its own ACLs, if any, were deleted above.
+                self._add_security_group_acls(
+                    context, sorted(new_sg_ids | detached_sg_ids),
+                    [port['network_id']], txn,
+                    sg_ports_cache=sg_ports_cache,
+                    subnet_cache=subnet_cache)
+
+        self._update_remote_group_cache(context, port, subnet_cache)
 
         # Refresh remote security groups for changed security groups
-        old_sg_ids = set(original_port.get('security_groups', []))
-        new_sg_ids = set(port.get('security_groups', []))
-        detached_sg_ids = old_sg_ids - new_sg_ids
-        attached_sg_ids = new_sg_ids - old_sg_ids
         for sg_id in (attached_sg_ids | detached_sg_ids):
             self._refresh_remote_security_group(
                 context, sg_id,
@@ -483,8 +572,9 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
                     cfg.CONF.ovn.vhost_sock_dir, port_res['id'])
                 })
 
+    @metrics.tag_operation
     def create_port(self, context, port):
-        with context.session.begin(subtransactions=True):
+        with profiling.span('db'), context.session.begin(subtransactions=True):
             binding_profile = self.get_data_from_binding_profile(
                 context, port['port'])
 
@@ -556,7 +646,9 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
         else:
             portdir = 'inport'
             remote_portdir = 'outport'
-        match = '%s == "%s"' % (portdir, port['id'])
+        match = ''
+        if port is not None:
+            match = '%s == "%s"' % (portdir, port['id'])
         return match, remote_portdir
 
     def _acl_ethertype(self, r):
@@ -564,11 +656,11 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
         ip_version = None
         icmp = None
         if r['ethertype'] == 'IPv4':
-            match = ' && ip4'
+            match = 'ip4'
             ip_version = 'ip4'
             icmp = 'icmp4'
         elif r['ethertype'] == 'IPv6':
-            match = ' && ip6'
+            match = 'ip6'
             ip_version = 'ip6'
             icmp = 'icmp6'
         return match, ip_version, icmp
@@ -577,8 +669,8 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
         if not r['remote_ip_prefix']:
             return ''
         src_or_dst = 'src' if r['direction'] == 'ingress' else 'dst'
-        return ' && %s.%s == %s' % (ip_version, src_or_dst,
-                                    r['remote_ip_prefix'])
+        return '%s.%s == %s' % (ip_version, src_or_dst,
+                                r['remote_ip_prefix'])
 
     def _acl_get_subnet_from_cache(self, context, subnet_cache, subnet_id):
         if subnet_id in subnet_cache:
@@ -589,63 +681,86 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
                 subnet_cache[subnet_id] = subnet
             return subnet
 
-    def _acl_remote_match_ip(self, context, sg_ports, subnet_cache,
-                             ip_version, src_or_dst):
-        ip_version_map = {'ip4': 4,
-                          'ip6': 6}
-        match = ''
-        port_ids = [sg_port['port_id'] for sg_port in sg_ports]
-        ports = self.get_ports(context, filters={'id': port_ids})
-        for port in ports:
-            for fixed_ip in port['fixed_ips']:
-                subnet = self._acl_get_subnet_from_cache(context,
-                                                         subnet_cache,
-                                                         fixed_ip['subnet_id'])
-                if subnet['ip_version'] == ip_version_map.get(ip_version):
-                    match += '%s.%s == %s || ' % (ip_version,
-                                                  src_or_dst,
-                                                  fixed_ip['ip_address'])
-
-        if match:
-            match = match[:-4]  # Remove the last ' || '
-            match = ' && (%s)' % match
-
-        return match
+    def _acl_port_ips(self, context, port, subnet_cache):
+        # The IPv4 and IPv6 addresses of the fixed IPs of a port.
+        ipv4 = []
+        ipv6 = []
+        for fixed_ip in port['fixed_ips']:
+            subnet = self._acl_get_subnet_from_cache(context, subnet_cache,
+                                                     fixed_ip['subnet_id'])
+            if subnet['ip_version'] == 4:
+                ipv4.append(fixed_ip['ip_address'])
+            elif subnet['ip_version'] == 6:
+                ipv6.append(fixed_ip['ip_address'])
+        return tuple(ipv4), tuple(ipv6)
+
+    def _acl_remote_group(self, context, remote_group_id, sg_ports_cache,
+                          subnet_cache):
+        def load(sg_id):
+            if sg_id in sg_ports_cache:
+                sg_ports = sg_ports_cache[sg_id]
+            else:
+                filters = {'security_group_id': [sg_id]}
+                sg_ports = self._get_port_security_group_bindings(context,
+                                                                  filters)
+                sg_ports_cache[sg_id] = sg_ports
+            if not sg_ports:
+                return {}
+            port_ids = [sg_port['port_id'] for sg_port in sg_ports]
+            ports = self.get_ports(context, filters={'id': port_ids},
+                                   fields=['id', 'fixed_ips'])
+            return dict((port['id'],
+                         self._acl_port_ips(context, port, subnet_cache))
+                        for port in ports)
+
+        def revision(sg_id):
+            return self._remote_group_revision(context, sg_id)
+
+        return self._remote_group_cache.get(remote_group_id, load,
+                                            revision=revision)
+
+    def _remote_group_revision(self, context, security_group_id):
+        # The revision of the addresses of the ports of a security group in
+        # the Neutron DB, which may have been changed by the other neutron
+        # server processes since they were cached.
+        binding = securitygroups_db.SecurityGroupPortBinding
+        query = context.session.query(
+            binding.port_id, models_v2.IPAllocation.ip_address).outerjoin(
+            models_v2.IPAllocation,
+            models_v2.IPAllocation.port_id == binding.port_id).filter(
+            binding.security_group_id == security_group_id)
+        return remote_groups.addresses_revision(query)
 
     def _acl_remote_group_id(self, context, r, sg_ports_cache, subnet_cache,
                              port, remote_portdir, ip_version):
         if not r['remote_group_id']:
             return '', False
-        match = ''
         elevated_context = context.elevated()
-        if r['remote_group_id'] in sg_ports_cache:
-            sg_ports = sg_ports_cache[r['remote_group_id']]
-        else:
-            filters = {'security_group_id': [r['remote_group_id']]}
-            sg_ports = self._get_port_security_group_bindings(
-                elevated_context, filters)
-            sg_ports_cache[r['remote_group_id']] = sg_ports
-        sg_ports = [p for p in sg_ports if p['port_id'] != port['id']]
-        if not sg_ports:
+        group = self._acl_remote_group(elevated_context,
+                                       r['remote_group_id'],
+                                       sg_ports_cache, subnet_cache)
+        exclude_port = port['id'] if port is not None else None
+        if not group.has_ports(exclude_port):
             # If there are no other ports on this security group, then this
             # rule can never match, so no ACL row will be created for this
             # rule.
             return '', True
 
         src_or_dst = 'src' if r['direction'] == 'ingress' else 'dst'
-        remote_group_match = self._acl_remote_match_ip(elevated_context,
-                                                       sg_ports,
-                                                       subnet_cache,
-                                                       ip_version,
-                                                       src_or_dst)
-
-        match += remote_group_match
+        return group.ips_match(ip_version, src_or_dst, exclude_port), False
 
-        return match, False
+    def _update_remote_group_cache(self, context, port, subnet_cache):
+        # Update the addresses of the port in the cached remote groups
+        # before the ACLs referring to its security groups are refreshed.
+        if not self._remote_group_cache.ttl:
+            return
+        self._remote_group_cache.update_port(
+            port['id'], port.get('security_groups', []),
+            self._acl_port_ips(context.elevated(), port, subnet_cache))
 
     def _acl_protocol_and_ports(self, r, icmp):
         protocol = None
-        match = ''
+        parts = []
         if r['protocol'] in ('tcp', 'udp'):
             protocol = r['protocol']
             port_match = '%s.dst' % protocol
@@ -653,29 +768,33 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
             protocol = icmp
             port_match = '%s.type' % icmp
         if protocol:
-            match += ' && %s' % protocol
+            parts.append(protocol)
             # If min or max are set to -1, then we just treat it like it wasn't
             # specified at all and don't match on it.
             if r['port_range_min'] and r['port_range_min'] != -1:
-                match += ' && %s >= %d' % (port_match,
-                                           r['port_range_min'])
+                parts.append('%s >= %d' % (port_match, r['port_range_min']))
             if r['port_range_max'] and r['port_range_max'] != -1:
-                match += ' && %s <= %d' % (port_match,
-                                           r['port_range_max'])
-        return match
-
-    def _add_sg_rule_acl_for_port(self, context, port, r, sg_ports_cache,
-                                  subnet_cache):
-        # Update the match based on which direction this rule is for (ingress
-        # or egress).
-        match, remote_portdir = self._acl_direction(r, port)
-
-        # Update the match for IPv4 vs IPv6.
+                parts.append('%s <= %d' % (port_match, r['port_range_max']))
+        return parts
+
+    def _acl_rule_match(self, context, port, r, sg_ports_cache,
+                        subnet_cache, with_protocol=True):
+        """Return the match of a rule.
+
+        The match is for the port or, port being None, for the ACLs shared
+        by the ports of a security group, which are restricted to the ports
+        of each logical switch by the set_security_group_acls() command.
+
+        :param with_protocol: whether to match the protocol and ports of the
+                              rule, or to leave them to the ACL compaction
+        :returns: the match, or None if the rule can never match
+        """
+        # The match based on which direction this rule is for (ingress or
+        # egress).
+        direction_match, remote_portdir = self._acl_direction(r, port)
+
+        # The match for IPv4 vs IPv6.
         ip_match, ip_version, icmp = self._acl_ethertype(r)
-        match += ip_match
-
-        # Update the match if an IPv4 or IPv6 prefix was specified.
-        match += self._acl_remote_ip_prefix(r, ip_version)
 
         group_match, empty_match = self._acl_remote_group_id(context, r,
                                                              sg_ports_cache,
@@ -688,27 +807,42 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
             # rule can never match, so no ACL row will be created for this
             # rule.
             return None
-        match += group_match
-
-        # Update the match for the protocol (tcp, udp, icmp) and port/type
-        # range if specified.
-        match += self._acl_protocol_and_ports(r, icmp)
 
-        # Finally, create the ACL entry for the direction specified.
+        # The parts are joined once: the match if an IPv4 or IPv6 prefix was
+        # specified and the one of the protocol (tcp, udp, icmp) and
+        # port/type range if specified.
+        parts = [direction_match, ip_match,
+                 self._acl_remote_ip_prefix(r, ip_version), group_match]
+        if with_protocol:
+            parts.extend(self._acl_protocol_and_ports(r, icmp))
+        return acl.join_match(parts)
+
+    def _sg_rule_acl_columns(self, direction, match):
+        # The ACL entry for the direction specified.
         dir_map = {
             'ingress': 'to-lport',
             'egress': 'from-lport',
         }
-        cmd = self._ovn.add_acl(
+        return {'priority': ovn_const.ACL_PRIORITY_ALLOW,
+                'action': ovn_const.ACL_ACTION_ALLOW_RELATED,
+                'log': False,
+                'direction': dir_map[direction],
+                'match': match}
+
+    def _sg_rule_acl_cmd(self, port, direction, match):
+        return self._ovn.add_acl(
             lswitch=utils.ovn_name(port['network_id']),
             lport=port['id'],
-            priority=ovn_const.ACL_PRIORITY_ALLOW,
-            action=ovn_const.ACL_ACTION_ALLOW_RELATED,
-            log=False,
-            direction=dir_map[r['direction']],
-            match=match,
-            external_ids={'neutron:lport': port['id']})
-        return cmd
+            external_ids={'neutron:lport': port['id']},
+            **self._sg_rule_acl_columns(direction, match))
+
+    def _add_sg_rule_acl_for_port(self, context, port, r, sg_ports_cache,
+                                  subnet_cache):
+        match = self._acl_rule_match(context, port, r, sg_ports_cache,
+                                     subnet_cache)
+        if match is None:
+            return None
+        return self._sg_rule_acl_cmd(port, r['direction'], match)
 
     def _add_acl_cmd(self, acls, cmd):
         if not cmd:
@@ -772,6 +906,11 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
             subnet_cache = {}
         self._add_acl_dhcp(context, port, txn, subnet_cache)
 
+        if config.is_acl_per_security_group():
+            # The rules are matched by the ACLs of the security groups on
+            # the logical switch, see _add_security_group_acls().
+            return
+
         # We often need a list of all ports on a security group.  Cache these
         # results so we only do the query once throughout this processing.
         if sg_ports_cache is None:
@@ -780,23 +919,170 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
         # We create an ACL entry for each rule on each security group applied
         # to this port.
         acls = {}
-
-        for sg_id in sec_groups:
-            if sg_cache and sg_id in sg_cache:
-                sg = sg_cache[sg_id]
-            else:
-                sg = self.get_security_group(context, sg_id)
-                if sg_cache is not None:
-                    sg_cache[sg_id] = sg
-            for r in sg['security_group_rules']:
-                cmd = self._add_sg_rule_acl_for_port(context, port, r,
-                                                     sg_ports_cache,
-                                                     subnet_cache)
-                self._add_acl_cmd(acls, cmd)
+        # Or, when the ACLs are compacted, for each group of tcp, udp and any
+        # protocol rules differing only by their protocol and ports.
+        compactor = None
+        if config.is_acl_compaction_enabled():
+            compactor = acl.AclCompactor()
+
+        with profiling.span('acl_build'):
+            for sg_id in sec_groups:
+                if sg_cache and sg_id in sg_cache:
+                    sg = sg_cache[sg_id]
+                else:
+                    sg = self.get_security_group(context, sg_id)
+                    if sg_cache is not None:
+                        sg_cache[sg_id] = sg
+                for r in sg['security_group_rules']:
+                    if (compactor is not None and
+                            r['protocol'] in acl.COMPACTED_PROTOCOLS):
+                        match = self._acl_rule_match(
+                            context, port, r, sg_ports_cache, subnet_cache,
+                            with_protocol=False)
+                        if match is not None:
+                            compactor.add(r['direction'], match,
+                                          r['protocol'], r['port_range_min'],
+                                          r['port_range_max'])
+                        continue
+                    cmd = self._add_sg_rule_acl_for_port(context, port, r,
+                                                         sg_ports_cache,
+                                                         subnet_cache)
+                    self._add_acl_cmd(acls, cmd)
+            if compactor is not None:
+                for direction, match in compactor.matches():
+                    self._add_acl_cmd(
+                        acls, self._sg_rule_acl_cmd(port, direction, match))
 
         for cmd in six.itervalues(acls):
             txn.add(cmd)
 
+    def _security_group_acls(self, context, sg, sg_ports_cache,
+                             subnet_cache):
+        """Return the ACLs of the rules of a security group.
+
+        :returns: list of dictionaries of ACL columns, whose matches are
+                  restricted to the ports of the security group by the
+                  set_security_group_acls() command
+        """
+        acls = collections.OrderedDict()
+        compactor = None
+        if config.is_acl_compaction_enabled():
+            compactor = acl.AclCompactor()
+        for r in sg['security_group_rules']:
+            compacted = (compactor is not None and
+                         r['protocol'] in acl.COMPACTED_PROTOCOLS)
+            match = self._acl_rule_match(context, None, r, sg_ports_cache,
+                                         subnet_cache,
+                                         with_protocol=not compacted)
+            if match is None:
+                continue
+            if compacted:
+                compactor.add(r['direction'], match, r['protocol'],
+                              r['port_range_min'], r['port_range_max'])
+                continue
+            acls.setdefault((r['direction'], match), None)
+        if compactor is not None:
+            for direction_match in compactor.matches():
+                acls.setdefault(direction_match, None)
+        return [self._sg_rule_acl_columns(direction, match)
+                for direction, match in acls]
+
+    def _add_security_group_acls(self, context, security_group_ids,
+                                 network_ids, txn, sg_ports_cache=None,
+                                 subnet_cache=None):
+        """Set the ACLs of security groups on the logical switches.
+
+        The ACLs of a security group on the logical switch of a network are
+        shared by the ports of the network in the security group.  Their
+        matches list the ports, so a port joining or leaving the security
+        group changes them: they must be set in the transaction changing
+        the 'neutron:security_group_ids' external id of the logical port.
+        """
+        if sg_ports_cache is None:
+            sg_ports_cache = {}
+        if subnet_cache is None:
+            subnet_cache = {}
+        for security_group_id in security_group_ids:
+            sg = self.get_security_group(context.elevated(),
+                                         security_group_id)
+            with profiling.span('acl_build'):
+                acls = self._security_group_acls(context, sg,
+                                                 sg_ports_cache,
+                                                 subnet_cache)
+            for network_id in network_ids:
+                txn.add(self._ovn.set_security_group_acls(
+                    utils.ovn_name(network_id), security_group_id, acls))
+
+    def _update_security_group_acls(self, context, security_group_id,
+                                    sg_ports_cache=None, subnet_cache=None):
+        """Set the ACLs of a security group on all its logical switches.
+
+        They are set on the logical switches of the networks of the ports
+        of the security group, after a change of its rules or of the ports
+        of its remote groups.
+        """
+        if sg_ports_cache is None:
+            sg_ports_cache = {}
+        if security_group_id in sg_ports_cache:
+            sg_ports = sg_ports_cache[security_group_id]
+        else:
+            filters = {'security_group_id': [security_group_id]}
+            sg_ports = self._get_port_security_group_bindings(
+                context.elevated(), filters)
+            sg_ports_cache[security_group_id] = sg_ports
+        if not sg_ports:
+            return
+        ports = self.get_ports(
+            context.elevated(),
+            filters={'id': [p['port_id'] for p in sg_ports]},
+            fields=['network_id'])
+        network_ids = sorted(set(port['network_id'] for port in ports))
+        with self._ovn.transaction(check_error=True) as txn:
+            self._add_security_group_acls(context, [security_group_id],
+                                          network_ids, txn,
+                                          sg_ports_cache=sg_ports_cache,
+                                          subnet_cache=subnet_cache)
+
+    def _lport_external_ids(self, port):
+        external_ids = {ovn_const.OVN_PORT_NAME_EXT_ID_KEY: port['name']}
+        sg_ids = port.get('security_groups')
+        if sg_ids and config.is_acl_per_security_group():
+            # The ports of the ACLs of the security groups, see
+            # _add_security_group_acls().
+            external_ids[ovn_const.OVN_SG_IDS_EXT_ID_KEY] = ' '.join(
+                sorted(sg_ids))
+        return external_ids
+
+    def set_security_group_acls_in_ovn(self, context, network_id, ports,
+                                       security_group_ids):
+        """Replace the ACLs of ports as per [ovn] acl_per_security_group.
+
+        Used by the OVN NB sync to move the existing ports of a network to
+        or from the ACLs of their security groups when the option changed.
+        The ACLs of the ports and of the security groups are replaced in one
+        transaction, so that the ports are never left without the ACLs of
+        their rules.
+
+        :param security_group_ids: the security groups whose ACLs match the
+                                   ports, before or after the change
+        """
+        lswitch_name = utils.ovn_name(network_id)
+        sg_ports_cache = {}
+        subnet_cache = {}
+        with self._ovn.transaction(check_error=True) as txn:
+            for port in ports:
+                txn.add(self._ovn.set_lport(
+                    lport_name=port['id'],
+                    external_ids=self._lport_external_ids(port)))
+                txn.add(self._ovn.delete_acl(lswitch_name, port['id']))
+                self._add_acls(context, port, txn,
+                               sg_ports_cache=sg_ports_cache,
+                               subnet_cache=subnet_cache)
+            self._add_security_group_acls(context, security_group_ids,
+                                          [network_id], txn,
+                                          sg_ports_cache=sg_ports_cache,
+                                          subnet_cache=subnet_cache)
+
     def create_port_in_ovn(self, context, port, ovn_port_info):
         # When we create a port on a provider network, the mapping to
         # OVN_Northbound is a bit different.  Every port on a provider network
@@ -812,15 +1098,13 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
         # external_ids.
 
         external_ids = {ovn_const.OVN_PORT_NAME_EXT_ID_KEY: port['name']}
+        lport_external_ids = self._lport_external_ids(port)
         lswitch_name = utils.ovn_name(port['network_id'])
-        try:
-            lswitch = idlutils.row_by_value(self._ovn.idl, 'Logical_Switch',
-                                            'name', lswitch_name)
-        except idlutils.RowNotFound:
+        net_ext_ids = self._ovn.get_lswitch_ext_ids(lswitch_name)
+        if net_ext_ids is None:
             msg = _("Logical Switch %s does not exist") % lswitch_name
             LOG.error(msg)
             raise RuntimeError(msg)
-        net_ext_ids = getattr(lswitch, 'external_ids', {})
 
         physnet = net_ext_ids.get(ovn_const.OVN_PHYSNET_EXT_ID_KEY)
         if physnet:
@@ -852,7 +1136,7 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
                     lport_name=port['id'],
                     lswitch_name=lswitch_name,
                     addresses=ovn_port_info.addresses,
-                    external_ids=external_ids,
+                    external_ids=lport_external_ids,
                     parent_name=ovn_port_info.parent_name,
                     tag=ovn_port_info.tag,
                     enabled=port.get('admin_state_up'),
@@ -864,7 +1148,14 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
             self._add_acls(context, port, txn,
                            sg_ports_cache=sg_ports_cache,
                            subnet_cache=subnet_cache)
+            if config.is_acl_per_security_group():
+                self._add_security_group_acls(
+                    context, port.get('security_groups', []),
+                    [port['network_id']], txn,
+                    sg_ports_cache=sg_ports_cache,
+                    subnet_cache=subnet_cache)
 
+        self._update_remote_group_cache(context, port, subnet_cache)
         for sg_id in port.get('security_groups', []):
             self._refresh_remote_security_group(context, sg_id,
                                                 sg_ports_cache=sg_ports_cache,
@@ -883,15 +1174,16 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
         # Elevate the context so that we can see sec-groups and port-sg
         # bindings that do not belong to the current tenant.
         elevated_context = context.elevated()
-        refering_rules = self.get_security_group_rules(
-            elevated_context, filters, fields=['security_group_id'])
-        sg_ids = set(r['security_group_id'] for r in refering_rules)
-        for sg_id in sg_ids:
-            self._update_acls_for_security_group(elevated_context, sg_id,
-                                                 sg_ports_cache,
-                                                 exclude_ports,
-                                                 subnet_cache=subnet_cache)
+        with profiling.span('remote_sg_refresh'):
+            refering_rules = self.get_security_group_rules(
+                elevated_context, filters, fields=['security_group_id'])
+            sg_ids = set(r['security_group_id'] for r in refering_rules)
+            for sg_id in sg_ids:
+                self._update_acls_for_security_group(
+                    elevated_context, sg_id, sg_ports_cache, exclude_ports,
+                    subnet_cache=subnet_cache)
 
+    @metrics.tag_operation
     def delete_port(self, context, port_id, l3_port_check=True):
         port = self.get_port(context, port_id)
         try:
@@ -911,13 +1203,18 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
                         utils.ovn_name(port['network_id'])))
                 txn.add(self._ovn.delete_acl(
                         utils.ovn_name(port['network_id']), port['id']))
+                if config.is_acl_per_security_group():
+                    self._add_security_group_acls(
+                        context, port.get('security_groups', []),
+                        [port['network_id']], txn)
 
         sg_ids = port.get('security_groups', [])
 
-        with context.session.begin(subtransactions=True):
+        with profiling.span('db'), context.session.begin(subtransactions=True):
             self.disassociate_floatingips(context, port_id)
             super(OVNPlugin, self).delete_port(context, port_id)
 
+        self._remote_group_cache.remove_port(port_id)
         for sg_id in sg_ids:
             self._refresh_remote_security_group(context, sg_id)
 
@@ -925,6 +1222,7 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
         super(OVNPlugin, self).extend_port_dict_binding(port_res, port_db)
         self._update_port_binding(port_res)
 
+    @metrics.tag_operation
     def create_router(self, context, router):
         router = super(OVNPlugin, self).create_router(
             context, router)
@@ -943,6 +1241,7 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
 
         return router
 
+    @metrics.tag_operation
     def delete_router(self, context, router_id):
         router_name = utils.ovn_name(router_id)
         ret_val = super(OVNPlugin, self).delete_router(context,
@@ -950,6 +1249,7 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
         self._ovn.delete_lrouter(router_name).execute(check_error=True)
         return ret_val
 
+    @metrics.tag_operation
     def update_router(self, context, id, router):
         original_router = self.get_router(context, id)
         result = super(OVNPlugin, self).update_router(
@@ -971,6 +1271,7 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
 
         return result
 
+    @metrics.tag_operation
     def add_router_interface(self, context, router_id, interface_info):
         router_interface_info = super(OVNPlugin, self).add_router_interface(
             context, router_id, interface_info)
@@ -999,6 +1300,7 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
                                                         lrouter_port_name))
         return router_interface_info
 
+    @metrics.tag_operation
     def remove_router_interface(self, context, router_id, interface_info):
         if not config.is_ovn_l3():
             LOG.debug("OVN L3 mode is disabled, skipping "
@@ -1046,36 +1348,50 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
         # Update ACLs for all ports using this security group.  Note that the
         # ovsdb IDL suppresses the transaction down to what has actually
         # changed.
+        if sg_ports_cache is None:
+            sg_ports_cache = {}
+        if subnet_cache is None:
+            subnet_cache = {}
+        if config.is_acl_per_security_group():
+            # The ports share the ACLs of the security group.
+            self._update_security_group_acls(context, security_group_id,
+                                             sg_ports_cache=sg_ports_cache,
+                                             subnet_cache=subnet_cache)
+            return
         if exclude_ports is None:
             exclude_ports = []
         filters = {'security_group_id': [security_group_id]}
         sg_ports = self._get_port_security_group_bindings(context, filters)
-        with self._ovn.transaction(check_error=True) as txn:
-            sg_cache = {}
-            if sg_ports_cache is None:
-                sg_ports_cache = {}
-            if subnet_cache is None:
-                subnet_cache = {}
-            for binding in sg_ports:
-                if binding['port_id'] in exclude_ports:
-                    continue
-                port = self.get_port(context, binding['port_id'])
-                txn.add(self._ovn.delete_acl(
-                        utils.ovn_name(port['network_id']), port['id']))
-                self._add_acls(context, port, txn, sg_cache, sg_ports_cache,
-                               subnet_cache)
-
+        port_ids = [binding['port_id'] for binding in sg_ports
+                    if binding['port_id'] not in exclude_ports]
+        sg_cache = {}
+        # Rewriting the ACLs of a port is idempotent, so the ports are split
+        # in bounded transactions rather than rewriting the ACLs of all the
+        # ports of the security group in a single huge transaction.
+        batch_size = config.get_acl_update_batch_size()
+        for i in range(0, len(port_ids), batch_size):
+            with self._ovn.transaction(check_error=True) as txn:
+                for port_id in port_ids[i:i + batch_size]:
+                    port = self.get_port(context, port_id)
+                    txn.add(self._ovn.delete_acl(
+                            utils.ovn_name(port['network_id']), port['id']))
+                    self._add_acls(context, port, txn, sg_cache,
+                                   sg_ports_cache, subnet_cache)
+
+    @metrics.tag_operation
     def update_security_group(self, context, id, security_group):
         res = super(OVNPlugin, self).update_security_group(context, id,
                                                            security_group)
         self._update_acls_for_security_group(context, id)
         return res
 
+    @metrics.tag_operation
     def delete_security_group(self, context, id):
         super(OVNPlugin, self).delete_security_group(context, id)
         # Neutron will only delete a security group if it is not associated
         # with any active ports, so we have nothing to do here.
 
+    @metrics.tag_operation
     def create_security_group_rule(self, context, security_group_rule):
         res = super(OVNPlugin, self).create_security_group_rule(
             context, security_group_rule)
@@ -1088,6 +1404,7 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
         self._update_acls_for_security_group(context, group_id)
         return res
 
+    @metrics.tag_operation
     def delete_security_group_rule(self, context, id):
         security_group_rule = self.get_security_group_rule(context, id)
         group_id = security_group_rule['security_group_id']
@@ -1123,3 +1440,45 @@ class OVNPlugin(db_base_plugin_v2.NeutronDbPluginV2,
     def set_port_status_down(self, port_id):
         ctx = n_context.get_admin_context()
         self._update_port_status(ctx, port_id, const.PORT_STATUS_DOWN)
+
+    def sync_port_status(self, lport_up):
+        """Update the status of all the ports out of sync with OVN.
+
+        :param lport_up: dict mapping a port id to its Logical_Port 'up'
+                         value.
+        """
+        ctx = n_context.get_admin_context()
+        mismatched = collections.defaultdict(list)
+        batch_size = ovn_const.PORT_STATUS_SYNC_BATCH_SIZE
+        lport_ids = list(lport_up)
+        for i in range(0, len(lport_ids), batch_size):
+            query = ctx.session.query(
+                models_v2.Port.id, models_v2.Port.status).filter(
+                models_v2.Port.id.in_(lport_ids[i:i + batch_size]))
+            for port_id, status in query:
+                new_status = (const.PORT_STATUS_ACTIVE if lport_up[port_id]
+                              else const.PORT_STATUS_DOWN)
+                if status != new_status:
+                    mismatched[new_status].append(port_id)
+
+        for status, port_ids in mismatched.items():
+            LOG.debug("Updating port status of %d ports to %s",
+                      len(port_ids), status)
+            for i in range(0, len(port_ids), batch_size):
+                batch = port_ids[i:i + batch_size]
+                try:
+                    # NOTE: The ports are loaded and updated through the ORM
+                    # (rather than with a bulk UPDATE statement) so that the
+                    # status change notifications to nova are still sent.
+                    with ctx.session.begin(subtransactions=True):
+                        db_ports = ctx.session.query(models_v2.Port).filter(
+                            models_v2.Port.id.in_(batch))
+                        for db_port in db_ports:
+                            db_port.status = status
+                except (n_exc.PortNotFound, sa_exc.StaleDataError):
+                    # A port of the batch could have been deleted or being
+                    # deleted concurrently, update the ports one by one.
+                    LOG.debug("Port status update of %d ports unsuccessful, "
+                              "updating them one by one", len(batch))
+                    for port_id in batch:
+                        self._update_port_status(ctx, port_id, status)
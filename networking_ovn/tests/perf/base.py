@@ -0,0 +1,366 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Harness for the offline performance tests of the OVN code paths.
+
+The benchmarks run the real IDL code (networking_ovn.ovsdb.commands,
+impl_idl_ovn, ovsdb_monitor) against a local ovsdb-server started from the
+OVN_Northbound schema file, pre-populated with realistic table sizes.  They
+need the ovsdb-server and ovsdb-tool binaries and the ovn-nb.ovsschema file
+(set OVN_NB_SCHEMA if it is not in a standard location), and are skipped
+otherwise.  The benchmarks of the commands alone use an in-memory replica and
+only need the schema file.
+
+The benchmark modules are named bench_*.py so that they are not run with
+the unit tests, run them with 'tox -e perf'.
+"""
+
+import collections
+import contextlib
+import distutils.spawn
+import json
+import os
+import subprocess
+import time
+import uuid
+
+import fixtures
+import mock
+from oslo_config import cfg
+from ovs.db import data as ovs_data
+from ovs.db import idl
+from testtools import content
+
+from neutron.tests import base
+
+from networking_ovn.common import constants as ovn_const
+from networking_ovn.common import profiling
+from networking_ovn.common import utils
+from networking_ovn.ovsdb import impl_idl_ovn
+from networking_ovn.ovsdb import ovsdb_monitor
+
+# The plugin unit tests replace impl_idl_ovn.OvsdbOvnIdl with a mock.
+_OvsdbOvnIdl = impl_idl_ovn.OvsdbOvnIdl
+
+OVN_NB_SCHEMA_PATHS = (
+    '/usr/share/openvswitch/ovn-nb.ovsschema',
+    '/usr/local/share/openvswitch/ovn-nb.ovsschema',
+    '/usr/share/ovn/ovn-nb.ovsschema',
+)
+
+
+def find_ovn_nb_schema():
+    """Return the path of the OVN_Northbound schema file, or None."""
+    path = os.environ.get('OVN_NB_SCHEMA')
+    if path:
+        return path if os.path.exists(path) else None
+    for path in OVN_NB_SCHEMA_PATHS:
+        if os.path.exists(path):
+            return path
+
+
+def start_ovsdb_server(test):
+    """Start an ovsdb-server for the test, or skip it if it can't be."""
+    schema = find_ovn_nb_schema()
+    if not schema:
+        test.skipTest("The OVN_Northbound schema file was not found, set "
+                      "OVN_NB_SCHEMA")
+    for binary in ('ovsdb-server', 'ovsdb-tool'):
+        if not distutils.spawn.find_executable(binary):
+            test.skipTest("%s was not found" % binary)
+    return test.useFixture(OvsdbServerFixture(schema))
+
+
+class OvsdbServerFixture(fixtures.Fixture):
+    """A local ovsdb-server serving a new DB created from a schema file."""
+
+    def __init__(self, schema_path, timeout=10):
+        super(OvsdbServerFixture, self).__init__()
+        self.schema_path = schema_path
+        self.timeout = timeout
+        self.connection = None
+
+    def setUp(self):
+        super(OvsdbServerFixture, self).setUp()
+        path = self.useFixture(fixtures.TempDir()).path
+        db = os.path.join(path, 'ovnnb.db')
+        sock = os.path.join(path, 'ovnnb.sock')
+        subprocess.check_call(['ovsdb-tool', 'create', db,
+                               self.schema_path])
+        self.process = subprocess.Popen(
+            ['ovsdb-server', db, '--no-chdir',
+             '--remote=punix:%s' % sock,
+             '--unixctl=%s' % os.path.join(path, 'ovnnb.ctl'),
+             '--log-file=%s' % os.path.join(path, 'ovnnb.log')])
+        self.addCleanup(self._stop)
+        deadline = time.time() + self.timeout
+        while not os.path.exists(sock):
+            if self.process.poll() is not None or time.time() > deadline:
+                raise RuntimeError("ovsdb-server did not start")
+            time.sleep(0.1)
+        self.connection = 'unix:%s' % sock
+
+    def _stop(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait()
+
+
+class OvnNbApiFixture(fixtures.Fixture):
+    """An OvsdbOvnIdl connected to the given OVN_Northbound DB.
+
+    Like in an api worker, the connection replicates the tables and columns
+    in ovsdb_monitor.OVN_NB_API_TABLES.
+    """
+
+    def __init__(self, connection, timeout=60):
+        super(OvnNbApiFixture, self).__init__()
+        self.connection = connection
+        self.timeout = timeout
+        self.api = None
+
+    def setUp(self):
+        super(OvnNbApiFixture, self).setUp()
+        # OvsdbOvnIdl keeps its connection in a class attribute.
+        self.addCleanup(setattr, _OvsdbOvnIdl, 'ovsdb_connection', None)
+        _OvsdbOvnIdl.ovsdb_connection = ovsdb_monitor.OvnApiConnection(
+            self.connection, self.timeout, 'OVN_Northbound')
+        self.addCleanup(_OvsdbOvnIdl.ovsdb_connection.stop, self.timeout)
+        self.api = _OvsdbOvnIdl(None, None)
+
+
+class MemoryNbApi(object):
+    """An OVN_Northbound API whose IDL replica is only in memory.
+
+    The IDL is never connected, its rows are added with add_row().  The
+    commands can be run in transactions that are aborted afterwards, which
+    restores the replica, to measure their cost without an ovsdb-server.
+    """
+
+    def __init__(self, schema_path):
+        helper = idl.SchemaHelper(location=schema_path)
+        helper.register_all()
+        self.idl = idl.Idl('unix:/nonexistent', helper)
+        self._tables = self.idl.tables
+
+    def add_row(self, table_name, **columns):
+        table = self._tables[table_name]
+        row = idl.Row(self.idl, table, uuid.uuid4(), {})
+        for name, column in table.columns.items():
+            row._data[name] = ovs_data.Datum.default(column.type)
+        for name, value in columns.items():
+            row._data[name] = ovs_data.Datum.from_python(
+                table.columns[name].type, value, _row_to_uuid)
+        table.rows[row.uuid] = row
+        return row
+
+    def run(self, *commands):
+        """Run the commands in a transaction that is then aborted."""
+        txn = idl.Transaction(self.idl)
+        try:
+            for command in commands:
+                command.run_idl(txn)
+        finally:
+            txn.abort()
+
+
+def _row_to_uuid(value):
+    return value.uuid if isinstance(value, idl.Row) else value
+
+
+class FakeCommand(object):
+
+    def __init__(self, api, name, args, columns):
+        self.api = api
+        self.name = name
+        self.args = args
+        self.columns = columns
+
+    def execute(self, check_error=False, log_errors=True):
+        with self.api.transaction(check_error=check_error) as txn:
+            txn.add(self)
+
+
+class FakeTransaction(object):
+
+    def __init__(self, api):
+        self.api = api
+        self.commands = []
+
+    def add(self, command):
+        self.commands.append(command)
+        return command
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, tb):
+        if exc_type is None:
+            self.api.commit(self)
+
+
+class FakeOvnNbApi(object):
+    """An OVN_Northbound API only recording the committed commands.
+
+    It counts the transactions, the commands per type, and the ACL rows
+    added with the size of their match.  The matches of the ACLs of the
+    security groups do not include their ports, added when the command is
+    run (see bench_commands.TestSecurityGroupPortChurn).
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.transactions = 0
+        self.commands = collections.Counter()
+        self.acl_rows = 0
+        self.match_bytes = 0
+
+    def transaction(self, check_error=False, log_errors=True, **kwargs):
+        return FakeTransaction(self)
+
+    def commit(self, txn):
+        self.transactions += 1
+        for command in txn.commands:
+            self.commands[command.name] += 1
+            if command.name == 'add_acl':
+                self.acl_rows += 1
+                self.match_bytes += len(command.columns['match'])
+            elif command.name == 'set_security_group_acls':
+                acls = command.args[2]
+                self.acl_rows += len(acls)
+                self.match_bytes += sum(len(a['match']) for a in acls)
+
+    def get_lswitch_ext_ids(self, name):
+        return {}
+
+    def __getattr__(self, name):
+        def command(*args, **columns):
+            return FakeCommand(self, name, args, columns)
+        return command
+
+
+def populate(api, switches, ports_per_switch, acls_per_port=0):
+    """Populate the OVN_Northbound DB like neutron would.
+
+    For each logical switch, one transaction creates the switch and another
+    one its ports and their ACLs.
+
+    :returns: dictionary mapping the logical switch names to the list of
+              the names of their ports
+    """
+    result = {}
+    for i in range(switches):
+        net_id = str(uuid.uuid4())
+        lswitch = utils.ovn_name(net_id)
+        ports = [str(uuid.uuid4()) for j in range(ports_per_switch)]
+        api.create_lswitch(
+            lswitch, external_ids={
+                ovn_const.OVN_NETWORK_NAME_EXT_ID_KEY: 'net-%d' % i}
+        ).execute(check_error=True)
+        with api.transaction(check_error=True) as txn:
+            for j, port_id in enumerate(ports):
+                ip = '10.%d.%d.%d' % (i % 256, j // 256, j % 256)
+                txn.add(api.create_lport(
+                    port_id, lswitch,
+                    addresses=['fa:16:3e:%02x:%02x:%02x %s' % (
+                        i % 256, j // 256, j % 256, ip)],
+                    external_ids={
+                        ovn_const.OVN_PORT_NAME_EXT_ID_KEY: 'port-%d' % j},
+                    enabled=True))
+                for k in range(acls_per_port):
+                    txn.add(api.add_acl(
+                        lswitch, port_id,
+                        priority=ovn_const.ACL_PRIORITY_ALLOW,
+                        action=ovn_const.ACL_ACTION_ALLOW_RELATED,
+                        log=False, direction='to-lport',
+                        match='outport == "%s" && ip4 && tcp && '
+                              'tcp.dst == %d' % (port_id, 1000 + k)))
+        result[lswitch] = ports
+    return result
+
+
+class BenchmarkMixin(object):
+    """Recording of the results of the benchmarks of a test case."""
+
+    def setUp(self, *args, **kwargs):
+        super(BenchmarkMixin, self).setUp(*args, **kwargs)
+        self.results = []
+        self.addDetail('results', content.Content(
+            content.UTF8_TEXT, lambda: ['\n'.join(self.results)]))
+
+    def record(self, name, **values):
+        """Record the results of a benchmark.
+
+        If OVN_PERF_RESULTS is set, the results are also appended as a JSON
+        line to that file, to compare them across commits.
+        """
+        self.results.append('%s: %s' % (name, ', '.join(
+            '%s=%s' % (key, ('%.4f' % value if isinstance(value, float)
+                             else value))
+            for key, value in sorted(values.items()))))
+        path = os.environ.get('OVN_PERF_RESULTS')
+        if path:
+            values.update(test=self.id(), name=name, time=time.time())
+            with open(path, 'a') as f:
+                f.write(json.dumps(values) + '\n')
+
+    @contextlib.contextmanager
+    def measure(self, name, count=1):
+        """Measure the time of the block, running count operations."""
+        start = time.time()
+        yield
+        elapsed = time.time() - start
+        self.record(name, count=count, seconds=elapsed,
+                    ms_per_op=elapsed * 1000.0 / count if count else 0.0)
+
+    @contextlib.contextmanager
+    def profile(self, name):
+        """Profile the block as the request name.
+
+        Yields the dictionary of the counters of the request (see
+        networking_ovn.common.profiling), filled in when the block exits.
+        """
+        counters = {}
+        cfg.CONF.set_override('profiling', True, 'ovn')
+        try:
+            with mock.patch.object(
+                    profiling, '_get_sink',
+                    return_value=lambda p: counters.update(p['counters'])):
+                with profiling.request(name):
+                    yield counters
+        finally:
+            cfg.CONF.clear_override('profiling', 'ovn')
+
+
+class PerfTestCase(BenchmarkMixin, base.BaseTestCase):
+    """Base class of the benchmarks needing the OVN_Northbound schema."""
+
+    def setUp(self):
+        super(PerfTestCase, self).setUp()
+        self.schema = find_ovn_nb_schema()
+        if not self.schema:
+            self.skipTest("The OVN_Northbound schema file was not found, "
+                          "set OVN_NB_SCHEMA")
+
+
+class OvnNbBenchmark(PerfTestCase):
+    """Base class of the benchmarks against a local OVN_Northbound DB."""
+
+    def setUp(self):
+        super(OvnNbBenchmark, self).setUp()
+        self.ovsdb_server = start_ovsdb_server(self)
+
+    def get_api(self):
+        return self.useFixture(
+            OvnNbApiFixture(self.ovsdb_server.connection)).api
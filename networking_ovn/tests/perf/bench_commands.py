@@ -0,0 +1,172 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import testscenarios
+
+from networking_ovn.common import acl
+from networking_ovn.common import constants as ovn_const
+from networking_ovn.ovsdb import commands as cmd
+from networking_ovn.tests.perf import base
+
+load_tests = testscenarios.load_tests_apply_scenarios
+
+
+class TestCommands(base.PerfTestCase):
+    """Per operation latency of the OVSDB commands.
+
+    The replica holds 'rows' logical ports, ACLs and logical router ports,
+    100 per logical switch or router, the latency of the commands should not
+    grow with it.
+    """
+
+    scenarios = [
+        ('1k', {'rows': 1000}),
+        ('10k', {'rows': 10000}),
+        ('100k', {'rows': 100000}),
+    ]
+
+    ROWS_PER_PARENT = 100
+    ITERATIONS = 50
+
+    def setUp(self):
+        super(TestCommands, self).setUp()
+        self.api = base.MemoryNbApi(self.schema)
+        for i in range(self.rows // self.ROWS_PER_PARENT):
+            ports = []
+            acls = []
+            lrouter_ports = []
+            for j in range(self.ROWS_PER_PARENT):
+                name = 'p-%d-%d' % (i, j)
+                ports.append(self.api.add_row(
+                    'Logical_Port', name=name,
+                    addresses=['fa:16:3e:00:%02x:%02x 10.0.%d.%d' % (
+                        i % 256, j, i % 256, j)]))
+                acls.append(self.api.add_row(
+                    'ACL', priority=1002, direction='to-lport',
+                    action='allow-related',
+                    match='outport == "%s" && ip4' % name,
+                    external_ids={'neutron:lport': name}))
+                lrouter_ports.append(self.api.add_row(
+                    'Logical_Router_Port', name='lrp-%d-%d' % (i, j),
+                    mac='fa:16:3e:01:%02x:%02x' % (i % 256, j),
+                    network='10.1.%d.%d/24' % (i % 256, j)))
+            self.api.add_row('Logical_Switch', name='ls-%d' % i,
+                             ports=ports, acls=acls)
+            self.api.add_row('Logical_Router', name='lr-%d' % i,
+                             ports=lrouter_ports)
+        # Operate in the middle of the tables.
+        self.parent = self.rows // self.ROWS_PER_PARENT // 2
+        self.lswitch = 'ls-%d' % self.parent
+        self.lport = 'p-%d-%d' % (self.parent, self.ROWS_PER_PARENT // 2)
+
+    def _measure(self, name, command):
+        with self.measure('%s (%d rows)' % (name, self.rows),
+                          self.ITERATIONS):
+            for i in range(self.ITERATIONS):
+                self.api.run(command)
+
+    def test_add_lport(self):
+        self._measure('AddLogicalPortCommand', cmd.AddLogicalPortCommand(
+            self.api, 'new-port', self.lswitch, True,
+            addresses=['fa:16:3e:ff:ff:ff 10.2.0.1']))
+
+    def test_del_lport(self):
+        self._measure('DelLogicalPortCommand', cmd.DelLogicalPortCommand(
+            self.api, self.lport, self.lswitch, False))
+
+    def test_add_acl(self):
+        self._measure('AddACLCommand', cmd.AddACLCommand(
+            self.api, self.lswitch, self.lport, priority=1002,
+            direction='from-lport', action='allow-related',
+            match='inport == "%s" && ip4' % self.lport))
+
+    def test_del_acl(self):
+        self._measure('DelACLCommand', cmd.DelACLCommand(
+            self.api, self.lswitch, self.lport, False))
+
+    def test_add_lrouter_port(self):
+        self._measure('AddLRouterPortCommand', cmd.AddLRouterPortCommand(
+            self.api, 'new-lrp', 'lr-%d' % self.parent,
+            mac='fa:16:3e:02:00:01', network='10.3.0.1/24'))
+
+
+class TestSecurityGroupPortChurn(base.PerfTestCase):
+    """Cost of a port joining or leaving a security group.
+
+    With [ovn] acl_per_security_group, the logical switch has 'ports' ports
+    in the security group, which has RULES ACLs listing them.  A port
+    joining or leaving the security group rewrites all of them, so the
+    latency and the size of the transaction grow with the number of ports.
+    """
+
+    scenarios = [
+        ('10', {'ports': 10}),
+        ('100', {'ports': 100}),
+        ('1k', {'ports': 1000}),
+    ]
+
+    RULES = 10
+    ITERATIONS = 20
+
+    def setUp(self):
+        super(TestSecurityGroupPortChurn, self).setUp()
+        self.api = base.MemoryNbApi(self.schema)
+        ports = []
+        for i in range(self.ports):
+            ports.append(self.api.add_row(
+                'Logical_Port', name='p-%d' % i,
+                addresses=['fa:16:3e:00:%02x:%02x 10.0.%d.%d' % (
+                    i // 256, i % 256, i // 256, i % 256)],
+                external_ids={ovn_const.OVN_SG_IDS_EXT_ID_KEY: 'sg1'}))
+        self.acls = [{'priority': ovn_const.ACL_PRIORITY_ALLOW,
+                      'action': ovn_const.ACL_ACTION_ALLOW_RELATED,
+                      'log': False,
+                      'direction': 'to-lport',
+                      'match': 'ip4 && tcp && tcp.dst == %d' % (1000 + i)}
+                     for i in range(self.RULES)]
+        port_match = acl.set_match(
+            'outport', sorted('"%s"' % port.name for port in ports))
+        acl_rows = [self.api.add_row(
+            'ACL', priority=columns['priority'],
+            direction=columns['direction'], action=columns['action'],
+            match=acl.join_match([port_match, columns['match']]),
+            external_ids={ovn_const.OVN_SG_EXT_ID_KEY: 'sg1'})
+            for columns in self.acls]
+        self.api.add_row('Logical_Switch', name='ls', ports=ports,
+                         acls=acl_rows)
+
+    def _measure(self, name, *commands):
+        with self.measure('%s (%d ports, %d rules)' % (
+                name, self.ports, self.RULES), self.ITERATIONS):
+            for i in range(self.ITERATIONS):
+                self.api.run(*commands)
+
+    def test_port_join(self):
+        self._measure('port joining the security group',
+                      cmd.AddLogicalPortCommand(
+                          self.api, 'new-port', 'ls', False,
+                          external_ids={
+                              ovn_const.OVN_SG_IDS_EXT_ID_KEY: 'sg1'}),
+                      cmd.SetSecurityGroupACLsCommand(
+                          self.api, 'ls', 'sg1', self.acls))
+
+    def test_port_leave(self):
+        self._measure('port leaving the security group',
+                      cmd.DelLogicalPortCommand(self.api, 'p-0', 'ls',
+                                                False),
+                      cmd.SetSecurityGroupACLsCommand(
+                          self.api, 'ls', 'sg1', self.acls))
+
+    def test_rule_unchanged(self):
+        self._measure('security group unchanged',
+                      cmd.SetSecurityGroupACLsCommand(
+                          self.api, 'ls', 'sg1', self.acls))
@@ -0,0 +1,118 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import resource
+import time
+import uuid
+
+import testscenarios
+
+from neutron import context
+from neutron.tests.unit.db import test_db_base_plugin_v2 as test_plugin
+
+from networking_ovn.common import constants as ovn_const
+from networking_ovn.common import utils
+from networking_ovn import ovn_nb_sync
+from networking_ovn.tests.perf import base
+from networking_ovn.tests.unit import test_ovn_plugin
+
+load_tests = testscenarios.load_tests_apply_scenarios
+
+
+class TestNbSync(base.BenchmarkMixin, test_plugin.NeutronDbPluginV2TestCase):
+    """Cost of the sync of the Neutron DB to the OVN_Northbound DB.
+
+    The networks and ports are created through the plugin in the SQLite DB
+    of the unit tests and in a local OVN_Northbound DB, then 'drift' of
+    them are made out of sync: deleted from the OVN_Northbound DB, and as
+    many stale logical switches and ports added to it.  The log mode sync,
+    the repair mode sync and a log mode sync after the repair are measured.
+    """
+
+    scenarios = [
+        ('no_drift', {'drift': 0.0}),
+        ('drift_5', {'drift': 0.05}),
+        ('drift_20', {'drift': 0.2}),
+    ]
+
+    NETWORKS = 20
+    PORTS_PER_NETWORK = 25
+
+    def setUp(self):
+        super(TestNbSync, self).setUp(plugin=test_ovn_plugin.PLUGIN_NAME)
+        ovsdb_server = base.start_ovsdb_server(self)
+        self.ovn = self.useFixture(
+            base.OvnNbApiFixture(ovsdb_server.connection)).api
+        self.plugin._ovn = self.ovn
+        self.admin_context = context.get_admin_context()
+
+        ports = []
+        for i in range(self.NETWORKS):
+            net = self._make_network(self.fmt, 'net-%d' % i, True)
+            self._make_subnet(self.fmt, net, '10.%d.0.1' % i,
+                              '10.%d.0.0/16' % i)
+            ports.extend(
+                self._make_port(self.fmt, net['network']['id'])['port']
+                for j in range(self.PORTS_PER_NETWORK))
+        self._inject_drift(ports)
+
+    def _inject_drift(self, ports):
+        count = int(len(ports) * self.drift)
+        with self.ovn.transaction(check_error=True) as txn:
+            # Ports missing from the OVN_Northbound DB.
+            for port in ports[:count]:
+                txn.add(self.ovn.delete_lport(
+                    port['id'], utils.ovn_name(port['network_id'])))
+        # Stale logical switches and ports.
+        stale_switches = max(count // self.PORTS_PER_NETWORK, 1 if count
+                             else 0)
+        for i in range(stale_switches):
+            self.ovn.create_lswitch(
+                utils.ovn_name(str(uuid.uuid4())), external_ids={
+                    ovn_const.OVN_NETWORK_NAME_EXT_ID_KEY: 'stale-%d' % i}
+            ).execute(check_error=True)
+        with self.ovn.transaction(check_error=True) as txn:
+            # The sync only sees the logical ports created by neutron,
+            # with a port name external id.
+            for i, port in enumerate(ports[count:2 * count]):
+                txn.add(self.ovn.create_lport(
+                    str(uuid.uuid4()), utils.ovn_name(port['network_id']),
+                    external_ids={
+                        ovn_const.OVN_PORT_NAME_EXT_ID_KEY: 'stale-%d' % i}))
+
+    def _sync(self, phase, mode):
+        synchronizer = ovn_nb_sync.OvnNbSynchronizer(self.plugin, self.ovn,
+                                                     mode)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.time()
+        with self.profile('sync') as counters:
+            synchronizer.sync_networks_and_ports(self.admin_context)
+        elapsed = time.time() - start
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.record(
+            '%s (%d networks, %d ports, %d%% drift)' % (
+                phase, self.NETWORKS, self.NETWORKS * self.PORTS_PER_NETWORK,
+                self.drift * 100),
+            seconds=elapsed,
+            peak_rss_kb=max_rss, peak_rss_growth_kb=max_rss - rss,
+            sql_queries=counters.get('sql_queries', 0),
+            ovsdb_transactions=counters.get('ovsdb_txns', 0),
+            ovsdb_commands=counters.get('ovsdb_ops', 0))
+
+    def test_sync(self):
+        self._sync('log', ovn_nb_sync.SYNC_MODE_LOG)
+        self._sync('repair', ovn_nb_sync.SYNC_MODE_REPAIR)
+        self._sync('log after repair', ovn_nb_sync.SYNC_MODE_LOG)
+        lports = set(self.ovn.get_all_logical_ports_ids())
+        self.assertEqual(
+            set(p['id'] for p in self.plugin.get_ports(self.admin_context)),
+            lports)
@@ -0,0 +1,45 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from networking_ovn.ovsdb import impl_idl_ovn
+from networking_ovn.ovsdb import ovsdb_monitor
+from networking_ovn.tests.perf import base
+
+
+class TestPopulate(base.OvnNbBenchmark):
+
+    SWITCHES = 20
+    PORTS_PER_SWITCH = 50
+    ACLS_PER_PORT = 4
+
+    def test_populate_and_replicate(self):
+        api = self.get_api()
+        with self.measure('populate (switches)', self.SWITCHES):
+            switches = base.populate(api, self.SWITCHES,
+                                     self.PORTS_PER_SWITCH,
+                                     self.ACLS_PER_PORT)
+        self.assertEqual(sorted(switches),
+                         sorted(api.get_all_logical_switches_ids()))
+        self.assertEqual(self.SWITCHES * self.PORTS_PER_SWITCH,
+                         len(api.get_all_logical_ports_ids()))
+
+        # A new replica gets the initial dump of the populated DB.
+        conn = ovsdb_monitor.OvnApiConnection(
+            self.ovsdb_server.connection, 60, 'OVN_Northbound')
+        conn.start()
+        self.addCleanup(conn.stop, 10)
+        self.record('initial dump', seconds=conn.initial_dump_duration)
+        tables = impl_idl_ovn.get_replica_stats(conn.idl)
+        self.assertEqual(self.SWITCHES, tables['Logical_Switch']['rows'])
+        self.assertEqual(
+            self.SWITCHES * self.PORTS_PER_SWITCH * self.ACLS_PER_PORT,
+            tables['ACL']['rows'])
@@ -0,0 +1,175 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import resource
+import time
+
+from eventlet import greenthread
+import mock
+from ovs.db import idl as ovs_idl
+import testscenarios
+
+from neutron.common import constants as const
+from neutron import context
+
+from networking_ovn.common import metrics
+from networking_ovn.ovsdb import ovsdb_monitor
+from networking_ovn.tests.perf import base
+from networking_ovn.tests.unit import test_ovn_plugin
+
+load_tests = testscenarios.load_tests_apply_scenarios
+
+OVN_NB_SCHEMA = {
+    "name": "OVN_Northbound", "version": "2.0.1",
+    "tables": {
+        "Logical_Port": {
+            "columns": {
+                "name": {"type": "string"},
+                "up": {"type": {"key": "boolean", "min": 0, "max": 1}}},
+            "indexes": [["name"]],
+            "isRoot": False,
+        },
+    }
+}
+
+
+def _cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+class PortStatusBenchmark(base.BenchmarkMixin,
+                          test_ovn_plugin.OVNPluginTestCase):
+    """Throughput of the port status events of the ovn worker.
+
+    OvnIdl.notify() is driven with Logical_Port rows of PORTS ports of the
+    SQLite DB of the unit tests.  The latency from the notification to the
+    port status update in the DB, the depth of the notification queue and
+    the CPU usage are reported.
+    """
+
+    PORTS = 200
+    TIMEOUT = 300
+
+    def setUp(self):
+        super(PortStatusBenchmark, self).setUp()
+        self.plugin._ovn = base.FakeOvnNbApi()
+        net = self._make_network(self.fmt, 'net', True)
+        self._make_subnet(self.fmt, net, '10.0.0.1', '10.0.0.0/16')
+        net_id = net['network']['id']
+        self.port_ids = [self._make_port(self.fmt, net_id)['port']['id']
+                         for i in range(self.PORTS)]
+
+        helper = ovs_idl.SchemaHelper(schema_json=OVN_NB_SCHEMA)
+        helper.register_all()
+        self.idl = ovsdb_monitor.OvnIdl(self.plugin, "remote", helper)
+        self.idl.lock_name = self.idl.event_lock_name
+        self.idl.has_lock = True
+        self.addCleanup(self.idl.notify_handler.shutdown)
+        self.lp_table = self.idl.tables['Logical_Port']
+
+        # Time of the port status updates in the DB, per port.
+        self.updated = {}
+        update_port_status = self.plugin._update_port_status
+
+        def _update_port_status(ctx, port_id, status):
+            update_port_status(ctx, port_id, status)
+            self.updated[port_id] = time.time()
+
+        sync_port_status = self.plugin.sync_port_status
+
+        def _sync_port_status(lport_up):
+            sync_port_status(lport_up)
+            now = time.time()
+            for port_id in lport_up:
+                self.updated[port_id] = now
+
+        mock.patch.object(self.plugin, '_update_port_status',
+                          side_effect=_update_port_status).start()
+        mock.patch.object(self.plugin, 'sync_port_status',
+                          side_effect=_sync_port_status).start()
+
+    def _row(self, port_id, up):
+        return ovs_idl.Row.from_json(self.idl, self.lp_table, port_id,
+                                     {'name': port_id, 'up': up})
+
+    def _wait_and_record(self, name, notified, cpu_start, max_depth):
+        start = min(notified.values())
+        self.assertTrue(self.idl.notify_handler.drain(self.TIMEOUT))
+        elapsed = time.time() - start
+        cpu = _cpu_time() - cpu_start
+        latencies = metrics.Histogram(samples=len(notified))
+        for port_id, notified_at in notified.items():
+            latencies.observe(self.updated[port_id] - notified_at)
+        summary = latencies.summary(percentiles=(50, 95, 99))
+        self.record(name, events=len(notified), seconds=elapsed,
+                    events_per_second=len(notified) / elapsed,
+                    latency_p50=summary['p50'], latency_p95=summary['p95'],
+                    latency_p99=summary['p99'], latency_max=summary['max'],
+                    max_queue_depth=max_depth, cpu_seconds=cpu,
+                    cpu_percent=cpu * 100 / elapsed)
+
+    def _assert_status(self, status):
+        ports = self.plugin.get_ports(context.get_admin_context(),
+                                      filters={'id': self.port_ids})
+        self.assertEqual(set([status]), set(p['status'] for p in ports))
+
+
+class TestPortStatusUpdates(PortStatusBenchmark):
+    """Logical_Port 'up' updates at 'rate' events per second."""
+
+    scenarios = [
+        ('50_per_second', {'rate': 50}),
+        ('200_per_second', {'rate': 200}),
+        ('1000_per_second', {'rate': 1000}),
+    ]
+
+    def test_update_events(self):
+        queue = self.idl.notify_handler.notifications
+        interval = 1.0 / self.rate
+        for up in (True, False):
+            notified = {}
+            max_depth = 0
+            cpu_start = _cpu_time()
+            next_at = time.time()
+            for port_id in self.port_ids:
+                # Let the notify loop run until the next event is due.
+                greenthread.sleep(max(0, next_at - time.time()))
+                next_at += interval
+                notified[port_id] = time.time()
+                self.idl.notify(self.idl.ROW_UPDATE,
+                                self._row(port_id, up),
+                                self._row(port_id, not up))
+                max_depth = max(max_depth, queue.qsize())
+            self._wait_and_record(
+                '%s events at %d/s' % ('up' if up else 'down', self.rate),
+                notified, cpu_start, max_depth)
+            self._assert_status(const.PORT_STATUS_ACTIVE if up
+                                else const.PORT_STATUS_DOWN)
+
+
+class TestPortStatusInitialDump(PortStatusBenchmark):
+    """Logical_Port rows created by the initial dump after a reconnection."""
+
+    def test_initial_dump_burst(self):
+        # The rows dumped again after a reconnection are all notified in
+        # one IDL run loop iteration, without yielding.
+        self.idl._port_status_synced = True
+        notified = {}
+        cpu_start = _cpu_time()
+        for port_id in self.port_ids:
+            notified[port_id] = time.time()
+            self.idl.notify(self.idl.ROW_CREATE, self._row(port_id, True))
+        self.idl.flush_port_status()
+        self._wait_and_record('initial dump burst', notified, cpu_start,
+                              self.idl.notify_handler.notifications.qsize())
+        self._assert_status(const.PORT_STATUS_ACTIVE)
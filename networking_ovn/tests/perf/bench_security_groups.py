@@ -0,0 +1,154 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+import time
+
+from oslo_config import cfg
+import testscenarios
+
+from neutron import context
+
+from networking_ovn.tests.perf import base
+from networking_ovn.tests.unit import test_ovn_plugin
+
+load_tests = testscenarios.load_tests_apply_scenarios
+
+
+class TestSecurityGroupAcls(base.BenchmarkMixin,
+                            test_ovn_plugin.OVNPluginTestCase):
+    """Cost of the ACL generation for synthetic security group topologies.
+
+    The 'members' security group has MEMBERS ports, RULES tcp rules and a
+    rule allowing the traffic from its own members.  The CHAIN security
+    groups each allow the traffic from the previous one, with CHAIN_PORTS
+    ports each.  The Neutron DB is the in-memory SQLite DB of the unit tests
+    and the OVN API only records the commands.
+
+    For each operation, the wall time, the number of ACL rows added, the
+    size of their matches, the number of SQL queries and of OVSDB
+    transactions are reported, with the ACLs created per port or per
+    security group.
+    """
+
+    scenarios = [
+        ('per_port', {'acl_per_security_group': False}),
+        ('per_security_group', {'acl_per_security_group': True}),
+    ]
+
+    MEMBERS = 50
+    RULES = 10
+    CHAIN = 3
+    CHAIN_PORTS = 10
+
+    def setUp(self):
+        super(TestSecurityGroupAcls, self).setUp()
+        cfg.CONF.set_override('acl_per_security_group',
+                              self.acl_per_security_group, 'ovn')
+        self.ovn = base.FakeOvnNbApi()
+        self.plugin._ovn = self.ovn
+        self.admin_context = context.get_admin_context()
+
+        net = self._make_network(self.fmt, 'net', True)['network']
+        self.net_id = net['id']
+        self._make_subnet(self.fmt, {'network': net}, '10.0.0.1',
+                          '10.0.0.0/16')
+
+        self.members_sg = self._create_sg('members')
+        for i in range(self.RULES):
+            self._create_sg_rule(self.members_sg, protocol='tcp',
+                                 port_range_min=1000 + 10 * i,
+                                 port_range_max=1000 + 10 * i + 5)
+        self._create_sg_rule(self.members_sg,
+                             remote_group_id=self.members_sg)
+        self.members = [self._create_port(self.members_sg)
+                        for i in range(self.MEMBERS)]
+
+        self.chain = []
+        remote_sg = None
+        for i in range(self.CHAIN):
+            sg_id = self._create_sg('chain-%d' % i)
+            self._create_sg_rule(sg_id, remote_group_id=remote_sg or sg_id)
+            for j in range(self.CHAIN_PORTS):
+                self._create_port(sg_id)
+            self.chain.append(sg_id)
+            remote_sg = sg_id
+
+    def _create_sg(self, name):
+        return self.plugin.create_security_group(
+            self.admin_context,
+            {'security_group': {'name': name, 'description': '',
+                                'tenant_id': self._tenant_id}})['id']
+
+    def _create_sg_rule(self, sg_id, protocol=None, port_range_min=None,
+                        port_range_max=None, remote_group_id=None):
+        rule = {'security_group_id': sg_id,
+                'tenant_id': self._tenant_id,
+                'direction': 'ingress',
+                'ethertype': 'IPv4',
+                'protocol': protocol,
+                'port_range_min': port_range_min,
+                'port_range_max': port_range_max,
+                'remote_ip_prefix': None,
+                'remote_group_id': remote_group_id}
+        return self.plugin.create_security_group_rule(
+            self.admin_context, {'security_group_rule': rule})
+
+    def _create_port(self, sg_id):
+        return self._make_port(self.fmt, self.net_id,
+                               security_groups=[sg_id])['port']
+
+    @contextlib.contextmanager
+    def _measure(self, name):
+        self.ovn.reset()
+        start = time.time()
+        with self.profile(name) as counters:
+            yield
+        elapsed = time.time() - start
+        self.record(
+            '%s (%d members, %d rules, ACLs per %s)' % (
+                name, self.MEMBERS, self.RULES,
+                'security group' if self.acl_per_security_group else 'port'),
+            seconds=elapsed, acl_rows=self.ovn.acl_rows,
+            match_bytes=self.ovn.match_bytes,
+            sql_queries=counters.get('sql_queries', 0),
+            ovsdb_transactions=self.ovn.transactions)
+
+    def test_add_acls(self):
+        port = self.plugin.get_port(self.admin_context, self.members[0]['id'])
+        with self._measure('_add_acls'):
+            with self.ovn.transaction() as txn:
+                self.plugin._add_acls(self.admin_context, port, txn)
+        self.assertTrue(self.ovn.acl_rows)
+
+    def test_create_port(self):
+        with self._measure('create_port'):
+            self._create_port(self.members_sg)
+        self.assertTrue(self.ovn.acl_rows)
+
+    def test_refresh_remote_security_group(self):
+        with self._measure('_refresh_remote_security_group'):
+            self.plugin._refresh_remote_security_group(self.admin_context,
+                                                       self.members_sg)
+        self.assertTrue(self.ovn.acl_rows)
+
+    def test_create_security_group_rule(self):
+        with self._measure('create_security_group_rule'):
+            self._create_sg_rule(self.members_sg, protocol='udp',
+                                 port_range_min=53, port_range_max=53)
+        self.assertTrue(self.ovn.acl_rows)
+
+    def test_create_port_remote_group_chain(self):
+        with self._measure('create_port (remote group chain of %d)' %
+                           self.CHAIN):
+            self._create_port(self.chain[0])
+        self.assertTrue(self.ovn.acl_rows)
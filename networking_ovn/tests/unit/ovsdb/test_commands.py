@@ -0,0 +1,115 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron.agent.ovsdb.native import idlutils
+from neutron.tests import base
+
+from networking_ovn.common import constants as ovn_const
+from networking_ovn.ovsdb import commands
+
+
+def _acl(match, direction='to-lport', security_group='sg1'):
+    return mock.Mock(direction=direction, match=match,
+                     priority=ovn_const.ACL_PRIORITY_ALLOW,
+                     action=ovn_const.ACL_ACTION_ALLOW_RELATED,
+                     external_ids={ovn_const.OVN_SG_EXT_ID_KEY:
+                                   security_group})
+
+
+def _port(name, security_groups):
+    port = mock.Mock(external_ids={})
+    port.name = name
+    if security_groups:
+        port.external_ids[ovn_const.OVN_SG_IDS_EXT_ID_KEY] = (
+            ' '.join(security_groups))
+    return port
+
+
+class TestSetSecurityGroupACLsCommand(base.BaseTestCase):
+
+    ACLS = [{'priority': ovn_const.ACL_PRIORITY_ALLOW,
+             'action': ovn_const.ACL_ACTION_ALLOW_RELATED,
+             'log': False,
+             'direction': 'to-lport',
+             'match': 'ip4 && tcp'},
+            {'priority': ovn_const.ACL_PRIORITY_ALLOW,
+             'action': ovn_const.ACL_ACTION_ALLOW_RELATED,
+             'log': False,
+             'direction': 'from-lport',
+             'match': 'ip4'}]
+
+    def setUp(self):
+        super(TestSetSecurityGroupACLsCommand, self).setUp()
+        self.lswitch = mock.Mock(ports=[], acls=[])
+        mock.patch.object(idlutils, 'row_by_value',
+                          return_value=self.lswitch).start()
+        self.txn = mock.Mock()
+        self.inserted = []
+        self.txn.insert.side_effect = self._insert
+
+    def _insert(self, table):
+        row = mock.Mock()
+        self.inserted.append(row)
+        return row
+
+    def _run(self, acls=None):
+        commands.SetSecurityGroupACLsCommand(
+            mock.MagicMock(), 'neutron-net1', 'sg1',
+            self.ACLS if acls is None else acls).run_idl(self.txn)
+
+    def test_ports_of_the_security_group(self):
+        self.lswitch.ports = [_port('p2', ['sg1', 'sg2']),
+                              _port('p1', ['sg1']),
+                              _port('p3', ['sg2']),
+                              _port('p4', [])]
+        self._run()
+        self.assertEqual(
+            ['outport == {"p1", "p2"} && ip4 && tcp',
+             'inport == {"p1", "p2"} && ip4'],
+            [row.match for row in self.inserted])
+        for row in self.inserted:
+            self.assertEqual({ovn_const.OVN_SG_EXT_ID_KEY: 'sg1'},
+                             row.external_ids)
+        self.assertEqual([mock.call('ports'), mock.call('acls')],
+                         self.lswitch.verify.call_args_list)
+
+    def test_changed_acls_only(self):
+        unchanged = _acl('outport == "p1" && ip4 && tcp')
+        stale = _acl('inport == "p1" && ip6', direction='from-lport')
+        other = _acl('outport == "p1" && ip4 && tcp', security_group='sg2')
+        self.lswitch.ports = [_port('p1', ['sg1', 'sg2'])]
+        self.lswitch.acls = [unchanged, stale, other]
+        self._run()
+        self.assertEqual(['inport == "p1" && ip4'],
+                         [row.match for row in self.inserted])
+        stale.delete.assert_called_once_with()
+        self.assertFalse(unchanged.delete.called)
+        self.assertFalse(other.delete.called)
+
+    def test_unchanged(self):
+        self.lswitch.ports = [_port('p1', ['sg1'])]
+        self.lswitch.acls = [_acl('outport == "p1" && ip4 && tcp'),
+                             _acl('inport == "p1" && ip4',
+                                  direction='from-lport')]
+        self._run()
+        self.assertFalse(self.txn.insert.called)
+        self.assertFalse(self.lswitch.verify.called)
+
+    def test_no_ports(self):
+        acl = _acl('outport == "p1" && ip4 && tcp')
+        self.lswitch.ports = [_port('p1', ['sg2'])]
+        self.lswitch.acls = [acl]
+        self._run()
+        self.assertFalse(self.txn.insert.called)
+        acl.delete.assert_called_once_with()
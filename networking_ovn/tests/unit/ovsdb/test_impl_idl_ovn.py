@@ -0,0 +1,112 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import uuid
+
+import mock
+from ovs.db import idl as ovs_idl
+
+from neutron.tests import base
+
+from networking_ovn.common import metrics
+from networking_ovn.ovsdb import impl_idl_ovn
+from networking_ovn.tests.unit.ovsdb import test_ovsdb_monitor
+
+
+class TestReplicaStats(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestReplicaStats, self).setUp()
+        helper = ovs_idl.SchemaHelper(
+            schema_json=test_ovsdb_monitor.OVN_NB_SCHEMA)
+        helper.register_all()
+        self.idl = ovs_idl.Idl("remote", helper)
+
+    def _add_row(self, table, row_json):
+        table = self.idl.tables[table]
+        row_uuid = str(uuid.uuid4())
+        table.rows[row_uuid] = ovs_idl.Row.from_json(self.idl, table,
+                                                     row_uuid, row_json)
+
+    def test_get_replica_stats(self):
+        self._add_row('Logical_Port', {"name": "port-1", "up": True,
+                                       "addresses": ["10.0.0.2"]})
+        self._add_row('Logical_Port', {"name": "port-22"})
+        stats = impl_idl_ovn.get_replica_stats(self.idl)
+
+        self.assertEqual({'rows': 0, 'bytes': 0, 'columns': {'name': 0}},
+                         stats['Logical_Switch'])
+        lp_stats = stats['Logical_Port']
+        self.assertEqual(2, lp_stats['rows'])
+        self.assertEqual(6 + 7, lp_stats['columns']['name'])
+        self.assertEqual(8, lp_stats['columns']['addresses'])
+        self.assertEqual(8, lp_stats['columns']['up'])
+        self.assertEqual(0, lp_stats['columns']['type'])
+        self.assertEqual(6 + 7 + 8 + 8, lp_stats['bytes'])
+
+
+class TestTxnOpCounts(TestReplicaStats):
+
+    def test_get_txn_op_counts(self):
+        self._add_row('Logical_Port', {"name": "port-1", "up": True})
+        data = list(self.idl.tables['Logical_Port'].rows.values())[0]._data
+        txn = mock.Mock(_txn_rows={
+            'inserted': mock.Mock(_data=None, _changes=dict(data)),
+            'updated': mock.Mock(_data=data, _changes={'up': data['up']}),
+            'deleted': mock.Mock(_data=data, _changes=None),
+            'verified': mock.Mock(_data=data, _changes={})})
+        self.assertEqual({'inserted': 1, 'updated': 1, 'deleted': 1,
+                          'bytes': 6 + 8 + 8},
+                         impl_idl_ovn.get_txn_op_counts(txn))
+
+
+class TestOvnTransaction(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestOvnTransaction, self).setUp()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.api = mock.Mock()
+        self.connection = mock.Mock()
+
+    @mock.patch.object(ovs_idl, 'Transaction')
+    def test_do_commit_metrics(self, mock_txn):
+        with metrics.operation('create_port'):
+            txn = impl_idl_ovn.OvnTransaction(self.api, self.connection, 10)
+        cmd = mock.Mock(result='result')
+        txn.add(cmd)
+        ovs_txn = mock_txn.return_value
+        ovs_txn.commit_block.return_value = ovs_txn.SUCCESS
+        txn.queued_at = 0
+
+        self.assertEqual(['result'], txn.do_commit())
+        cmd.run_idl.assert_called_once_with(ovs_txn)
+        summary = metrics.summary()
+        for step in ('queue', 'run_idl', 'commit'):
+            self.assertEqual(
+                1, summary['ovsdb.txn.%s.create_port' % step]['count'])
+        self.assertEqual(1, summary['ovsdb.cmd.Mock']['count'])
+
+    def test_large_transaction_warning(self):
+        txn = impl_idl_ovn.OvnTransaction(self.api, self.connection, 10)
+        with mock.patch.object(impl_idl_ovn.LOG, 'warning') as warning:
+            txn.op_counts = {'inserted': 1, 'updated': 0, 'deleted': 0,
+                             'bytes': 100}
+            txn._check_op_counts()
+            self.assertFalse(warning.called)
+            txn.op_counts['updated'] = 10000
+            txn._check_op_counts()
+            self.assertEqual(1, warning.call_count)
+
+    def test_untagged_transaction(self):
+        txn = impl_idl_ovn.OvnTransaction(self.api, self.connection, 10)
+        self.assertEqual('unknown', txn.operation)
@@ -20,6 +20,7 @@ from ovs.db import idl as ovs_idl
 
 from networking_ovn.common import constants as ovn_const
 from networking_ovn.ovsdb import ovsdb_monitor
+from networking_ovn.ovsdb import partition_locks
 from networking_ovn.tests.unit import test_ovn_plugin
 
 OVN_PROFILE = ovn_const.OVN_PORT_BINDING_PROFILE
@@ -51,6 +52,29 @@ OVN_NB_SCHEMA = {
 }
 
 
+OVN_SB_SCHEMA = {
+    "name": "OVN_Southbound", "version": "1.0.0",
+    "tables": {
+        "Port_Binding": {
+            "columns": {
+                "logical_port": {"type": "string"},
+                "chassis": {"type": {"key": {"type": "uuid",
+                                             "refTable": "Chassis",
+                                             "refType": "weak"},
+                                     "min": 0, "max": 1}}},
+            "indexes": [["logical_port"]],
+            "isRoot": True,
+        },
+        "Chassis": {
+            "columns": {"name": {"type": "string"},
+                        "hostname": {"type": "string"}},
+            "indexes": [["name"]],
+            "isRoot": True,
+        }
+    }
+}
+
+
 class TestOvnIdlNotifyHandler(test_ovn_plugin.OVNPluginTestCase):
 
     def setUp(self):
@@ -81,35 +105,59 @@ class TestOvnIdlNotifyHandler(test_ovn_plugin.OVNPluginTestCase):
         # handles the notify event
         time.sleep(1)
 
-    def test_lport_up_create_event(self):
-        row_data = {"up": True, "name": "foo-name"}
-        self._test_lport_helper('create', row_data)
-        self.plugin.set_port_status_up.assert_called_once_with("foo-name")
+    def test_lport_create_event(self):
+        # The port status of newly dumped logical ports is handled in bulk
+        # by sync_port_status() and not per create event.
+        for up in (True, False):
+            row_data = {"up": up, "name": "foo-name"}
+            self._test_lport_helper('create', row_data)
+        self.assertFalse(self.plugin.set_port_status_up.called)
         self.assertFalse(self.plugin.set_port_status_down.called)
 
-    def test_lport_down_create_event(self):
-        row_data = {"up": False, "name": "foo-name"}
-        self._test_lport_helper('create', row_data)
-        self.plugin.set_port_status_down.assert_called_once_with("foo-name")
-        self.assertFalse(self.plugin.set_port_status_up.called)
+    def test_lport_create_event_after_port_status_sync(self):
+        self.idl._port_status_synced = True
+        self.plugin.sync_port_status = mock.Mock()
+        self._test_lport_helper('create', {"up": True, "name": "port-up"})
+        self._test_lport_helper('create', {"up": False, "name": "port-down"})
+        self._test_lport_helper('create', {"up": ['set', []],
+                                           "name": "port-not-set"})
+        self.assertFalse(self.plugin.sync_port_status.called)
 
-    def test_lport_up_not_set_event(self):
-        row_data = {"up": ['set', []], "name": "foo-name"}
-        self._test_lport_helper('create', row_data)
+        self.idl.flush_port_status()
+        time.sleep(1)
+        self.plugin.sync_port_status.assert_called_once_with(
+            {"port-up": True, "port-down": False})
         self.assertFalse(self.plugin.set_port_status_up.called)
         self.assertFalse(self.plugin.set_port_status_down.called)
 
-    def test_unwatch_logical_port_create_events(self):
-        self.idl.unwatch_logical_port_create_events()
-        row_data = {"up": True, "name": "foo-name"}
-        self._test_lport_helper('create', row_data)
-        self.assertFalse(self.plugin.set_port_status_up.called)
-        self.assertFalse(self.plugin.set_port_status_down.called)
+        # Nothing is queued when no logical port was created.
+        self.plugin.sync_port_status.reset_mock()
+        self.idl.flush_port_status()
+        time.sleep(1)
+        self.assertFalse(self.plugin.sync_port_status.called)
 
-        row_data["up"] = False
-        self._test_lport_helper('create', row_data)
-        self.assertFalse(self.plugin.set_port_status_up.called)
-        self.assertFalse(self.plugin.set_port_status_down.called)
+    def _add_lport_rows(self, rows_json):
+        for row_json in rows_json:
+            row_uuid = str(uuid.uuid4())
+            self.lp_table.rows[row_uuid] = ovs_idl.Row.from_json(
+                self.idl, self.lp_table, row_uuid, row_json)
+
+    def test_sync_port_status(self):
+        self._add_lport_rows([{"up": True, "name": "port-up"},
+                              {"up": False, "name": "port-down"},
+                              {"up": ['set', []], "name": "port-not-set"}])
+        self.plugin.sync_port_status = mock.Mock()
+        self.idl.sync_port_status()
+        self.plugin.sync_port_status.assert_called_once_with(
+            {"port-up": True, "port-down": False})
+
+    def test_sync_port_status_no_ovsdb_lock(self):
+        self._add_lport_rows([{"up": True, "name": "port-up"}])
+        self.idl.has_lock = False
+        self.idl.is_lock_contended = True
+        self.plugin.sync_port_status = mock.Mock()
+        self.idl.sync_port_status()
+        self.assertFalse(self.plugin.sync_port_status.called)
 
     def test_lport_up_update_event(self):
         new_row_json = {"up": True, "name": "foo-name"}
@@ -157,6 +205,142 @@ class TestOvnIdlNotifyHandler(test_ovn_plugin.OVNPluginTestCase):
         self.assertFalse(self.plugin.set_port_status_up.called)
         self.assertFalse(self.plugin.set_port_status_down.called)
 
+    def test_notify_partitioned_events(self):
+        self.idl.partition_locks = mock.Mock()
+        self.idl.partition_locks.owns.side_effect = (
+            lambda key: key == 'owned-port')
+        self.idl.notify_handler.notify = mock.Mock()
+        self._test_lport_helper('update', {"up": True, "name": "other-port"},
+                                old_row_json={"up": False})
+        self.assertFalse(self.idl.notify_handler.notify.called)
+        self._test_lport_helper('update', {"up": True, "name": "owned-port"},
+                                old_row_json={"up": False})
+        self.assertTrue(self.idl.notify_handler.notify.called)
+
+    def test_sync_partitions(self):
+        self._add_lport_rows([{"up": True, "name": "port-%d" % i}
+                              for i in range(10)])
+        self.idl.partition_locks = mock.Mock(partitions=3)
+        self.plugin.sync_port_status = mock.Mock()
+        self.idl.sync_partitions(set([1]))
+        time.sleep(1)
+        expected = dict(
+            ("port-%d" % i, True) for i in range(10)
+            if partition_locks.partition_of("port-%d" % i, 3) == 1)
+        self.plugin.sync_port_status.assert_called_once_with(expected)
+
+    def test_notify_handler_drain(self):
+        event = mock.Mock(ONETIME=False)
+        self.idl.notify_handler.notifications.put((event, 'update', None,
+                                                   None))
+        self.assertTrue(self.idl.notify_handler.drain(5))
+        event.run.assert_called_once_with('update', None, None)
+
+    def test_notify_handler_drain_timeout(self):
+        event = mock.Mock(ONETIME=False)
+        event.run.side_effect = lambda *args: time.sleep(1)
+        self.idl.notify_handler.notifications.put((event, 'update', None,
+                                                   None))
+        self.assertFalse(self.idl.notify_handler.drain(0))
+
+    def test_connection_stop(self):
+        conn = ovsdb_monitor.OvnConnection('remote', 10, 'OVN_Northbound')
+        conn.idl = self.idl
+        conn.thread = mock.Mock()
+        conn.thread.is_alive.return_value = False
+        self.idl.notify_handler.notify = mock.Mock()
+        with mock.patch.object(conn.txns, 'put') as put:
+            conn.stop(5)
+        put.assert_called_once_with(mock.ANY, timeout=5)
+        self.assertIsInstance(put.call_args[0][0],
+                              ovsdb_monitor._StopTransaction)
+        conn.thread.join.assert_called_once_with(5)
+        self._test_lport_helper('update', {"up": True, "name": "p1"},
+                                old_row_json={"up": False})
+        self.assertFalse(self.idl.notify_handler.notify.called)
+
+    def test_connection_run_stopped(self):
+        conn = ovsdb_monitor.OvnConnection('remote', 10, 'OVN_Northbound')
+        conn.idl = mock.Mock()
+        conn.poller = mock.Mock()
+        conn.txns = mock.Mock()
+        committed = mock.Mock()
+        queued = mock.Mock()
+        conn.txns.get_nowait.side_effect = [
+            committed, ovsdb_monitor._StopTransaction(), queued, None]
+        conn.run()
+        committed.results.put.assert_called_once_with(
+            committed.do_commit.return_value)
+        self.assertFalse(queued.do_commit.called)
+        # The callers of the transactions queued after the stop get an
+        # error rather than waiting for a result.
+        result = queued.results.put.call_args[0][0]
+        self.assertIsInstance(result.ex, RuntimeError)
+        conn.idl.close.assert_called_once_with()
+
+    def test_api_connection_stop(self):
+        conn = ovsdb_monitor.OvnApiConnection('remote', 10, 'OVN_Northbound')
+        conn.idl = mock.Mock(spec=ovs_idl.Idl)
+        conn.thread = mock.Mock()
+        conn.thread.is_alive.return_value = False
+        with mock.patch.object(conn.txns, 'put') as put:
+            conn.stop(5)
+            conn.stop(5)
+        put.assert_called_once_with(mock.ANY, timeout=5)
+        self.assertIsInstance(put.call_args[0][0],
+                              ovsdb_monitor._StopTransaction)
+        conn.thread.join.assert_called_once_with(5)
+
+    def _notify_rows(self, *notifications):
+        for event, row_uuid, new_row_json, old_row_json in notifications:
+            row = ovs_idl.Row.from_json(self.idl, self.lp_table, row_uuid,
+                                        new_row_json)
+            old_row = None
+            if old_row_json:
+                old_row = ovs_idl.Row.from_json(self.idl, self.lp_table,
+                                                row_uuid, old_row_json)
+            self.idl.notify(event, row, updates=old_row)
+
+    def test_subscribe(self):
+        callback = mock.Mock()
+        self.idl.subscribe('Logical_Port', callback, columns=['up'])
+        other_callback = mock.Mock()
+        self.idl.subscribe('Logical_Switch', other_callback)
+        p1, p2, p3, p4 = [str(uuid.uuid4()) for i in range(4)]
+        self._notify_rows(
+            ('create', p1, {"name": "p1", "up": False}, None),
+            ('update', p1, {"name": "p1", "up": True}, {"up": False}),
+            ('update', p2, {"name": "p2", "up": True}, {"up": False}),
+            ('update', p2, {"name": "p2", "up": True,
+                            "addresses": ["10.0.0.2"]},
+             {"addresses": ["10.0.0.3"]}),
+            ('create', p3, {"name": "p3"}, None),
+            ('delete', p3, {"name": "p3"}, None),
+            ('delete', p4, {"name": "p4"}, None))
+        self.assertFalse(callback.called)
+
+        self.idl.flush_changes()
+        time.sleep(1)
+        self.assertEqual(1, callback.call_count)
+        changes = callback.call_args[0][0]
+        self.assertEqual('Logical_Port', changes.table)
+        self.assertEqual([p1], [row.uuid for row in changes.created])
+        self.assertEqual([(p2, {'up': [True]})],
+                         [(row.uuid, changed)
+                          for row, changed in changes.updated])
+        self.assertEqual([p4], [row.uuid for row in changes.deleted])
+        self.assertFalse(other_callback.called)
+
+    def test_unsubscribe(self):
+        callback = mock.Mock()
+        subscription = self.idl.subscribe('Logical_Port', callback)
+        self._notify_rows(('create', str(uuid.uuid4()), {"name": "p1"},
+                           None))
+        self.idl.unsubscribe(subscription)
+        self.idl.flush_changes()
+        time.sleep(1)
+        self.assertFalse(callback.called)
+
     def test_notify_no_ovsdb_lock(self):
         self.idl.has_lock = False
         self.idl.is_lock_contended = True
@@ -164,9 +348,162 @@ class TestOvnIdlNotifyHandler(test_ovn_plugin.OVNPluginTestCase):
         self.idl.notify("create", mock.ANY)
         self.assertFalse(self.idl.notify_handler.notify.called)
 
+    def test_notify_no_ovsdb_lock_no_logging(self):
+        self.idl.has_lock = False
+        self.idl.is_lock_contended = True
+        self.idl.notify_handler.matching_events = mock.Mock()
+        with mock.patch.object(ovsdb_monitor, 'LOG') as log:
+            self._test_lport_helper('update', {"up": True, "name": "p1"},
+                                    old_row_json={"up": False})
+        self.assertFalse(log.debug.called)
+        self.assertFalse(self.idl.notify_handler.matching_events.called)
+
+    def test_log_event_lock_change(self):
+        with mock.patch.object(ovsdb_monitor, 'LOG') as log:
+            self.idl._log_event_lock_change()
+            self.idl._log_event_lock_change()
+            self.assertEqual(1, log.info.call_count)
+            self.idl.has_lock = False
+            self.idl._log_event_lock_change()
+            self.assertEqual(2, log.info.call_count)
+
     def test_notify_ovsdb_lock_not_yet_contended(self):
         self.idl.has_lock = False
         self.idl.is_lock_contended = False
         self.idl.notify_handler.notify = mock.Mock()
         self.idl.notify("create", mock.ANY)
         self.assertTrue(self.idl.notify_handler.notify.called)
+
+
+class TestOvnSbIdlNotifyHandler(test_ovn_plugin.OVNPluginTestCase):
+
+    def setUp(self):
+        super(TestOvnSbIdlNotifyHandler, self).setUp()
+        helper = ovs_idl.SchemaHelper(schema_json=OVN_SB_SCHEMA)
+        helper.register_all()
+        self.idl = ovsdb_monitor.OvnSbIdl(self.plugin, "remote", helper)
+        self.idl.lock_name = self.idl.event_lock_name
+        self.idl.has_lock = True
+        self.pb_table = self.idl.tables.get('Port_Binding')
+        self.chassis_table = self.idl.tables.get('Chassis')
+        self.chassis_uuid = str(uuid.uuid4())
+        self.chassis = ovs_idl.Row.from_json(
+            self.idl, self.chassis_table, self.chassis_uuid,
+            {"name": "chassis-1", "hostname": "compute-1"})
+        self.chassis_table.rows[self.chassis_uuid] = self.chassis
+        self.plugin.set_port_status_up = mock.Mock()
+        self.plugin.set_port_status_down = mock.Mock()
+
+    def _test_port_binding_helper(self, new_row_json, old_row_json):
+        row_uuid = str(uuid.uuid4())
+        row = ovs_idl.Row.from_json(self.idl, self.pb_table, row_uuid,
+                                    new_row_json)
+        old_row = ovs_idl.Row.from_json(self.idl, self.pb_table, row_uuid,
+                                        old_row_json)
+        self.idl.notify('update', row, updates=old_row)
+        time.sleep(1)
+
+    def test_port_binding_chassis_set_event(self):
+        self._test_port_binding_helper(
+            {"logical_port": "foo-name",
+             "chassis": ["uuid", self.chassis_uuid]},
+            {"chassis": ["set", []]})
+        self.plugin.set_port_status_up.assert_called_once_with("foo-name")
+        self.assertFalse(self.plugin.set_port_status_down.called)
+
+    def test_port_binding_chassis_cleared_event(self):
+        self._test_port_binding_helper(
+            {"logical_port": "foo-name", "chassis": ["set", []]},
+            {"chassis": ["uuid", self.chassis_uuid]})
+        self.plugin.set_port_status_down.assert_called_once_with("foo-name")
+        self.assertFalse(self.plugin.set_port_status_up.called)
+
+    def test_port_binding_other_column_update_event(self):
+        self._test_port_binding_helper(
+            {"logical_port": "foo-name",
+             "chassis": ["uuid", self.chassis_uuid]},
+            {"logical_port": "bar-name"})
+        self.assertFalse(self.plugin.set_port_status_up.called)
+        self.assertFalse(self.plugin.set_port_status_down.called)
+
+    def test_chassis_delete_event(self):
+        with mock.patch.object(ovsdb_monitor.LOG, 'warning') as warning:
+            self.idl.notify('delete', self.chassis)
+            time.sleep(1)
+        self.assertEqual(1, warning.call_count)
+        self.assertEqual({'name': 'chassis-1', 'host': 'compute-1'},
+                         warning.call_args[0][1])
+
+    def test_notify_no_ovsdb_lock(self):
+        self.idl.has_lock = False
+        self.idl.is_lock_contended = True
+        self.idl.notify_handler.notify = mock.Mock()
+        self.idl.notify("update", mock.ANY)
+        self.assertFalse(self.idl.notify_handler.notify.called)
+
+
+class TestOvnWorker(test_ovn_plugin.OVNPluginTestCase):
+
+    def test_stop_and_wait(self):
+        worker = ovsdb_monitor.OvnWorker()
+        connections = [mock.Mock(), mock.Mock()]
+        for conn in connections:
+            worker.add_connection(conn)
+        server = mock.Mock()
+        worker.add_server(server)
+        worker.stop()
+        worker.wait()
+        server.stop.assert_called_once_with()
+        for conn in connections:
+            conn.stop.assert_called_once_with(10)
+            conn.wait.assert_called_once_with()
+
+
+class TestOvnRegisterTables(test_ovn_plugin.OVNPluginTestCase):
+
+    def test_register_tables(self):
+        helper = ovs_idl.SchemaHelper(schema_json=OVN_NB_SCHEMA)
+        ovsdb_monitor.register_tables(
+            helper, {'Logical_Port': ('name', 'up', 'unknown-column'),
+                     'Unknown_Table': ('name',)})
+        idl = ovsdb_monitor.OvnIdl(self.plugin, "remote", helper)
+        self.assertEqual(['Logical_Port'], list(idl.tables))
+        self.assertEqual(set(['name', 'up']),
+                         set(idl.tables['Logical_Port'].columns))
+
+
+class TestOvnStartConnection(test_ovn_plugin.OVNPluginTestCase):
+
+    def setUp(self):
+        super(TestOvnStartConnection, self).setUp()
+        self.helper = ovs_idl.SchemaHelper(schema_json=OVN_NB_SCHEMA)
+        mock.patch.object(ovsdb_monitor, 'get_schema_helper',
+                          return_value=self.helper).start()
+        self.wait = mock.patch.object(ovsdb_monitor.idlutils,
+                                      'wait_for_change').start()
+        self.conn = mock.MagicMock(idl=None, timeout=5)
+
+    def test_start_connection(self):
+        idl = mock.Mock()
+        create_idl = mock.Mock(return_value=idl)
+        initial_dump_received = mock.Mock()
+        with mock.patch.object(ovsdb_monitor, 'register_tables') as reg, \
+                mock.patch.object(ovsdb_monitor.threading, 'Thread') as th:
+            th.return_value.start.side_effect = (
+                lambda: initial_dump_received.assert_called_once_with())
+            ovsdb_monitor.start_connection(
+                self.conn, ovsdb_monitor.OVN_SB_TABLES, create_idl,
+                initial_dump_received)
+        reg.assert_called_once_with(self.helper, ovsdb_monitor.OVN_SB_TABLES)
+        create_idl.assert_called_once_with(self.helper)
+        self.assertIs(idl, self.conn.idl)
+        self.wait.assert_called_once_with(idl, 5)
+        self.conn.thread.start.assert_called_once_with()
+
+    def test_start_connection_started(self):
+        self.conn.idl = mock.Mock()
+        create_idl = mock.Mock()
+        ovsdb_monitor.start_connection(self.conn, ovsdb_monitor.OVN_SB_TABLES,
+                                       create_idl)
+        self.assertFalse(create_idl.called)
+        self.assertFalse(self.wait.called)
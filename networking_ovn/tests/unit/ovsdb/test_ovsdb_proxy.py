@@ -0,0 +1,96 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+
+import fixtures
+import mock
+
+from neutron.tests import base
+
+from networking_ovn.common import metrics
+from networking_ovn.ovsdb import ovsdb_proxy
+
+
+class TestOvsdbProxy(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestOvsdbProxy, self).setUp()
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                            'ovn_nb_proxy.sock')
+        self.api = mock.MagicMock()
+        self.txn = self.api.transaction.return_value
+        self.server = ovsdb_proxy.OvsdbProxyServer(self.api, path)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.proxy = ovsdb_proxy.OvsdbProxyIdl(path, 5)
+
+    def test_transaction(self):
+        self.txn.commit.return_value = [None, None]
+        with self.proxy.transaction(check_error=True) as txn:
+            txn.add(self.proxy.create_lswitch(
+                'neutron-n1', external_ids={'neutron:network_name': 'n1'}))
+            txn.add(self.proxy.delete_lport('p1', 'neutron-n1'))
+        self.assertEqual([None, None], txn.result)
+        self.api.transaction.assert_called_once_with(check_error=True,
+                                                     log_errors=True)
+        self.api.create_lswitch.assert_called_once_with(
+            'neutron-n1', True, external_ids={'neutron:network_name': 'n1'})
+        self.api.delete_lport.assert_called_once_with(
+            'p1', 'neutron-n1', None, True)
+        self.txn.add.assert_has_calls(
+            [mock.call(self.api.create_lswitch.return_value),
+             mock.call(self.api.delete_lport.return_value)])
+
+    def test_transaction_operation(self):
+        operations = []
+        self.txn.commit.side_effect = (
+            lambda: operations.append(metrics.current_operation()))
+        with metrics.operation('update_port'):
+            self.proxy.delete_lport('p1', 'neutron-n1').execute()
+        self.proxy.delete_lport('p1', 'neutron-n1').execute()
+        self.assertEqual(['update_port', None], operations)
+
+    def test_command_columns(self):
+        cmd = self.proxy.add_acl('neutron-n1', 'p1', direction='to-lport',
+                                 match='ip')
+        self.assertEqual({'direction': 'to-lport', 'match': 'ip'},
+                         cmd.columns)
+
+    def test_execute_error(self):
+        self.txn.commit.side_effect = RuntimeError('Switch does not exist')
+        cmd = self.proxy.delete_lswitch('neutron-n1', if_exists=False)
+        self.assertRaises(RuntimeError, cmd.execute, check_error=True,
+                          log_errors=False)
+        self.assertIsNone(cmd.execute(check_error=False, log_errors=False))
+
+    def test_unsupported_command(self):
+        txn = self.proxy.transaction(check_error=True)
+        txn.add(ovsdb_proxy.ProxyCommand(self.proxy, 'transaction', (), {}))
+        self.assertRaises(RuntimeError, txn.commit)
+        self.assertFalse(self.txn.commit.called)
+
+    def test_read(self):
+        self.api.get_lswitch_ext_ids.return_value = {'neutron:foo': 'bar'}
+        self.assertEqual({'neutron:foo': 'bar'},
+                         self.proxy.get_lswitch_ext_ids('neutron-n1'))
+        self.api.get_lswitch_ext_ids.assert_called_once_with('neutron-n1')
+
+    def test_socket_permissions(self):
+        self.assertEqual(0, os.stat(self.server.path).st_mode & 0o077)
+
+    def test_stop(self):
+        self.assertTrue(os.path.exists(self.server.path))
+        self.server.stop()
+        self.assertFalse(os.path.exists(self.server.path))
+        # Stopping again is a no-op.
+        self.server.stop()
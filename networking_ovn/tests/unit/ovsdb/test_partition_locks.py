@@ -0,0 +1,199 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from ovs import jsonrpc
+
+from neutron.tests import base
+
+from networking_ovn.ovsdb import partition_locks
+
+
+class FakeLockServer(object):
+    """The locks of an ovsdb-server, shared by the sessions."""
+
+    def __init__(self):
+        self.owners = {}
+        self.waiters = {}
+
+    def session(self):
+        session = mock.Mock()
+        session.get_seqno.return_value = 1
+        session.is_connected.return_value = True
+        session.messages = []
+        session.recv.side_effect = lambda: (session.messages.pop(0)
+                                            if session.messages else None)
+        session.send.side_effect = lambda msg: self._handle(session, msg)
+        return session
+
+    def _handle(self, session, msg):
+        name = msg.params[0]
+        waiters = self.waiters.setdefault(name, [])
+        if msg.method == 'lock':
+            if self.owners.get(name) is None:
+                self.owners[name] = session
+            else:
+                waiters.append(session)
+            session.messages.append(jsonrpc.Message.create_reply(
+                {'locked': self.owners[name] is session}, msg.id))
+        elif msg.method == 'unlock':
+            if self.owners.get(name) is session:
+                self.owners[name] = waiters.pop(0) if waiters else None
+                if self.owners[name] is not None:
+                    self.owners[name].messages.append(
+                        jsonrpc.Message.create_notify('locked', [name]))
+            elif session in waiters:
+                waiters.remove(session)
+            session.messages.append(jsonrpc.Message.create_reply({}, msg.id))
+
+    def close(self, session):
+        for name, owner in list(self.owners.items()):
+            if owner is session:
+                self._handle(session, jsonrpc.Message.create_request(
+                    'unlock', [name]))
+        for waiters in self.waiters.values():
+            if session in waiters:
+                waiters.remove(session)
+
+
+class TestPartitionLocks(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestPartitionLocks, self).setUp()
+        self.server = FakeLockServer()
+        self.open = mock.patch.object(jsonrpc.Session, 'open').start()
+        self.time = mock.patch('time.time', return_value=1000).start()
+
+    def _locks(self, host, partitions=3):
+        self.open.return_value = self.server.session()
+        locks = partition_locks.PartitionLocks(
+            'tcp:127.0.0.1:6641', partitions, 'lock', host, mock.Mock(),
+            max_delay=0, interval=15)
+        locks.run()
+        return locks
+
+    def _run(self, locks, seconds=0):
+        # The replies are received on the next run.
+        self.time.return_value += seconds
+        for i in range(3):
+            for lock in locks:
+                lock.run()
+
+    def _partitions(self, locks):
+        return set(p for p, name in enumerate(locks.lock_names)
+                   if self.server.owners.get(name) is locks.session)
+
+    def test_partition_of(self):
+        self.assertEqual(partition_locks.partition_of('port-1', 7),
+                         partition_locks.partition_of('port-1', 7))
+        partitions = set(partition_locks.partition_of('port-%d' % i, 7)
+                         for i in range(100))
+        self.assertEqual(set(range(7)), partitions)
+
+    def test_single_server(self):
+        locks = self._locks('host-1')
+        self._run([locks])
+        self.assertIsNotNone(locks.slot)
+        self.assertEqual(1, locks.servers)
+        self.assertEqual(frozenset([0, 1, 2]), locks.owned)
+        self.assertEqual(set([0, 1, 2]), self._partitions(locks))
+        self.assertEqual([set([0, 1, 2])],
+                         [c[0][0] for c in
+                          locks.on_acquired.call_args_list])
+        # Only its slot lock is held.
+        self.assertEqual(
+            [locks.slot_names[locks.slot]],
+            [name for name, owner in self.server.owners.items()
+             if owner is locks.session and name in locks.slot_names])
+
+    def test_lock_request_delay(self):
+        self.open.return_value = self.server.session()
+        locks = partition_locks.PartitionLocks(
+            'tcp:127.0.0.1:6641', 3, 'lock', 'host-1', mock.Mock(),
+            max_delay=10)
+        locks.run()
+        self.assertFalse(self.open.return_value.send.called)
+        self._run([locks], seconds=10)
+        self.assertEqual(frozenset([0, 1, 2]), locks.owned)
+
+    def test_late_joiner(self):
+        first = self._locks('host-1', partitions=4)
+        self._run([first])
+        self.assertEqual(frozenset(range(4)), first.owned)
+
+        second = self._locks('host-2', partitions=4)
+        self._run([first, second])
+        self.assertEqual(2, second.servers)
+        self.assertNotEqual(first.slot, second.slot)
+        # The first server only releases partitions once it counted the
+        # second server twice.
+        self._run([first, second], seconds=15)
+        self.assertEqual(frozenset(range(4)), first.owned)
+        self._run([first, second], seconds=15)
+        self.assertEqual(2, first.servers)
+        self.assertEqual(2, len(first.owned))
+        self.assertEqual(2, len(second.owned))
+        self.assertEqual(frozenset(), first.owned & second.owned)
+        self.assertEqual(first.owned, self._partitions(first))
+        self.assertEqual(second.owned, self._partitions(second))
+        self.assertEqual(second.owned,
+                         set().union(*[c[0][0] for c in
+                                       second.on_acquired.call_args_list]))
+
+        # Nothing moves any more.
+        owned = first.owned, second.owned
+        self._run([first, second], seconds=15)
+        self.assertEqual(owned, (first.owned, second.owned))
+
+    def test_server_death(self):
+        first = self._locks('host-1', partitions=4)
+        second = self._locks('host-2', partitions=4)
+        self._run([first, second])
+        self._run([first, second], seconds=15)
+        self.assertEqual(4, len(first.owned | second.owned))
+
+        # The ovsdb-server gives the locks of a dead server to the servers
+        # waiting for them, or they are taken when free.
+        self.server.close(second.session)
+        self._run([first], seconds=15)
+        self.assertEqual(1, first.servers)
+        self.assertEqual(frozenset(range(4)), first.owned)
+
+    def test_acquire_and_steal(self):
+        locks = self._locks('host-1')
+        self._run([locks])
+        locks.on_acquired.reset_mock()
+        locks.session.messages.append(
+            jsonrpc.Message.create_notify('stolen', ['lock_0']))
+        locks.run()
+        self.assertEqual(frozenset([1, 2]), locks.owned)
+        self.assertFalse(locks.on_acquired.called)
+
+    def test_owns(self):
+        locks = self._locks('host-1')
+        key = 'port-1'
+        locks.owned = frozenset([partition_locks.partition_of(key, 3)])
+        self.assertTrue(locks.owns(key))
+        locks.owned = frozenset()
+        self.assertFalse(locks.owns(key))
+
+    def test_reconnect_loses_locks(self):
+        locks = self._locks('host-1')
+        self._run([locks])
+        self.server.owners = {}
+        locks.max_delay = 10
+        locks.session.get_seqno.return_value = 2
+        locks.run()
+        self.assertEqual(frozenset(), locks.owned)
+        self.assertIsNone(locks.slot)
+        self._run([locks], seconds=10)
+        self.assertEqual(frozenset([0, 1, 2]), locks.owned)
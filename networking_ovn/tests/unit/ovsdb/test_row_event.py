@@ -0,0 +1,116 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron.tests import base
+
+from networking_ovn.ovsdb import row_event
+
+
+class FakeEvent(row_event.RowEvent):
+
+    def run(self, event, row, old):
+        pass
+
+
+class FakeRow(object):
+
+    def __init__(self, table='Logical_Port', **columns):
+        self._table = mock.Mock()
+        self._table.name = table
+        for name, value in columns.items():
+            setattr(self, name, value)
+
+
+class TestRowEvent(base.BaseTestCase):
+
+    def _matches(self, conditions, row, old_conditions=None, old=None,
+                 event=row_event.RowEvent.ROW_UPDATE):
+        ev = FakeEvent((event,), 'Logical_Port', conditions,
+                       old_conditions=old_conditions)
+        return ev.matches(event, row, old)
+
+    def test_matches_event_and_table(self):
+        ev = FakeEvent((row_event.RowEvent.ROW_CREATE,), 'Logical_Port', None)
+        self.assertTrue(ev.matches(row_event.RowEvent.ROW_CREATE, FakeRow()))
+        self.assertFalse(ev.matches(row_event.RowEvent.ROW_DELETE,
+                                    FakeRow()))
+        self.assertFalse(ev.matches(row_event.RowEvent.ROW_CREATE,
+                                    FakeRow(table='ACL')))
+
+    def test_equal_optional_column(self):
+        self.assertTrue(self._matches((('up', '=', True),),
+                                      FakeRow(up=[True])))
+        self.assertFalse(self._matches((('up', '=', True),),
+                                       FakeRow(up=[False])))
+        self.assertTrue(self._matches((('up', '=', []),), FakeRow(up=[])))
+        self.assertTrue(self._matches((('up', '!=', True),), FakeRow(up=[])))
+
+    def test_map_column_subset(self):
+        row = FakeRow(external_ids={'neutron:port_name': 'p1',
+                                    'neutron:lport': 'lp1'})
+        self.assertTrue(self._matches(
+            (('external_ids', '=', {'neutron:port_name': 'p1'}),), row))
+        self.assertFalse(self._matches(
+            (('external_ids', '=', {'neutron:port_name': 'p2'}),), row))
+        self.assertFalse(self._matches(
+            (('external_ids', '=', {'neutron:foo': 'bar'}),), row))
+        self.assertTrue(self._matches(
+            (('external_ids', '!=', {'neutron:port_name': 'p2'}),), row))
+
+    def test_in_operators(self):
+        self.assertTrue(self._matches((('type', 'in', ('', 'router')),),
+                                      FakeRow(type='router')))
+        self.assertFalse(self._matches((('type', 'not in', ('localnet',)),),
+                                       FakeRow(type='localnet')))
+
+    def test_multiple_conditions(self):
+        row = FakeRow(up=[True], type='')
+        self.assertTrue(self._matches((('up', '=', True), ('type', '=', '')),
+                                      row))
+        self.assertFalse(self._matches((('up', '=', True),
+                                        ('type', '=', 'router')), row))
+
+    def test_changed_operator(self):
+        row = FakeRow(up=[True], name='p1')
+        self.assertTrue(self._matches((('up', 'changed', None),), row,
+                                      old=FakeRow(up=[False])))
+        self.assertFalse(self._matches((('up', 'changed', None),), row,
+                                       old=FakeRow(name='p0')))
+        self.assertFalse(self._matches((('up', 'changed', None),), row))
+
+    def test_old_conditions(self):
+        row = FakeRow(up=[True])
+        self.assertTrue(self._matches(None, row, (('up', '=', False),),
+                                      FakeRow(up=[False])))
+        self.assertFalse(self._matches(None, row, (('up', '=', False),)))
+        # The old row only has the columns changed by the update
+        self.assertFalse(self._matches(None, row, (('up', '=', False),),
+                                       FakeRow()))
+
+    def test_unsupported_operator(self):
+        self.assertRaises(ValueError, FakeEvent, ('update',), 'Logical_Port',
+                          (('up', 'includes', True),))
+
+    def test_register_operator(self):
+        self.addCleanup(row_event.OPERATORS.pop, 'startswith')
+        row_event.register_operator(
+            'startswith', lambda val, match: val.startswith(match))
+        self.assertTrue(self._matches((('name', 'startswith', 'neutron-'),),
+                                      FakeRow(name='neutron-p1')))
+
+    def test_conditions_compiled_once(self):
+        ev = FakeEvent(('update',), 'Logical_Port', (('up', '=', True),))
+        with mock.patch.object(row_event, '_compile_condition') as compile:
+            ev.matches('update', FakeRow(up=[True]))
+            self.assertFalse(compile.called)
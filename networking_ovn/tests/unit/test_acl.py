@@ -0,0 +1,81 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron.tests import base
+
+from networking_ovn.common import acl
+
+
+class TestAclMatch(base.BaseTestCase):
+
+    def test_join_match(self):
+        self.assertEqual('outport == "p1" && ip4 && tcp',
+                         acl.join_match(['outport == "p1"', 'ip4', '',
+                                         'tcp', None]))
+
+    def test_set_match(self):
+        self.assertEqual('ip4.src == {10.0.0.2, 10.0.0.3}',
+                         acl.set_match('ip4.src', ['10.0.0.2', '10.0.0.3']))
+        self.assertEqual('ip4.src == 10.0.0.2',
+                         acl.set_match('ip4.src', ['10.0.0.2']))
+        self.assertEqual('', acl.set_match('ip4.src', []))
+
+
+class TestAclCompaction(base.BaseTestCase):
+
+    def test_merge_port_ranges(self):
+        self.assertEqual(
+            [(22, 22), (80, 90), (100, 200)],
+            acl.merge_port_ranges([(100, 150), (80, 85), (22, 22),
+                                   (86, 90), (140, 200), (81, 82)]))
+
+    def test_merge_port_ranges_all_ports(self):
+        self.assertIsNone(acl.merge_port_ranges([(22, 22), None]))
+        self.assertIsNone(acl.merge_port_ranges([(0, 1000), (1001, 65535)]))
+
+    def test_port_ranges_match(self):
+        self.assertEqual('tcp.dst == 22',
+                         acl.port_ranges_match('tcp.dst', [(22, 22)]))
+        self.assertEqual('tcp.dst >= 1000 && tcp.dst <= 1005',
+                         acl.port_ranges_match('tcp.dst', [(1000, 1005)]))
+        self.assertEqual('tcp.dst >= 1024',
+                         acl.port_ranges_match('tcp.dst', [(1024, 65535)]))
+        self.assertEqual(
+            'tcp.dst == {22, 80, 8080/0xfff8}',
+            acl.port_ranges_match('tcp.dst',
+                                  [(22, 22), (80, 80), (8080, 8087)]))
+        self.assertEqual(
+            '(udp.dst == 53 || (udp.dst >= 1000 && udp.dst <= 1005))',
+            acl.port_ranges_match('udp.dst', [(53, 53), (1000, 1005)]))
+
+    def test_compactor(self):
+        compactor = acl.AclCompactor()
+        match = 'outport == "p1" && ip4'
+        compactor.add('ingress', match, 'tcp', 22, 22)
+        compactor.add('ingress', match, 'tcp', 80, 80)
+        compactor.add('ingress', match, 'udp', 1000, 1005)
+        compactor.add('ingress', match, 'udp', 1003, 1010)
+        compactor.add('egress', 'inport == "p1" && ip4', 'tcp', -1, -1)
+        self.assertEqual(
+            [('ingress', match + ' && tcp && tcp.dst == {22, 80}'),
+             ('ingress',
+              match + ' && udp && udp.dst >= 1000 && udp.dst <= 1010'),
+             ('egress', 'inport == "p1" && ip4 && tcp')],
+            compactor.matches())
+
+    def test_compactor_any_protocol(self):
+        compactor = acl.AclCompactor()
+        match = 'outport == "p1" && ip4 && ip4.src == 10.0.0.0/8'
+        compactor.add('ingress', match, 'tcp', 22, 22)
+        compactor.add('ingress', match, None, None, None)
+        compactor.add('ingress', match, 'udp', 53, 53)
+        self.assertEqual([('ingress', match)], compactor.matches())
@@ -0,0 +1,66 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron.tests import base
+
+from networking_ovn.common import metrics
+
+
+class TestMetrics(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestMetrics, self).setUp()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_histogram_summary(self):
+        for i in range(1, 101):
+            metrics.observe('latency', i / 100.0)
+        summary = metrics.summary()['latency']
+        self.assertEqual(100, summary['count'])
+        self.assertAlmostEqual(0.505, summary['mean'])
+        self.assertEqual(0.51, summary['p50'])
+        self.assertEqual(0.91, summary['p90'])
+        self.assertEqual(1.0, summary['p99'])
+        self.assertEqual(1.0, summary['max'])
+
+    def test_histogram_keeps_recent_samples(self):
+        histogram = metrics.Histogram(samples=10)
+        for i in range(100):
+            histogram.observe(i)
+        summary = histogram.summary()
+        self.assertEqual(100, summary['count'])
+        self.assertEqual(95, summary['p50'])
+        self.assertEqual(99, summary['max'])
+
+    def test_empty_histogram(self):
+        summary = metrics.Histogram().summary()
+        self.assertEqual(0, summary['count'])
+        self.assertEqual(0, summary['p99'])
+
+    def test_operation(self):
+        self.assertIsNone(metrics.current_operation())
+        with metrics.operation('create_port'):
+            self.assertEqual('create_port', metrics.current_operation())
+            with metrics.operation('nested'):
+                self.assertEqual('nested', metrics.current_operation())
+            self.assertEqual('create_port', metrics.current_operation())
+        self.assertIsNone(metrics.current_operation())
+
+    def test_tag_operation(self):
+        @metrics.tag_operation
+        def update_port():
+            return metrics.current_operation()
+
+        self.assertEqual('update_port', update_port())
+        with metrics.operation('sync'):
+            self.assertEqual('sync', update_port())
@@ -13,7 +13,9 @@
 #    under the License.
 
 import mock
+from oslo_config import cfg
 
+from networking_ovn.common import constants as ovn_const
 from networking_ovn import ovn_nb_sync
 from networking_ovn.ovsdb import impl_idl_ovn
 from networking_ovn.tests.unit import test_ovn_plugin
@@ -111,6 +113,70 @@ class TestOvnNbSync(test_ovn_plugin.OVNPluginTestCase):
                                       create_network_list, create_port_list,
                                       del_network_list, del_port_list)
 
+    def _test_sync_security_group_acls(self, mode, ports, lport_ext_ids):
+        self.plugin.get_ports = mock.Mock(return_value=ports)
+        self.plugin.set_security_group_acls_in_ovn = mock.Mock()
+        self.plugin._ovn.get_all_logical_ports_ids = mock.Mock(
+            return_value=lport_ext_ids)
+        ovn_nb_sync.OvnNbSynchronizer(
+            self.plugin, self.plugin._ovn, mode).sync_security_group_acls(
+                mock.ANY)
+        return self.plugin.set_security_group_acls_in_ovn.call_args_list
+
+    def test_sync_security_group_acls(self):
+        cfg.CONF.set_override('acl_per_security_group', True, 'ovn')
+        ports = [{'id': 'p1n1', 'network_id': 'n1',
+                  'security_groups': ['sg1']},
+                 {'id': 'p2n1', 'network_id': 'n1',
+                  'security_groups': ['sg2']},
+                 {'id': 'p3n1', 'network_id': 'n1',
+                  'security_groups': ['sg3']},
+                 {'id': 'p1n2', 'network_id': 'n2',
+                  'security_groups': []},
+                 {'id': 'p2n2', 'network_id': 'n2',
+                  'security_groups': ['sg1']}]
+        lport_ext_ids = dict((port['id'], {}) for port in ports)
+        lport_ext_ids['p3n1'] = {ovn_const.OVN_SG_IDS_EXT_ID_KEY: 'sg3'}
+        # p2n2 has no logical port yet.
+        del lport_ext_ids['p2n2']
+
+        self.assertEqual([], self._test_sync_security_group_acls(
+            'log', ports, lport_ext_ids))
+        # The ports already matched by the ACLs of their security groups
+        # are skipped.
+        self.assertEqual(
+            [mock.call(mock.ANY, 'n1', ports[:2], ['sg1', 'sg2'])],
+            self._test_sync_security_group_acls(
+                'repair', ports, lport_ext_ids))
+
+    def test_sync_security_group_acls_batches(self):
+        cfg.CONF.set_override('acl_per_security_group', True, 'ovn')
+        cfg.CONF.set_override('acl_update_batch_size', 2, 'ovn')
+        ports = [{'id': 'p%dn1' % i, 'network_id': 'n1',
+                  'security_groups': ['sg%d' % i]} for i in range(3)]
+        lport_ext_ids = dict((port['id'], {}) for port in ports)
+        self.assertEqual(
+            [mock.call(mock.ANY, 'n1', ports[:2], ['sg0', 'sg1']),
+             mock.call(mock.ANY, 'n1', ports[2:], ['sg2'])],
+            self._test_sync_security_group_acls(
+                'repair', ports, lport_ext_ids))
+
+    def test_sync_security_group_acls_per_port(self):
+        ports = [{'id': 'p1n1', 'network_id': 'n1',
+                  'security_groups': ['sg1']},
+                 {'id': 'p2n1', 'network_id': 'n1',
+                  'security_groups': ['sg2']}]
+        lport_ext_ids = {
+            'p1n1': {},
+            'p2n1': {ovn_const.OVN_SG_IDS_EXT_ID_KEY: 'sg1 sg3'}}
+        # The ports matched by the ACLs of their security groups get their
+        # own ACLs back, and the ACLs of the security groups which matched
+        # them are set without them.
+        self.assertEqual(
+            [mock.call(mock.ANY, 'n1', ports[1:], ['sg1', 'sg2', 'sg3'])],
+            self._test_sync_security_group_acls(
+                'repair', ports, lport_ext_ids))
+
     def test_ovn_nb_sync_mode_log(self):
         create_network_list = []
         create_port_list = []
@@ -16,6 +16,7 @@
 
 import mock
 from oslo_config import cfg
+from sqlalchemy.orm import exc as sa_exc
 from webob import exc
 
 from neutron.common import exceptions as n_exc
@@ -29,6 +30,8 @@ from neutron.tests.unit.extensions import test_extra_dhcp_opt as test_dhcpopts
 from neutron.tests.unit.extensions import test_l3 as test_l3_plugin
 
 from networking_ovn.common import constants as ovn_const
+from networking_ovn.common import profiling
+from networking_ovn.common import remote_groups
 from networking_ovn.ovsdb import impl_idl_ovn
 
 PLUGIN_NAME = ('networking_ovn.plugin.OVNPlugin')
@@ -324,6 +327,34 @@ class TestOvnPluginACLs(OVNPluginTestCase):
             txn=mock.Mock())
         self.plugin._ovn.add_acl.assert_not_called()
 
+    def test__add_acls_compaction(self):
+        cfg.CONF.set_override('acl_compaction', True, 'ovn')
+        port = {'id': 'port-id',
+                'network_id': 'network-id',
+                'fixed_ips': [],
+                'security_groups': ['sg1']}
+        rules = [{'direction': 'ingress',
+                  'ethertype': 'IPv4',
+                  'remote_group_id': None,
+                  'remote_ip_prefix': None,
+                  'protocol': protocol,
+                  'port_range_min': port_range_min,
+                  'port_range_max': port_range_max}
+                 for protocol, port_range_min, port_range_max in (
+                     ('tcp', 22, 22), ('tcp', 80, 80), ('icmp', None, None))]
+        self.plugin._ovn.add_acl = mock.Mock(
+            side_effect=lambda **columns: mock.Mock(columns=columns))
+        with mock.patch.object(self.plugin, 'get_security_group',
+                               return_value={'security_group_rules': rules}):
+            self.plugin._add_acls(self.context, port, mock.Mock())
+        matches = [c[1]['match'] for c in
+                   self.plugin._ovn.add_acl.call_args_list
+                   if c[1]['action'] == ovn_const.ACL_ACTION_ALLOW_RELATED]
+        self.assertEqual(
+            ['outport == "port-id" && ip4 && icmp4',
+             'outport == "port-id" && ip4 && tcp && tcp.dst == {22, 80}'],
+            sorted(matches))
+
     def _test__add_sg_rule_acl_for_port(self, sg_rule, direction, match):
         port = {'id': 'port-id',
                 'network_id': 'network-id'}
@@ -375,7 +406,7 @@ class TestOvnPluginACLs(OVNPluginTestCase):
                                 'ip_address': '1.1.1.100'},
                                {'subnet_id': 'subnet-id',
                                 'ip_address': '1.1.1.101'}]}
-        port2 = {'id': 'port-id1',
+        port2 = {'id': 'port-id2',
                  'fixed_ips': [{'subnet_id': 'subnet-id',
                                 'ip_address': '1.1.1.102'},
                                {'subnet_id': 'subnet-id-v6',
@@ -400,21 +431,357 @@ class TestOvnPluginACLs(OVNPluginTestCase):
             mock.patch('neutron.db.db_base_plugin_v2.NeutronDbPluginV2.'
                        'get_subnet', side_effect=_get_subnet):
 
-            match = 'outport == "port-id" && ip4 && (ip4.src == 1.1.1.100' \
-                    ' || ip4.src == 1.1.1.101' \
-                    ' || ip4.src == 1.1.1.102)'
+            match = 'outport == "port-id" && ip4 && ' \
+                    'ip4.src == {1.1.1.100, 1.1.1.101, 1.1.1.102}'
 
             self._test__add_sg_rule_acl_for_port(sg_rule,
                                                  'to-lport',
                                                  match)
             sg_rule['direction'] = 'egress'
-            match = 'inport == "port-id" && ip4 && (ip4.dst == 1.1.1.100' \
-                    ' || ip4.dst == 1.1.1.101' \
-                    ' || ip4.dst == 1.1.1.102)'
+            match = 'inport == "port-id" && ip4 && ' \
+                    'ip4.dst == {1.1.1.100, 1.1.1.101, 1.1.1.102}'
             self._test__add_sg_rule_acl_for_port(sg_rule,
                                                  'from-lport',
                                                  match)
 
+    def test__add_sg_rule_acl_for_port_remote_group_cache(self):
+        self.plugin._remote_group_cache = remote_groups.RemoteGroupCache(60)
+        sg_rule = {'direction': 'ingress',
+                   'ethertype': 'IPv4',
+                   'remote_group_id': 'sg1',
+                   'remote_ip_prefix': None,
+                   'protocol': None}
+        sg_ports = [{'security_group_id': 'sg1',
+                     'port_id': 'port-id1'}]
+        ports = [{'id': 'port-id1',
+                  'fixed_ips': [{'subnet_id': 'subnet-id',
+                                 'ip_address': '1.1.1.100'}]}]
+        subnet = {'id': 'subnet-id',
+                  'ip_version': 4}
+        revision = remote_groups.addresses_revision(
+            [('port-id1', '1.1.1.100')])
+        with mock.patch.object(self.plugin,
+                               '_get_port_security_group_bindings',
+                               return_value=sg_ports), \
+                mock.patch.object(self.plugin, 'get_ports',
+                                  return_value=ports) as get_ports, \
+                mock.patch.object(self.plugin, 'get_subnet',
+                                  return_value=subnet), \
+                mock.patch.object(self.plugin, '_remote_group_revision',
+                                  return_value=revision) as get_revision:
+            match = 'outport == "port-id" && ip4 && ip4.src == 1.1.1.100'
+            self._test__add_sg_rule_acl_for_port(sg_rule, 'to-lport', match)
+            self._test__add_sg_rule_acl_for_port(sg_rule, 'to-lport', match)
+            self.assertEqual(1, get_ports.call_count)
+            get_revision.assert_called_once_with(mock.ANY, 'sg1')
+
+            # The cached remote group is updated with the port changes.
+            get_revision.return_value = remote_groups.addresses_revision(
+                [('port-id1', '1.1.1.100'), ('port-id2', '1.1.1.101')])
+            self.plugin._update_remote_group_cache(
+                self.context,
+                {'id': 'port-id2',
+                 'security_groups': ['sg1'],
+                 'fixed_ips': [{'subnet_id': 'subnet-id',
+                                'ip_address': '1.1.1.101'}]},
+                {})
+            match = ('outport == "port-id" && ip4 && '
+                     'ip4.src == {1.1.1.100, 1.1.1.101}')
+            self._test__add_sg_rule_acl_for_port(sg_rule, 'to-lport', match)
+            self.assertEqual(1, get_ports.call_count)
+
+            # The ports changed by the other neutron servers change the
+            # revision of the remote group in the Neutron DB.
+            ports.append({'id': 'port-id3',
+                          'fixed_ips': [{'subnet_id': 'subnet-id',
+                                         'ip_address': '1.1.1.102'}]})
+            get_revision.return_value = remote_groups.addresses_revision(
+                [('port-id1', '1.1.1.100'), ('port-id3', '1.1.1.102')])
+            match = ('outport == "port-id" && ip4 && '
+                     'ip4.src == {1.1.1.100, 1.1.1.102}')
+            self._test__add_sg_rule_acl_for_port(sg_rule, 'to-lport', match)
+            self.assertEqual(2, get_ports.call_count)
+
+    def test__remote_group_revision(self):
+        with self.subnet() as subnet:
+            with self.port(subnet=subnet) as p1, \
+                    self.port(subnet=subnet) as p2:
+                ports = [p1['port'], p2['port']]
+                sg_id = ports[0]['security_groups'][0]
+                revision = self.plugin._remote_group_revision(
+                    context.get_admin_context(), sg_id)
+        self.assertEqual(remote_groups.addresses_revision(
+            (port['id'], fixed_ip['ip_address']) for port in ports
+            for fixed_ip in port['fixed_ips']), revision)
+
+    def test__update_acls_for_security_group_batches(self):
+        cfg.CONF.set_override('acl_update_batch_size', 2, 'ovn')
+        sg_ports = [{'port_id': 'port%d' % i} for i in range(6)]
+        self.plugin._ovn.transaction = mock.MagicMock()
+        with mock.patch.object(self.plugin,
+                               '_get_port_security_group_bindings',
+                               return_value=sg_ports), \
+                mock.patch.object(self.plugin, 'get_port',
+                                  side_effect=lambda ctx, id: {
+                                      'id': id, 'network_id': 'net1'}), \
+                mock.patch.object(self.plugin, '_add_acls') as add_acls:
+            self.plugin._update_acls_for_security_group(
+                self.context, 'sg1', exclude_ports=['port0'])
+        self.assertEqual(3, self.plugin._ovn.transaction.call_count)
+        self.assertEqual(['port%d' % i for i in range(1, 6)],
+                         [c[0][1]['id'] for c in add_acls.call_args_list])
+
+    def test__add_acls_per_security_group(self):
+        cfg.CONF.set_override('acl_per_security_group', True, 'ovn')
+        port = {'id': 'port-id',
+                'network_id': 'network-id',
+                'fixed_ips': [],
+                'security_groups': ['sg1']}
+        self.plugin._ovn.add_acl = mock.Mock()
+        with mock.patch.object(self.plugin,
+                               'get_security_group') as get_sg:
+            self.plugin._add_acls(self.context, port, mock.Mock())
+        self.assertFalse(get_sg.called)
+        self.assertEqual(
+            [ovn_const.ACL_ACTION_DROP] * 2,
+            [c[1]['action'] for c in self.plugin._ovn.add_acl.call_args_list])
+
+    def test__security_group_acls(self):
+        rules = [{'direction': 'ingress',
+                  'ethertype': 'IPv4',
+                  'remote_group_id': None,
+                  'remote_ip_prefix': None,
+                  'protocol': 'tcp',
+                  'port_range_min': 22,
+                  'port_range_max': 22},
+                 {'direction': 'egress',
+                  'ethertype': 'IPv6',
+                  'remote_group_id': None,
+                  'remote_ip_prefix': None,
+                  'protocol': None}]
+        acls = self.plugin._security_group_acls(
+            self.context, {'security_group_rules': rules}, {}, {})
+        self.assertEqual(
+            [{'priority': ovn_const.ACL_PRIORITY_ALLOW,
+              'action': ovn_const.ACL_ACTION_ALLOW_RELATED,
+              'log': False,
+              'direction': 'to-lport',
+              'match': 'ip4 && tcp && tcp.dst >= 22 && tcp.dst <= 22'},
+             {'priority': ovn_const.ACL_PRIORITY_ALLOW,
+              'action': ovn_const.ACL_ACTION_ALLOW_RELATED,
+              'log': False,
+              'direction': 'from-lport',
+              'match': 'ip6'}],
+            acls)
+
+    def test__update_security_group_acls(self):
+        sg_ports = [{'port_id': 'port%d' % i} for i in range(3)]
+        ports = [{'network_id': 'net2'},
+                 {'network_id': 'net1'},
+                 {'network_id': 'net2'}]
+        self.plugin._ovn.transaction = mock.MagicMock()
+        self.plugin._ovn.set_security_group_acls = mock.Mock()
+        with mock.patch.object(self.plugin,
+                               '_get_port_security_group_bindings',
+                               return_value=sg_ports), \
+                mock.patch.object(self.plugin, 'get_ports',
+                                  return_value=ports), \
+                mock.patch.object(self.plugin, 'get_security_group',
+                                  return_value={'security_group_rules': []}), \
+                mock.patch.object(self.plugin, '_security_group_acls',
+                                  return_value=['acl']) as sg_acls:
+            self.plugin._update_security_group_acls(self.context, 'sg1')
+        self.assertEqual(
+            [mock.call('neutron-net1', 'sg1', ['acl']),
+             mock.call('neutron-net2', 'sg1', ['acl'])],
+            self.plugin._ovn.set_security_group_acls.call_args_list)
+        self.assertEqual(1, self.plugin._ovn.transaction.call_count)
+        # The ACLs are built once for all the networks.
+        self.assertEqual(1, sg_acls.call_count)
+
+    def test__update_port_in_ovn_per_security_group(self):
+        cfg.CONF.set_override('acl_per_security_group', True, 'ovn')
+        original_port = {'security_groups': ['sg1', 'sg2']}
+        port = {'id': 'port-id', 'name': 'port-name',
+                'network_id': 'net1', 'admin_state_up': True,
+                'fixed_ips': [], 'security_groups': ['sg3', 'sg2']}
+        self.plugin._ovn.transaction = mock.MagicMock()
+        txn = self.plugin._ovn.transaction.return_value.__enter__.return_value
+        self.plugin._ovn.set_lport = mock.Mock()
+        with mock.patch.object(self.plugin, '_add_acls'), \
+                mock.patch.object(self.plugin,
+                                  '_add_security_group_acls') as add_sg_acls, \
+                mock.patch.object(self.plugin,
+                                  '_refresh_remote_security_group'):
+            self.plugin._update_port_in_ovn(self.context, original_port,
+                                            port, mock.Mock())
+        self.assertEqual(
+            {ovn_const.OVN_PORT_NAME_EXT_ID_KEY: 'port-name',
+             ovn_const.OVN_SG_IDS_EXT_ID_KEY: 'sg2 sg3'},
+            self.plugin._ovn.set_lport.call_args[1]['external_ids'])
+        # The ACLs of all the security groups of the port are set in the
+        # transaction deleting its own ACLs, not only the attached ones.
+        add_sg_acls.assert_called_once_with(
+            self.context, ['sg1', 'sg2', 'sg3'], ['net1'], txn,
+            sg_ports_cache={}, subnet_cache={})
+        self.assertEqual(1, self.plugin._ovn.transaction.call_count)
+
+    def test_set_security_group_acls_in_ovn(self):
+        cfg.CONF.set_override('acl_per_security_group', True, 'ovn')
+        ports = [{'id': 'port1', 'name': '', 'network_id': 'net1',
+                  'security_groups': ['sg2']},
+                 {'id': 'port2', 'name': '', 'network_id': 'net1',
+                  'security_groups': ['sg2', 'sg1']}]
+        self.plugin._ovn.transaction = mock.MagicMock()
+        txn = self.plugin._ovn.transaction.return_value.__enter__.return_value
+        self.plugin._ovn.set_lport = mock.Mock()
+        self.plugin._ovn.delete_acl = mock.Mock()
+        with mock.patch.object(self.plugin, '_add_acls') as add_acls, \
+                mock.patch.object(self.plugin,
+                                  '_add_security_group_acls') as add_sg_acls:
+            self.plugin.set_security_group_acls_in_ovn(self.context, 'net1',
+                                                       ports, ['sg1', 'sg2'])
+        self.assertEqual(
+            ['sg2', 'sg1 sg2'],
+            [c[1]['external_ids'][ovn_const.OVN_SG_IDS_EXT_ID_KEY]
+             for c in self.plugin._ovn.set_lport.call_args_list])
+        self.plugin._ovn.delete_acl.assert_has_calls(
+            [mock.call('neutron-net1', 'port1'),
+             mock.call('neutron-net1', 'port2')])
+        self.assertEqual(2, add_acls.call_count)
+        add_sg_acls.assert_called_once_with(
+            self.context, ['sg1', 'sg2'], ['net1'], txn,
+            sg_ports_cache={}, subnet_cache={})
+        self.assertEqual(1, self.plugin._ovn.transaction.call_count)
+
+    def test_set_security_group_acls_in_ovn_per_port(self):
+        ports = [{'id': 'port1', 'name': '', 'network_id': 'net1',
+                  'security_groups': ['sg2']}]
+        self.plugin._ovn.transaction = mock.MagicMock()
+        self.plugin._ovn.set_lport = mock.Mock()
+        self.plugin._ovn.delete_acl = mock.Mock()
+        with mock.patch.object(self.plugin, '_add_acls'), \
+                mock.patch.object(self.plugin,
+                                  '_add_security_group_acls') as add_sg_acls:
+            self.plugin.set_security_group_acls_in_ovn(self.context, 'net1',
+                                                       ports, ['sg2'])
+        # The logical port is no longer matched by the ACLs of its security
+        # groups, which are set without it.
+        self.assertEqual(
+            {ovn_const.OVN_PORT_NAME_EXT_ID_KEY: ''},
+            self.plugin._ovn.set_lport.call_args[1]['external_ids'])
+        add_sg_acls.assert_called_once_with(
+            self.context, ['sg2'], ['net1'], mock.ANY,
+            sg_ports_cache={}, subnet_cache={})
+
+    def test__update_acls_for_security_group_per_security_group(self):
+        cfg.CONF.set_override('acl_per_security_group', True, 'ovn')
+        with mock.patch.object(self.plugin,
+                               '_update_security_group_acls') as update, \
+                mock.patch.object(self.plugin, '_add_acls') as add_acls:
+            self.plugin._update_acls_for_security_group(self.context, 'sg1')
+        update.assert_called_once_with(self.context, 'sg1',
+                                       sg_ports_cache={},
+                                       subnet_cache={})
+        self.assertFalse(add_acls.called)
+
+
+class TestOvnPluginPortStatus(OVNPluginTestCase):
+
+    def _get_port_status(self, port_id):
+        req = self.new_show_request('ports', port_id)
+        return self.deserialize(self.fmt,
+                                req.get_response(self.api))['port']['status']
+
+    def test_sync_port_status(self):
+        with self.port() as p1, self.port() as p2, self.port() as p3:
+            p1_id = p1['port']['id']
+            p2_id = p2['port']['id']
+            p3_id = p3['port']['id']
+            self.plugin.set_port_status_up(p2_id)
+            self.plugin.sync_port_status({p1_id: True,
+                                          p2_id: False,
+                                          'unknown-port': True})
+            self.assertEqual('ACTIVE', self._get_port_status(p1_id))
+            self.assertEqual('DOWN', self._get_port_status(p2_id))
+            self.assertEqual('DOWN', self._get_port_status(p3_id))
+
+    @mock.patch.object(ovn_const, 'PORT_STATUS_SYNC_BATCH_SIZE', 2)
+    def test_sync_port_status_batches(self):
+        with self.port() as p1, self.port() as p2, self.port() as p3:
+            port_ids = [p['port']['id'] for p in (p1, p2, p3)]
+            self.plugin.sync_port_status(
+                dict((port_id, True) for port_id in port_ids + ['unknown']))
+            for port_id in port_ids:
+                self.assertEqual('ACTIVE', self._get_port_status(port_id))
+
+    def test_sync_port_status_stale_batch(self):
+        with self.port() as p1, self.port() as p2:
+            p1_id = p1['port']['id']
+            p2_id = p2['port']['id']
+            ctx = context.get_admin_context()
+            begin = ctx.session.begin
+
+            def _begin(*args, **kwargs):
+                if not update.called:
+                    # A port of the batch is deleted concurrently.
+                    raise sa_exc.StaleDataError()
+                return begin(*args, **kwargs)
+
+            with mock.patch('networking_ovn.plugin.n_context.'
+                            'get_admin_context', return_value=ctx), \
+                    mock.patch.object(ctx.session, 'begin',
+                                      side_effect=_begin), \
+                    mock.patch.object(
+                        self.plugin, '_update_port_status',
+                        wraps=self.plugin._update_port_status) as update:
+                self.plugin.sync_port_status({p1_id: True, p2_id: True})
+            self.assertEqual(2, update.call_count)
+            self.assertEqual('ACTIVE', self._get_port_status(p1_id))
+            self.assertEqual('ACTIVE', self._get_port_status(p2_id))
+
+
+class TestOvnPluginLazyConnection(OVNPluginTestCase):
+
+    def setUp(self):
+        super(TestOvnPluginLazyConnection, self).setUp()
+        self.plugin._ovn = None
+        self.plugin._ovn_trigger = None
+
+    @mock.patch('eventlet.greenthread.spawn_n')
+    def test_api_worker_lazy_connection(self, mock_spawn_n):
+        trigger = mock.Mock()
+        with mock.patch.object(impl_idl_ovn, 'OvsdbOvnIdl') as mock_idl:
+            self.plugin.post_fork_initialize(mock.ANY, mock.ANY, trigger)
+            mock_spawn_n.assert_called_once_with(self.plugin._warm_up_ovn)
+            self.assertFalse(mock_idl.called)
+
+            self.assertEqual(mock_idl.return_value, self.plugin._ovn)
+            self.assertEqual(mock_idl.return_value, self.plugin._ovn)
+            mock_idl.assert_called_once_with(self.plugin, trigger)
+
+    def test_connection_not_initialized(self):
+        self.assertRaises(RuntimeError, getattr, self.plugin, '_ovn')
+
+
+class TestOvnPluginProfiling(OVNPluginTestCase):
+
+    def test_create_port_profile(self):
+        with self.network() as net, self.subnet(network=net):
+            cfg.CONF.set_override('profiling', True, 'ovn')
+            sink = mock.Mock()
+            with mock.patch.object(profiling, '_get_sink',
+                                   return_value=sink):
+                with self.port(network=net):
+                    pass
+        profiles = dict((c[0][0]['operation'], c[0][0])
+                        for c in sink.call_args_list)
+        profile = profiles['create_port']
+        self.assertEqual(1, profile['spans']['db']['count'])
+        self.assertIn('acl_build', profile['spans'])
+        self.assertTrue(profile['counters']['sql_queries'])
+        self.assertIn('delete_port', profiles)
+
 
 class TestOvnPluginL3(OVNPluginTestCase):
 
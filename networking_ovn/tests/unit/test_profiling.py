@@ -0,0 +1,81 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo_config import cfg
+import sqlalchemy
+
+from neutron.tests import base
+
+from networking_ovn.common import profiling
+
+
+class TestProfiling(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestProfiling, self).setUp()
+        cfg.CONF.set_override('profiling', True, 'ovn')
+        self.sink = mock.Mock()
+        mock.patch.object(profiling, '_get_sink',
+                          return_value=self.sink).start()
+
+    def test_request(self):
+        with profiling.request('create_port'):
+            with profiling.span('db'):
+                pass
+            with profiling.span('db'):
+                pass
+            profiling.count('ovsdb_ops', 3)
+            profiling.count('ovsdb_ops')
+            # Nested requests are part of the outermost one
+            with profiling.request('update_port'):
+                with profiling.span('ovn_commit'):
+                    pass
+        self.assertEqual(1, self.sink.call_count)
+        profile = self.sink.call_args[0][0]
+        self.assertEqual('create_port', profile['operation'])
+        self.assertEqual(2, profile['spans']['db']['count'])
+        self.assertEqual(1, profile['spans']['ovn_commit']['count'])
+        self.assertEqual({'ovsdb_ops': 4}, profile['counters'])
+        self.assertIsNone(profiling.current_profile())
+
+    def test_sql_queries(self):
+        engine = sqlalchemy.create_engine('sqlite://')
+        # Initialize the dialect outside of the request.
+        engine.execute('SELECT 0')
+        with profiling.request('get_port'):
+            engine.execute('SELECT 1')
+            engine.execute('SELECT 2')
+        self.assertEqual(2,
+                         self.sink.call_args[0][0]['counters']['sql_queries'])
+
+    def test_disabled(self):
+        cfg.CONF.set_override('profiling', False, 'ovn')
+        with profiling.request('create_port'):
+            with profiling.span('db'):
+                pass
+            profiling.count('ovsdb_ops')
+        self.assertFalse(self.sink.called)
+
+    def test_sink_error(self):
+        self.sink.side_effect = ValueError
+        with profiling.request('create_port'):
+            pass
+        self.assertIsNone(profiling.current_profile())
+
+    def test_log_sink(self):
+        with mock.patch.object(profiling.LOG, 'info') as info:
+            profiling.log_sink({'operation': 'create_port',
+                                'duration': 0.5,
+                                'spans': {'db': {'count': 1, 'time': 0.1}},
+                                'counters': {'sql_queries': 12}})
+        self.assertEqual(1, info.call_count)
@@ -0,0 +1,142 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron.tests import base
+
+from networking_ovn.common import remote_groups
+
+PORTS = {'p1': (('10.0.0.1',), ('2001:db8::1',)),
+         'p2': (('10.0.0.2', '10.0.0.3'), ()),
+         'p3': (('10.0.0.1',), ())}
+
+
+class TestRemoteGroupCache(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestRemoteGroupCache, self).setUp()
+        self.cache = remote_groups.RemoteGroupCache(60)
+        self.load = mock.Mock(return_value=PORTS)
+
+    def test_ips_match_exclude_port(self):
+        group = self.cache.get('sg1', self.load)
+        # 10.0.0.2 and 10.0.0.3 are only the addresses of p2.
+        self.assertEqual('ip4.src == 10.0.0.1',
+                         group.ips_match('ip4', 'src', 'p2'))
+        self.assertEqual('ip6.src == 2001:db8::1',
+                         group.ips_match('ip6', 'src', 'p2'))
+
+    def test_ips_match(self):
+        group = self.cache.get('sg1', self.load)
+        match = group.ips_match('ip4', 'src')
+        self.assertEqual('ip4.src == {10.0.0.1, 10.0.0.2, 10.0.0.3}', match)
+        # The match is shared until the next change.
+        self.assertIs(match, group.ips_match('ip4', 'src', 'p4'))
+        self.assertEqual('ip4.src == {10.0.0.1, 10.0.0.2, 10.0.0.3}',
+                         group.ips_match('ip4', 'src', 'p1'))
+        self.assertEqual('ip4.dst == 10.0.0.1',
+                         group.ips_match('ip4', 'dst', 'p2'))
+        self.assertEqual('ip6.src == 2001:db8::1',
+                         group.ips_match('ip6', 'src'))
+        self.assertEqual('', group.ips_match('ip6', 'src', 'p1'))
+        self.assertEqual('', group.ips_match(None, 'src'))
+        self.cache.remove_port('p2')
+        self.assertEqual('ip4.src == 10.0.0.1', group.ips_match('ip4', 'src'))
+
+    def test_has_ports(self):
+        self.load.return_value = {'p1': PORTS['p1']}
+        group = self.cache.get('sg1', self.load)
+        self.assertTrue(group.has_ports())
+        self.assertTrue(group.has_ports('p2'))
+        self.assertFalse(group.has_ports('p1'))
+
+    @mock.patch('time.time')
+    def test_get_ttl(self, mock_time):
+        mock_time.return_value = 1000
+        group = self.cache.get('sg1', self.load)
+        mock_time.return_value = 1059
+        self.assertIs(group, self.cache.get('sg1', self.load))
+        self.load.assert_called_once_with('sg1')
+        mock_time.return_value = 1060
+        self.assertIsNot(group, self.cache.get('sg1', self.load))
+        self.assertEqual(2, self.load.call_count)
+
+    def test_get_reload(self):
+        group = self.cache.get('sg1', self.load)
+        reloaded = self.cache.get('sg1', self.load, reload=True)
+        self.assertIsNot(group, reloaded)
+        self.assertEqual(2, self.load.call_count)
+        self.assertIs(reloaded, self.cache.get('sg1', self.load))
+
+    def test_get_revision(self):
+        revision = mock.Mock(return_value=remote_groups.addresses_revision(
+            [('p1', '10.0.0.1'), ('p1', '2001:db8::1'), ('p2', '10.0.0.2'),
+             ('p2', '10.0.0.3'), ('p3', '10.0.0.1')]))
+        group = self.cache.get('sg1', self.load, revision=revision)
+        self.assertIs(group, self.cache.get('sg1', self.load,
+                                            revision=revision))
+        self.assertEqual(1, self.load.call_count)
+        revision.assert_called_once_with('sg1')
+
+        # Updated by the process.
+        self.cache.update_port('p4', ['sg1'], ((), ()))
+        revision.return_value = remote_groups.addresses_revision(
+            [('p1', '10.0.0.1'), ('p1', '2001:db8::1'), ('p2', '10.0.0.2'),
+             ('p2', '10.0.0.3'), ('p3', '10.0.0.1'), ('p4', None)])
+        self.assertIs(group, self.cache.get('sg1', self.load,
+                                            revision=revision))
+        self.assertEqual(1, self.load.call_count)
+
+        # Updated by another process.
+        revision.return_value = remote_groups.addresses_revision(
+            [('p1', '10.0.0.1')])
+        self.load.return_value = {'p1': (('10.0.0.1',), ())}
+        reloaded = self.cache.get('sg1', self.load, revision=revision)
+        self.assertEqual({'p1': (('10.0.0.1',), ())}, reloaded.ports)
+        self.assertEqual(2, self.load.call_count)
+
+    def test_get_disabled(self):
+        cache = remote_groups.RemoteGroupCache(0)
+        cache.get('sg1', self.load)
+        cache.get('sg1', self.load)
+        self.assertEqual(2, self.load.call_count)
+
+    def test_update_port(self):
+        self.cache.get('sg1', self.load)
+        self.cache.get('sg2', mock.Mock(return_value={}))
+        self.cache.update_port('p1', ['sg2'], (('10.0.0.4',), ()))
+        self.cache.update_port('p4', ['sg1', 'sg2'], (('10.0.0.5',), ()))
+        sg1 = self.cache.get('sg1', self.load)
+        self.assertEqual('ip4.src == {10.0.0.1, 10.0.0.2, 10.0.0.3, 10.0.0.5}',
+                         sg1.ips_match('ip4', 'src'))
+        self.assertEqual('', sg1.ips_match('ip6', 'src'))
+        self.assertEqual('ip4.src == {10.0.0.4, 10.0.0.5}',
+                         self.cache.get('sg2', self.load).ips_match('ip4',
+                                                                    'src'))
+        self.load.assert_called_once_with('sg1')
+
+    def test_remove_port(self):
+        self.cache.get('sg1', self.load)
+        self.cache.remove_port('p2')
+        self.cache.remove_port('p3')
+        self.assertEqual(['p1'], list(self.cache.get('sg1', self.load).ports))
+
+    def test_get_update_during_load(self):
+        def load(sg_id):
+            self.cache.update_port('p4', [sg_id], (('10.0.0.5',), ()))
+            return PORTS
+
+        self.cache.get('sg1', load)
+        # The entry loaded may miss the update, so it is not kept.
+        self.cache.get('sg1', self.load)
+        self.load.assert_called_once_with('sg1')
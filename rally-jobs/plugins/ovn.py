@@ -0,0 +1,205 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Rally scenarios stressing the code paths specific to the OVN plugin.
+
+The OVN plugin rewrites the ACLs of every port of a security group when a
+rule changes, and of every port of the security groups referencing it as
+remote group when a port is added or removed, these scenarios measure how
+those operations scale with the size of the security groups.
+"""
+
+import time
+
+from rally import consts
+from rally.plugins.openstack import scenario
+from rally.plugins.openstack.scenarios.neutron import utils as neutron_utils
+from rally.plugins.openstack.scenarios.nova import utils as nova_utils
+from rally.task import atomic
+from rally.task import types
+from rally.task import validation
+
+
+class NeutronOVN(neutron_utils.NeutronScenario, nova_utils.NovaScenario):
+
+    @atomic.action_timer("neutron.create_security_group")
+    def _create_security_group(self):
+        return self.clients("neutron").create_security_group(
+            {"security_group": {"name": self.generate_random_name()}})
+
+    @atomic.action_timer("neutron.create_security_group_rule")
+    def _create_security_group_rule(self, security_group, **rule_args):
+        rule_args["security_group_id"] = security_group["security_group"][
+            "id"]
+        rule_args.setdefault("direction", "ingress")
+        rule_args.setdefault("ethertype", "IPv4")
+        return self.clients("neutron").create_security_group_rule(
+            {"security_group_rule": rule_args})
+
+    @atomic.action_timer("neutron.delete_security_group_rule")
+    def _delete_security_group_rule(self, rule):
+        self.clients("neutron").delete_security_group_rule(
+            rule["security_group_rule"]["id"])
+
+    def _create_security_group_with_rules(self, rules):
+        security_group = self._create_security_group()
+        # The members of the group can reach each other, and the ports in
+        # the rules, like a typical tenant security group.
+        self._create_security_group_rule(
+            security_group,
+            remote_group_id=security_group["security_group"]["id"])
+        for i in range(rules):
+            self._create_security_group_rule(
+                security_group, protocol="tcp",
+                port_range_min=1000 + 10 * i, port_range_max=1000 + 10 * i)
+        return security_group
+
+    def _create_network_and_subnet(self, subnet_cidr_start):
+        network = self._create_network({})
+        self._create_subnet(network, {}, subnet_cidr_start)
+        return network
+
+    def _create_member_port(self, network, security_group):
+        return self._create_port(
+            network,
+            {"security_groups": [security_group["security_group"]["id"]]})
+
+    @validation.number("members", minval=1, integer_only=True)
+    @validation.number("rules", minval=0, integer_only=True)
+    @validation.required_services(consts.Service.NEUTRON)
+    @validation.required_openstack(users=True)
+    @scenario.configure(context={"cleanup": ["neutron"]})
+    def create_ports_in_large_security_group(self, members=50, rules=10,
+                                             subnet_cidr_start=None):
+        """Add ports one by one to a security group with a remote group rule.
+
+        Every port added updates the ACLs of all the other members of the
+        group, this measures how port creation scales with the group size.
+
+        :param members: number of ports added to the security group
+        :param rules: number of tcp rules of the security group
+        :param subnet_cidr_start: the CIDR of the subnet of the ports
+        """
+        network = self._create_network_and_subnet(subnet_cidr_start)
+        security_group = self._create_security_group_with_rules(rules)
+        for i in range(members):
+            self._create_member_port(network, security_group)
+
+    @validation.number("ports", minval=1, integer_only=True)
+    @validation.number("rules", minval=1, integer_only=True)
+    @validation.required_services(consts.Service.NEUTRON)
+    @validation.required_openstack(users=True)
+    @scenario.configure(context={"cleanup": ["neutron"]})
+    def churn_security_group_rules(self, ports=20, rules=20,
+                                   subnet_cidr_start=None):
+        """Create then delete rules of a security group used by ports.
+
+        Each rule created or deleted rewrites the ACLs of all the ports of
+        the security group.
+
+        :param ports: number of ports in the security group
+        :param rules: number of rules created then deleted
+        :param subnet_cidr_start: the CIDR of the subnet of the ports
+        """
+        network = self._create_network_and_subnet(subnet_cidr_start)
+        security_group = self._create_security_group_with_rules(0)
+        for i in range(ports):
+            self._create_member_port(network, security_group)
+        created = [self._create_security_group_rule(
+            security_group, protocol="udp", port_range_min=2000 + i,
+            port_range_max=2000 + i) for i in range(rules)]
+        for rule in created:
+            self._delete_security_group_rule(rule)
+
+    @atomic.action_timer("neutron.create_ports_bulk")
+    def _create_ports_bulk(self, network, count):
+        ports = [{"network_id": network["network"]["id"],
+                  "name": self.generate_random_name()}
+                 for i in range(count)]
+        return self.clients("neutron").create_port({"ports": ports})
+
+    @validation.number("ports", minval=1, integer_only=True)
+    @validation.required_services(consts.Service.NEUTRON)
+    @validation.required_openstack(users=True)
+    @scenario.configure(context={"cleanup": ["neutron"]})
+    def create_ports_bulk(self, ports=50, subnet_cidr_start=None):
+        """Create ports in one bulk request.
+
+        :param ports: number of ports created in the request
+        :param subnet_cidr_start: the CIDR of the subnet of the ports
+        """
+        network = self._create_network_and_subnet(subnet_cidr_start)
+        self._create_ports_bulk(network, ports)
+
+    @validation.number("subnets", minval=1, integer_only=True)
+    @validation.required_services(consts.Service.NEUTRON)
+    @validation.required_openstack(users=True)
+    @scenario.configure(context={"cleanup": ["neutron"]})
+    def add_and_remove_router_interfaces(self, subnets=5,
+                                         subnet_cidr_start=None):
+        """Add then remove router interfaces on subnets.
+
+        :param subnets: number of subnets connected to the router
+        :param subnet_cidr_start: the CIDR of the first subnet
+        """
+        network, created = self._create_network_and_subnets(
+            {}, {}, subnets, subnet_cidr_start)
+        router = self._create_router({})
+        for subnet in created:
+            self._add_interface_router(subnet["subnet"], router["router"])
+        for subnet in created:
+            self._remove_interface_router(subnet["subnet"],
+                                          router["router"])
+
+    @atomic.action_timer("neutron.wait_for_port_active")
+    def _wait_for_port_active(self, port, timeout, check_interval):
+        port_id = port["port"]["id"]
+        deadline = time.time() + timeout
+        while True:
+            status = self.clients("neutron").show_port(port_id)[
+                "port"]["status"]
+            if status == "ACTIVE":
+                return
+            if time.time() > deadline:
+                raise RuntimeError("Port %s still %s after %ss" %
+                                   (port_id, status, timeout))
+            time.sleep(check_interval)
+
+    @types.set(image=types.ImageResourceType,
+               flavor=types.FlavorResourceType)
+    @validation.image_valid_on_flavor("flavor", "image")
+    @validation.required_services(consts.Service.NEUTRON,
+                                  consts.Service.NOVA)
+    @validation.required_openstack(users=True)
+    @scenario.configure(context={"cleanup": ["nova", "neutron"]})
+    def boot_server_and_wait_for_port_active(self, image, flavor,
+                                             subnet_cidr_start=None,
+                                             timeout=120,
+                                             check_interval=0.5):
+        """Boot a server on a port and wait for the port to become ACTIVE.
+
+        The port status is set by the OVN worker when ovn-controller binds
+        the port on the chassis, this measures the latency of the status
+        transitions.
+
+        :param image: image of the server
+        :param flavor: flavor of the server
+        :param subnet_cidr_start: the CIDR of the subnet of the port
+        :param timeout: seconds to wait for the port to become ACTIVE
+        :param check_interval: seconds between the checks of the status
+        """
+        network = self._create_network_and_subnet(subnet_cidr_start)
+        port = self._create_port(network, {})
+        server = self._boot_server(image, flavor,
+                                   nics=[{"port-id": port["port"]["id"]}])
+        self._wait_for_port_active(port, timeout, check_interval)
+        self._delete_server(server)
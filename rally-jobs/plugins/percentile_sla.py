@@ -0,0 +1,54 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from rally.task import sla
+
+
+def _percentile(values, percent):
+    """Return the percentile of the sorted values, with interpolation."""
+    k = (len(values) - 1) * percent
+    f = int(k)
+    if f + 1 >= len(values):
+        return values[-1]
+    return values[f] + (values[f + 1] - values[f]) * (k - f)
+
+
+@sla.configure(name="max_p95_duration")
+class MaxP95Duration(sla.SLA):
+    """Maximum 95th percentile of the duration of the iterations."""
+
+    CONFIG_SCHEMA = {"type": "number", "minimum": 0.0,
+                     "exclusiveMinimum": True}
+
+    def __init__(self, criterion_value):
+        super(MaxP95Duration, self).__init__(criterion_value)
+        self.durations = []
+        self.p95 = 0.0
+
+    def add_iteration(self, iteration):
+        if not iteration.get("error"):
+            self.durations.append(iteration["duration"])
+            self.p95 = _percentile(sorted(self.durations), 0.95)
+        self.success = self.p95 <= self.criterion_value
+        return self.success
+
+    def merge(self, other):
+        self.durations.extend(other.durations)
+        if self.durations:
+            self.p95 = _percentile(sorted(self.durations), 0.95)
+        self.success = self.p95 <= self.criterion_value
+        return self.success
+
+    def details(self):
+        return ("95th percentile of the duration of one iteration "
+                "%.2fs <= %.2fs - %s" % (self.p95, self.criterion_value,
+                                         self.status()))